@@ -0,0 +1,95 @@
+/*
+ * Copyright (c) 2019, Oracle and/or its affiliates. All rights reserved.
+ * DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+ *
+ * This code is free software; you can redistribute it and/or modify it
+ * under the terms of the GNU General Public License version 2 only, as
+ * published by the Free Software Foundation.  Oracle designates this
+ * particular file as subject to the "Classpath" exception as provided
+ * by Oracle in the LICENSE file that accompanied this code.
+ *
+ * This code is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+ * version 2 for more details (a copy is included in the LICENSE file that
+ * accompanied this code).
+ *
+ * You should have received a copy of the GNU General Public License version
+ * 2 along with this work; if not, write to the Free Software Foundation,
+ * Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+ * or visit www.oracle.com if you need additional information or have any
+ * questions.
+ */
+import java.io.PrintStream;
+import java.lang.module.FindException;
+import java.lang.module.ModuleDescriptor;
+import java.lang.module.ModuleFinder;
+import java.lang.module.ModuleReference;
+import java.nio.file.Paths;
+import java.util.Optional;
+import java.util.Set;
+import java.util.TreeSet;
+import java.util.stream.Collectors;
+
+/**
+ * Describes the modules in a number of jar files in the format of {@code java --describe-module}.
+ * The arguments are pairs of a jar file path and the name of the module it defines. The description
+ * of each module is preceded by a line containing only {@code #} and a description that cannot be
+ * derived is replaced by a line starting with {@code error:}.
+ */
+public class DescribeModules {
+
+    private static void describe(PrintStream out, ModuleDescriptor md) {
+        out.println(md.toNameAndVersion() + (md.isAutomatic() ? " automatic" : "") + (md.isOpen() ? " open" : ""));
+        for (ModuleDescriptor.Requires dependency : new TreeSet<>(md.requires())) {
+            String modifiers = dependency.modifiers().stream().map(e -> " " + e.toString().toLowerCase()).collect(Collectors.joining());
+            out.println("requires " + dependency.name() + modifiers);
+        }
+        Set<String> concealed = new TreeSet<>(md.packages());
+        for (ModuleDescriptor.Exports export : new TreeSet<>(md.exports())) {
+            if (export.targets().isEmpty()) {
+                out.println("exports " + export.source());
+            } else {
+                out.println("qualified exports " + export.source() + " to " + String.join(" ", new TreeSet<>(export.targets())));
+            }
+            concealed.remove(export.source());
+        }
+        for (ModuleDescriptor.Opens opens : new TreeSet<>(md.opens())) {
+            if (opens.targets().isEmpty()) {
+                out.println("opens " + opens.source());
+            } else {
+                out.println("qualified opens " + opens.source() + " to " + String.join(" ", new TreeSet<>(opens.targets())));
+            }
+            concealed.remove(opens.source());
+        }
+        for (String use : new TreeSet<>(md.uses())) {
+            out.println("uses " + use);
+        }
+        for (ModuleDescriptor.Provides provides : new TreeSet<>(md.provides())) {
+            out.println("provides " + provides.service() + " with " + String.join(" ", provides.providers()));
+        }
+        for (String pkg : concealed) {
+            out.println("contains " + pkg);
+        }
+    }
+
+    public static void main(String[] args) {
+        PrintStream out = System.out;
+        for (int i = 0; i + 1 < args.length; i += 2) {
+            out.println("#");
+            String name = args[i + 1];
+            try {
+                Optional<ModuleReference> moduleRef = ModuleFinder.of(Paths.get(args[i])).find(name);
+                if (moduleRef.isPresent()) {
+                    describe(out, moduleRef.get().descriptor());
+                } else {
+                    out.println("error: module " + name + " not found in " + args[i]);
+                }
+            } catch (FindException e) {
+                out.println("error: " + String.valueOf(e.getMessage()).replace('\n', ' '));
+            }
+        }
+    }
+}
@@ -31,6 +31,51 @@ mx is a command line tool for managing the development of Java code organized as
 from __future__ import print_function
 
 import sys
+import threading
+import time
+
+# (name, end time) of the startup phases reported by --startup-profile
+_startup_phases = [('start', time.time())]
+
+def _startup_phase(name):
+    """
+    Records the end of the startup phase `name`.
+    """
+    _startup_phases.append((name, time.time()))
+
+# name -> [seconds, count] of the phases timed with _Phase, reported by --profile
+_phase_timers = {}
+_phase_timers_lock = threading.Lock()
+
+def _record_phase(name, seconds):
+    """
+    Adds `seconds` to the time spent in the phase `name`. The time of a phase entered by several
+    threads at once is the sum of the time spent in it by each thread and can therefore exceed
+    the wall clock time of mx.
+    """
+    with _phase_timers_lock:
+        timer = _phase_timers.get(name)
+        if timer is None:
+            timer = _phase_timers[name] = [0.0, 0]
+        timer[0] += seconds
+        timer[1] += 1
+
+class _Phase(object):
+    """
+    Context manager timing a phase of mx such as suite discovery. Phases can be entered
+    several times and can nest (e.g. "subprocess wait" is part of "command execution").
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _record_phase(self.name, time.time() - self.start)
 
 if sys.version_info < (2, 7):
     major, minor, micro, _, _ = sys.version_info
@@ -42,40 +87,86 @@ if __name__ == '__main__':
     # Rename this module as 'mx' so it is not re-executed when imported by other modules.
     sys.modules['mx'] = sys.modules.pop('__main__')
 
-try:
-    import defusedxml #pylint: disable=unused-import
-    from defusedxml.ElementTree import parse as etreeParse
-except ImportError:
-    from xml.etree.ElementTree import parse as etreeParse
-import os, errno, time, subprocess, shlex, zipfile, signal, tempfile, platform
+import os, errno, subprocess, shlex, zipfile, signal, tempfile, platform
+import gc
+import importlib
 import textwrap
-import socket
-import tarfile, gzip
 import hashlib
 import itertools
 from functools import cmp_to_key
 # TODO use defusedexpat?
-import xml.parsers.expat, xml.sax.saxutils, xml.dom.minidom
+import xml.parsers.expat, xml.dom.minidom
 from xml.dom.minidom import parseString as minidomParseString
 import shutil, re
-import pipes
-import difflib
 import glob
 import filecmp
 import json
+import marshal
+import struct
 from collections import OrderedDict, namedtuple, deque
 from datetime import datetime
-from threading import Thread
+from threading import Thread, Lock, Event as _ThreadEvent, local as _ThreadLocal
 from argparse import ArgumentParser, REMAINDER, Namespace, FileType, HelpFormatter, ArgumentTypeError
 from os.path import join, basename, dirname, exists, lexists, isabs, expandvars, isdir, islink, normpath, realpath
 from tempfile import mkdtemp, mkstemp
 import fnmatch
+import random
 import operator
-import calendar
-import multiprocessing
 from stat import S_IMODE, S_IWRITE
-from mx_commands import MxCommands, MxCommand
+from mx_commands import MxCommands, MxCommand, MxLazyCommand
 _mx_commands = MxCommands("mx")
+_startup_phase('import standard modules')
+
+# (module name, import time) of the modules imported by a _LazyModule
+_lazy_imports = []
+
+class _LazyModule(object):
+    """
+    A proxy for the module named `name` that only imports the module when one of its
+    attributes is first accessed. This keeps modules that most mx commands do not need
+    from adding to the startup time of every mx command.
+    """
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_module'] = None
+
+    def _lazy_load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            name = self.__dict__['_lazy_name']
+            loaded = name in sys.modules
+            start = time.time()
+            module = importlib.import_module(name)
+            if not loaded:
+                _lazy_imports.append((name, time.time() - start))
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_load(), name, value)
+
+    def __repr__(self):
+        return '<lazily imported module ' + repr(self.__dict__['_lazy_name']) + '>'
+
+socket = _LazyModule('socket')
+tarfile = _LazyModule('tarfile')
+gzip = _LazyModule('gzip')
+pipes = _LazyModule('pipes')
+difflib = _LazyModule('difflib')
+calendar = _LazyModule('calendar')
+multiprocessing = _LazyModule('multiprocessing')
+_xml_sax_saxutils = _LazyModule('xml.sax.saxutils')
+
+def etreeParse(source, parser=None):
+    try:
+        import defusedxml #pylint: disable=unused-import
+        from defusedxml.ElementTree import parse
+    except ImportError:
+        from xml.etree.ElementTree import parse
+    return parse(source, parser)
 
 # Temporary imports and (re)definitions while porting mx from Python 2 to Python 3
 if sys.version_info[0] < 3:
@@ -85,27 +176,33 @@ if sys.version_info[0] < 3:
 
     from StringIO import StringIO
     import __builtin__ as builtins
-    import urllib2                             # pylint: disable=unused-import
-    _urllib_request = urllib2
-    _urllib_error = urllib2
-    del urllib2
+    _urllib_request = _LazyModule('urllib2')
+    _urllib_error = _urllib_request
     import urlparse as _urllib_parse
+    _http_client = _LazyModule('httplib')
+    import Queue as _queue                     # pylint: disable=import-error
     def _decode(x):
         return x
     def _encode(x):
         return x
     _unicode = unicode                         # pylint: disable=undefined-variable
+    def _intern(x):
+        return intern(x) if type(x) is str else x  # pylint: disable=undefined-variable
 else:
     from io import StringIO
     import builtins                            # pylint: disable=unused-import,no-name-in-module
-    import urllib.request as _urllib_request   # pylint: disable=unused-import,no-name-in-module
-    import urllib.error as _urllib_error       # pylint: disable=unused-import,no-name-in-module
+    _urllib_request = _LazyModule('urllib.request')
+    _urllib_error = _LazyModule('urllib.error')
     import urllib.parse as _urllib_parse       # pylint: disable=unused-import,no-name-in-module
+    _http_client = _LazyModule('http.client')
+    import queue as _queue                     # pylint: disable=import-error
     def _decode(x):
         return x.decode()
     def _encode(x):
         return x.encode()
     _unicode = str
+    def _intern(x):
+        return sys.intern(x) if type(x) is str else x
 
 def _function_code(f):
     if hasattr(f, 'func_code'):
@@ -218,18 +315,21 @@ def no_suite_discovery(func):
     _no_suite_discovery.append(func.__name__)
     return func
 
-import mx_spotbugs
-import mx_sigtest
-import mx_gate
-import mx_jackpot
 import mx_compat
 import mx_urlrewrites
-import mx_benchmark
-import mx_benchplot
-import mx_downstream
 import mx_subst
 
+# modules that are only needed by some commands
+mx_spotbugs = _LazyModule('mx_spotbugs')
+mx_sigtest = _LazyModule('mx_sigtest')
+mx_gate = _LazyModule('mx_gate')
+mx_jackpot = _LazyModule('mx_jackpot')
+mx_benchmark = _LazyModule('mx_benchmark')
+mx_benchplot = _LazyModule('mx_benchplot')
+mx_downstream = _LazyModule('mx_downstream')
+
 from mx_javamodules import JavaModuleDescriptor, make_java_module, get_java_module_info, lookup_package, get_transitive_closure, get_module_name
+_startup_phase('import mx modules')
 
 ERROR_TIMEOUT = 0x700000000 # not 32 bits
 
@@ -247,6 +347,8 @@ def compare(a, b):
     return (a > b) - (a < b)
 
 class Comparable(object):
+    __slots__ = ()
+
     def _checked_cmp(self, other, f):
         compar = self.__cmp__(other) #pylint: disable=assignment-from-no-return
         return f(compar, 0) if compar is not NotImplemented else compare(id(self), id(other))
@@ -309,12 +411,149 @@ def relpath_or_absolute(path, start, prefix=""):
         return path
 
 def cpu_count():
-    cpus = multiprocessing.cpu_count()
+    # os.cpu_count (Python 3.4+) avoids importing multiprocessing
+    cpus = getattr(os, 'cpu_count', lambda: None)() or multiprocessing.cpu_count()
     if _opts.cpu_count:
         return cpus if cpus <= _opts.cpu_count else _opts.cpu_count
     else:
         return cpus
 
+class _BoundedThreadPool(object):
+    """
+    A pool of daemon threads executing submitted functions. `submit` blocks while `max_pending` functions
+    are waiting to be executed which bounds the memory retained by the arguments of pending functions.
+    `join` waits for all submitted functions to complete and re-raises the first exception raised by any of them.
+
+    :Example:
+
+    with _BoundedThreadPool(4) as pool:
+        for data, path in chunks:
+            pool.submit(write_file, path, data)
+
+    """
+    def __init__(self, jobs=None, max_pending=None):
+        self.jobs = max(1, jobs or cpu_count())
+        self._queue = _queue.Queue(max_pending or 2 * self.jobs)
+        self._errors = []
+        self._threads = []
+        for _ in range(self.jobs):
+            t = Thread(target=self._work)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if not self._errors:
+                    function, args = item
+                    function(*args)
+            except BaseException as e:  # pylint: disable=broad-except
+                self._errors.append((e, sys.exc_info()))
+            finally:
+                self._queue.task_done()
+
+    def submit(self, function, *args):
+        if self._errors:
+            self._raise_error()
+        self._queue.put((function, args))
+
+    def join(self):
+        self._queue.join()
+        if self._errors:
+            self._raise_error()
+
+    def _raise_error(self):
+        e, exc_info = self._errors[0]
+        if _opts.verbose:
+            import traceback
+            log_error(''.join(traceback.format_exception(*exc_info)))
+        raise e
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.join()
+        finally:
+            self.shutdown()
+
+
+def _run_in_threads(function, items, jobs=None):
+    """
+    Applies `function` to each element of `items` using at most `jobs` threads (default: `cpu_count()`)
+    and returns the results in the order of `items`.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if len(items) <= 1 or jobs == 1:
+        return [function(item) for item in items]
+
+    def _apply(index):
+        results[index] = function(items[index])
+
+    with _BoundedThreadPool(min(jobs or cpu_count(), len(items))) as pool:
+        for i in range(len(items)):
+            pool.submit(_apply, i)
+    return results
+
+
+class _ConcurrentZipWriter(object):
+    """
+    A proxy for a `zipfile.ZipFile` opened for writing whose `write` and `writestr` calls are
+    performed by a dedicated thread fed by a bounded queue. This lets the caller produce the
+    entries of one archive while the entries of this archive are written. Any other use of
+    the underlying zip file first waits for all queued writes to complete.
+    """
+    def __init__(self, zf, max_pending=256):
+        self._zf = zf
+        self._names = []
+        self._writer = _BoundedThreadPool(1, max_pending)
+
+    def writestr(self, zinfo_or_arcname, data, *args):
+        if isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            self._names.append(zinfo_or_arcname.filename)
+        else:
+            self._names.append(zipfile.ZipInfo(zinfo_or_arcname).filename)
+        self._writer.submit(self._zf.writestr, zinfo_or_arcname, data, *args)
+
+    def write(self, filename, arcname=None, *args):
+        name = os.path.normpath(os.path.splitdrive(arcname or filename)[1]).lstrip(os.sep)
+        self._names.append(name.replace(os.sep, '/') + ('/' if os.path.isdir(filename) else ''))
+        self._writer.submit(self._zf.write, filename, arcname, *args)
+
+    def namelist(self):
+        return list(self._names)
+
+    def flush(self):
+        self._writer.join()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._writer.shutdown()
+            self._zf.close()
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined by the proxy itself
+        if name.startswith('__') or name in ('_zf', '_names', '_writer'):
+            raise AttributeError(name)
+        self.flush()
+        return getattr(self._zf, name)
+
+
 try: zipfile.ZipFile.__enter__
 except:
     zipfile.ZipFile.__enter__ = lambda self: self
@@ -412,6 +651,14 @@ DEP_KINDS = frozenset([DEP_STANDARD, DEP_BUILD, DEP_ANNOTATION_PROCESSOR, DEP_EX
 def _is_edge_ignored(edge, ignoredEdges):
     return ignoredEdges and edge in ignoredEdges
 
+_DEP_KIND_MASKS = {DEP_STANDARD: 1, DEP_BUILD: 2, DEP_ANNOTATION_PROCESSOR: 4, DEP_EXCLUDED: 8}
+
+def _dep_kinds_mask(kinds):
+    mask = 0
+    for kind in kinds or []:
+        mask |= _DEP_KIND_MASKS.get(kind, 0)
+    return mask
+
 DEBUG_WALK_DEPS = False
 DEBUG_WALK_DEPS_LINE = 1
 def _debug_walk_deps_helper(dep, edge, ignoredEdges):
@@ -425,10 +672,12 @@ def _debug_walk_deps_helper(dep, edge, ignoredEdges):
         DEBUG_WALK_DEPS_LINE += 1
 
 
-class DepEdge:
+class DepEdge(object):
     """
     Represents an edge traversed while visiting a spanning tree of the dependency graph.
     """
+    __slots__ = ('src', 'kind', 'prev')
+
     def __init__(self, src, kind, prev):
         """
         :param src: the source of this dependency edge
@@ -452,6 +701,108 @@ class DepEdge:
         return 1 + self.prev.path_len() if self.prev else 0
 
 
+class _DepWalkFrame(object):
+    """
+    A dependency on the stack of `_walk_deps_from`. `out` iterates over the (kind, destination)
+    pairs of the not ignored out edges of `dep`.
+    """
+    __slots__ = ('dep', 'edge', 'out')
+
+    def __init__(self, dep, edge, out):
+        self.dep = dep
+        self.edge = edge
+        self.out = out
+
+
+"""
+Map from a `Dependency` subclass to whether it overrides `Dependency._walk_deps_visit_edges`
+instead of implementing `Dependency._walk_deps_edge_lists`.
+"""
+_walk_deps_legacy_classes = {}
+
+def _walk_deps_is_legacy(cls):
+    legacy = _walk_deps_legacy_classes.get(cls)
+    if legacy is None:
+        method, base = cls._walk_deps_visit_edges, Dependency._walk_deps_visit_edges
+        legacy = getattr(method, '__func__', method) is not getattr(base, '__func__', base)
+        _walk_deps_legacy_classes[cls] = legacy
+    return legacy
+
+def _walk_deps_out_edges(edge_lists, ignored_mask):
+    for kind, dsts in edge_lists:
+        if not _DEP_KIND_MASKS[kind] & ignored_mask:
+            for dst in dsts:
+                yield kind, dst
+
+def _walk_deps_from(roots, root_edge, visited, preVisit, visit, ignoredEdges, visitEdge):
+    """
+    Iterative implementation of the traversal performed by `Dependency.walk_deps` starting at each of the
+    not yet visited `roots` in turn, reached via `root_edge`. The traversal order and the calls of `preVisit`,
+    `visit` and `visitEdge` are those of a recursive depth first traversal but the depth of the dependency
+    graph is not limited by the Python stack. A `DepEdge` is only created for an edge that is passed to a callback.
+    The dependencies visited by this traversal are tracked by their (integer) identity which avoids calling
+    `Dependency.__hash__` when an edge leads to an already visited dependency. If `visited` is None, the
+    `visited` set is only created if a dependency that overrides `_walk_deps_visit_edges` is reached as
+    such dependencies are traversed by calling that method.
+    """
+    ignored_mask = _dep_kinds_mask(ignoredEdges)
+    legacy_classes = _walk_deps_legacy_classes
+    check_visited = visited is not None
+    seen = {}
+    stack = []
+    roots = iter(roots)
+    dst = None
+    while True:
+        if not stack:
+            for dst in roots:
+                if id(dst) not in seen and not (check_visited and dst in visited):
+                    out_edge = root_edge
+                    break
+            else:
+                return
+        if dst is not None:
+            # enter `dst` reached via `out_edge`
+            if DEBUG_WALK_DEPS:
+                _debug_walk_deps_helper(dst, out_edge, ignoredEdges)
+            seen[id(dst)] = dst
+            if check_visited:
+                visited.add(dst)
+            if not preVisit or preVisit(dst, out_edge):
+                legacy = legacy_classes.get(dst.__class__)
+                if legacy is None:
+                    legacy = _walk_deps_is_legacy(dst.__class__)
+                if legacy:
+                    if not check_visited:
+                        visited = set(seen.values())
+                        check_visited = True
+                    dst._walk_deps_visit_edges(visited, out_edge, preVisit, visit, ignoredEdges, visitEdge)
+                    if visit:
+                        visit(dst, out_edge)
+                else:
+                    stack.append(_DepWalkFrame(dst, out_edge, _walk_deps_out_edges(dst._walk_deps_edge_lists(), ignored_mask)))
+            dst = None
+            if not stack:
+                continue
+        frame = stack[-1]
+        src = frame.dep
+        for kind, dst in frame.out:
+            if visitEdge:
+                out_edge = DepEdge(src, kind, frame.edge)
+                visitEdge(src, dst, out_edge)
+                if id(dst) in seen or (check_visited and dst in visited):
+                    continue
+            elif id(dst) in seen or (check_visited and dst in visited):
+                continue
+            else:
+                out_edge = DepEdge(src, kind, frame.edge)
+            break
+        else:
+            dst = None
+            stack.pop()
+            if visit:
+                visit(src, frame.edge)
+
+
 class SuiteConstituent(Comparable):
     __metaclass__ = ABCMeta
 
@@ -460,7 +811,7 @@ class SuiteConstituent(Comparable):
         :type name: str
         :type suite: Suite
         """
-        self.name = name
+        self.name = _intern(name)
         self.suite = suite
 
         # Should this constituent be visible outside its suite
@@ -659,24 +1010,23 @@ class Dependency(SuiteConstituent):
         if visited is not None:
             if self in visited:
                 return
-        else:
-            visited = set()
         if not ignoredEdges:
             # Default ignored edges
             ignoredEdges = [DEP_ANNOTATION_PROCESSOR, DEP_EXCLUDED, DEP_BUILD]
-        self._walk_deps_helper(visited, None, preVisit, visit, ignoredEdges, visitEdge)
+        _walk_deps_from([self], None, visited, preVisit, visit, ignoredEdges, visitEdge)
 
     def _walk_deps_helper(self, visited, edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        _debug_walk_deps_helper(self, edge, ignoredEdges)
         assert self not in visited, self
-        visited.add(self)
-        if not preVisit or preVisit(self, edge):
-            self._walk_deps_visit_edges(visited, edge, preVisit, visit, ignoredEdges, visitEdge)
-            if visit:
-                visit(self, edge)
+        _walk_deps_from([self], edge, visited, preVisit, visit, ignoredEdges, visitEdge)
+
+    def _walk_deps_edge_lists(self):
+        """
+        Gets the out edges of this dependency as a list of (kind, dependencies) pairs where kind is one of the values in `DEP_KINDS`.
+        """
+        nyi('_walk_deps_edge_lists', self)
 
     def _walk_deps_visit_edges(self, visited, edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        nyi('_walk_deps_visit_edges', self)
+        self._walk_deps_visit_edges_helper(self._walk_deps_edge_lists(), visited, edge, preVisit, visit, ignoredEdges, visitEdge)
 
     def _walk_deps_visit_edges_helper(self, deps, visited, in_edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
         for dep_type, dep_list in deps:
@@ -1100,6 +1450,7 @@ class Distribution(Dependency):
             self.deps.remove(dep)
         if dep in self.buildDependencies:
             self.buildDependencies.remove(dep)
+        _invalidate_dep_graph(removed=[self])
 
     def resolveDeps(self):
         self._resolveDepsHelper(self.deps, fatalIfMissing=not isinstance(self.suite, BinarySuite))
@@ -1120,9 +1471,8 @@ class Distribution(Dependency):
         if licenseId:
             self.theLicense = get_license(licenseId, context=self)
 
-    def _walk_deps_visit_edges(self, visited, in_edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        deps = [(DEP_STANDARD, self.deps), (DEP_EXCLUDED, self.excludedLibs), (DEP_BUILD, self.buildDependencies)]
-        self._walk_deps_visit_edges_helper(deps, visited, in_edge, preVisit=preVisit, visit=visit, ignoredEdges=ignoredEdges, visitEdge=visitEdge)
+    def _walk_deps_edge_lists(self):
+        return [(DEP_STANDARD, self.deps), (DEP_EXCLUDED, self.excludedLibs), (DEP_BUILD, self.buildDependencies)]
 
     def make_archive(self):
         nyi('make_archive', self)
@@ -1369,6 +1719,16 @@ class JARDistribution(Distribution, ClasspathDependency):
         assert self._sources_path != '<uninitialized>'
         return self._sources_path
 
+    def _sources_skipped(self):
+        """
+        Determines if the separate sources archive of this distribution is not built because of `--no-sources`.
+        `sourcesPath` still denotes where the archive would be. The archive is built anyway if a distribution
+        with unified sources archives this one, as that distribution copies the sources from it.
+        """
+        if not getattr(_opts, 'no_sources', False) or self._sources_path is None or self._sources_path == self.original_path():
+            return False
+        return self not in _get_unified_sources_archived()
+
     def maxJavaCompliance(self):
         """:rtype : JavaCompliance"""
         assert not self.suite.isBinarySuite()
@@ -1450,16 +1810,24 @@ class JARDistribution(Distribution, ClasspathDependency):
 
         # are sources combined into main archive?
         unified = self.original_path() == self.sourcesPath
+        sources_skipped = self._sources_skipped()
         snippetsPattern = None
         if hasattr(self.suite, 'snippetsPattern'):
             snippetsPattern = re.compile(self.suite.snippetsPattern)
 
         versioned_meta_inf_re = re.compile(r'META-INF/versions/([1-9][0-9]*)/META-INF/')
 
+        if sources_skipped and exists(self.sourcesPath):
+            # do not leave a stale sources archive behind
+            os.remove(self.sourcesPath)
+
         services = {}
         manifestEntries = [] # list of "<name>: <value>" strings
         with Archiver(self.original_path()) as arc:
-            with Archiver(None if unified else self.sourcesPath) as srcArcRaw:
+            with Archiver(None if unified or sources_skipped else self.sourcesPath) as srcArcRaw:
+                if srcArcRaw.zf:
+                    # the sources archive is written by a separate thread while the class files are archived
+                    srcArcRaw.zf = _ConcurrentZipWriter(srcArcRaw.zf)
                 srcArc = arc if unified else srcArcRaw
 
                 for a in self.archiveparticipants:
@@ -1651,8 +2019,9 @@ class JARDistribution(Distribution, ClasspathDependency):
                     elif dep.isMavenProject():
                         logv('[' + self.original_path() + ': adding jar from Maven project ' + dep.name + ']')
                         addFromJAR(dep.classpath_repr())
-                        for srcDir in dep.source_dirs():
-                            addSrcFromDir(srcDir)
+                        if srcArc.zf:
+                            for srcDir in dep.source_dirs():
+                                addSrcFromDir(srcDir)
                     elif dep.isJavaProject():
                         p = dep
                         javaCompliance = self.maxJavaCompliance()
@@ -1857,7 +2226,7 @@ class JARDistribution(Distribution, ClasspathDependency):
         return JARArchiveTask(args, self)
 
     def exists(self):
-        return exists(self.path) and not self.sourcesPath or exists(self.sourcesPath) #pylint: disable=consider-using-ternary
+        return exists(self.path) and (not self.sourcesPath or self._sources_skipped() or exists(self.sourcesPath))
 
     def remoteExtension(self):
         return 'jar'
@@ -1868,7 +2237,7 @@ class JARDistribution(Distribution, ClasspathDependency):
     def getArchivableResults(self, use_relpath=True, single=False):
         yield self.path, self.default_filename()
         if not single:
-            if self.sourcesPath:
+            if self.sourcesPath and not self._sources_skipped():
                 yield self.sourcesPath, self.default_source_filename()
             if self.is_stripped():
                 yield self.strip_mapping_file(), self.default_filename() + JARDistribution._strip_map_file_suffix
@@ -1877,7 +2246,7 @@ class JARDistribution(Distribution, ClasspathDependency):
         res = _needsUpdate(newestInput, self.path)
         if res:
             return res
-        if self.sourcesPath:
+        if self.sourcesPath and not self._sources_skipped():
             res = _needsUpdate(newestInput, self.sourcesPath)
             if res:
                 return res
@@ -1981,7 +2350,8 @@ class JARArchiveTask(AbstractArchiveTask):
         return False
 
     def newestOutput(self):
-        return TimeStampFile.newest([self.subject.path, self.subject.sourcesPath])
+        sourcesPath = None if self.subject._sources_skipped() else self.subject.sourcesPath
+        return TimeStampFile.newest([p for p in (self.subject.path, sourcesPath) if p])
 
     def clean(self, forBuild=False):
         if isinstance(self.subject.suite, BinarySuite):  # make sure we never clean distributions from BinarySuites
@@ -2033,67 +2403,337 @@ class AbstractDistribution(Distribution):
         return DefaultArchiveTask(args, self)
 
 
+class _TarCompression(object):
+    """
+    A compression format for tar files. Data is streamed through an external binary if one can be
+    found on the PATH (preferring multi-threaded implementations) and through a python module otherwise.
+
+    :param str name: name of the format, also the extension appended to `.tar`
+    :param list binaries: candidate binaries, probed in order with `-V`
+    :param list compress_args: arguments making a binary compress stdin (or a file argument) to stdout
+    :param list decompress_args: arguments making a binary decompress a file argument to stdout
+    :param list short_extensions: alternative single extensions (e.g. `tgz`)
+    """
+    def __init__(self, name, binaries, compress_args, decompress_args, short_extensions=None):
+        self.name = name
+        self.binaries = binaries
+        self.compress_args = compress_args
+        self.decompress_args = decompress_args
+        self.short_extensions = short_extensions or []
+        self._binary = None
+        self._probed = False
+
+    def extensions(self):
+        return ['tar.' + self.name] + self.short_extensions
+
+    def binary(self):
+        """
+        Gets the first binary in `self.binaries` that can be executed or None.
+        """
+        if not self._probed:
+            for binary_name in self.binaries:
+                try:
+                    ret_code = run([binary_name, '-V'], nonZeroIsFatal=False, err=subprocess.STDOUT, out=OutputCapture())
+                except OSError as e:
+                    ret_code = e
+                if ret_code == 0:
+                    self._binary = binary_name
+                    break
+            self._probed = True
+        return self._binary
+
+    def _module_open(self, path, mode):
+        """
+        Opens `path` for compressed reading or writing with a python module or returns None if no
+        module supporting this format can be imported.
+        """
+        nyi('_module_open', self)
+
+    def tarfile_can_read(self):
+        """
+        Determines if `tarfile.open` can transparently decompress this format.
+        """
+        return False
+
+    def is_available(self):
+        return self.binary() is not None or self._has_module()
+
+    def _has_module(self):
+        return False
+
+    def _abort_unavailable(self):
+        abort("Cannot handle '{}' archives: none of {} could be found on the PATH and no python module supports this format".format(
+            self.extensions()[0], ', '.join(self.binaries)))
+
+    def compress(self, src, dst):
+        """
+        Compresses the file `src` to `dst`.
+        """
+        if self.binary():
+            with open(dst, 'wb') as out:
+                run([self.binary()] + self.compress_args + [src], out=out)
+        elif self._has_module():
+            with self._module_open(dst, 'wb') as compressed, open(src, 'rb') as fp:
+                shutil.copyfileobj(fp, compressed, 1024 * 1024)
+        else:
+            self._abort_unavailable()
+
+    def decompress(self, src, dst):
+        """
+        Decompresses the file `src` to `dst`.
+        """
+        if self.binary():
+            with open(dst, 'wb') as out:
+                run([self.binary()] + self.decompress_args + [src], out=out)
+        elif self._has_module():
+            with self._module_open(src, 'rb') as compressed, open(dst, 'wb') as fp:
+                shutil.copyfileobj(compressed, fp, 1024 * 1024)
+        else:
+            self._abort_unavailable()
+
+    def open_writer(self, dst):
+        """
+        Opens a file-like object to which uncompressed data can be written. The compressed data
+        is written to `dst` once the returned object is closed.
+        """
+        if self.binary():
+            return _CompressingPipe([self.binary()] + self.compress_args, dst)
+        elif self._has_module():
+            return self._module_open(dst, 'wb')
+        self._abort_unavailable()
+        return None
+
+    @staticmethod
+    def for_path(path):
+        """
+        Gets the compression of the tar file at `path` based on its extension. Returns None
+        for uncompressed tar files and for paths that do not denote tar files.
+
+        :rtype: _TarCompression | None
+        """
+        for compression in _tar_compressions.values():
+            for extension in compression.extensions():
+                if path.endswith('.' + extension):
+                    return compression
+        return None
+
+    @staticmethod
+    def get(name, context=None):
+        """:rtype: _TarCompression"""
+        compression = _tar_compressions.get(name)
+        if compression is None:
+            abort("Unknown tar compression '{}'. Supported: {}".format(name, ', '.join(sorted(_tar_compressions.keys()))), context=context)
+        return compression
+
+
+class _GzipTarCompression(_TarCompression):
+    def __init__(self):
+        # force, quiet, (decompress,) cat to stdout
+        super(_GzipTarCompression, self).__init__('gz', ['pigz', 'gzip'], ['-f', '-q', '-c'], ['-f', '-q', '-d', '-c'], ['tgz'])
+
+    def _has_module(self):
+        return True
+
+    def _module_open(self, path, mode):
+        return gzip.open(path, mode)
+
+    def tarfile_can_read(self):
+        return True
+
+
+class _XzTarCompression(_TarCompression):
+    def __init__(self):
+        # use all cores, quiet, (decompress,) cat to stdout
+        super(_XzTarCompression, self).__init__('xz', ['xz'], ['-T0', '-q', '-c'], ['-d', '-q', '-c'], ['txz'])
+
+    def _has_module(self):
+        try:
+            import lzma  # pylint: disable=unused-variable,import-error
+            return True
+        except ImportError:
+            return False
+
+    def _module_open(self, path, mode):
+        import lzma  # pylint: disable=import-error
+        return lzma.open(path, mode)
+
+    def tarfile_can_read(self):
+        return self._has_module()
+
+
+class _ZstdTarCompression(_TarCompression):
+    def __init__(self):
+        # use all cores, quiet, (decompress,) cat to stdout
+        super(_ZstdTarCompression, self).__init__('zst', ['zstd'], ['-T0', '-q', '-c'], ['-d', '-q', '-c'], ['tzst'])
+
+    def _has_module(self):
+        try:
+            import zstandard  # pylint: disable=unused-variable,import-error
+            return True
+        except ImportError:
+            return False
+
+    def _module_open(self, path, mode):
+        import zstandard  # pylint: disable=import-error
+        fp = open(path, mode)
+        if 'w' in mode:
+            return _ClosingStream(zstandard.ZstdCompressor(threads=-1).stream_writer(fp), fp)
+        return _ClosingStream(zstandard.ZstdDecompressor().stream_reader(fp), fp)
+
+
+_tar_compressions = OrderedDict((c.name, c) for c in [_GzipTarCompression(), _XzTarCompression(), _ZstdTarCompression()])
+
+
+class _ClosingStream(object):
+    """
+    Wraps a (de)compressing stream so that closing it also closes the underlying file.
+    """
+    def __init__(self, stream, fp):
+        self.stream = stream
+        self.fp = fp
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def write(self, data):
+        return self.stream.write(data)
+
+    def close(self):
+        self.stream.close()
+        if not self.fp.closed:
+            self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _CompressingPipe(object):
+    """
+    A writable file-like object that pipes the written data through a compressor process into a file.
+    """
+    def __init__(self, args, dst):
+        self.args = args
+        self.out = open(dst, 'wb')
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=self.out)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        if self.process.stdin.closed:
+            return
+        self.process.stdin.close()
+        retcode = self.process.wait()
+        self.out.close()
+        if retcode != 0:
+            abort('Compressing with {} failed with exit code {}'.format(' '.join(self.args), retcode))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _DecompressedTarFile(object):
+    """
+    Context manager opening a compressed tar file that `tarfile` cannot decompress itself. The
+    archive is decompressed to a temporary file first since random access to the members is needed.
+    """
+    def __init__(self, path, compression):
+        self.path = path
+        self.compression = compression
+        self.tmp = None
+        self.tf = None
+
+    def __enter__(self):
+        fd, self.tmp = mkstemp(suffix='.tar', prefix=basename(self.path) + '.', dir=dirname(realpath(self.path)))
+        os.close(fd)
+        self.compression.decompress(self.path, self.tmp)
+        self.tf = tarfile.open(self.tmp, 'r:')
+        return self.tf
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.tf:
+            self.tf.close()
+        if self.tmp and exists(self.tmp):
+            os.remove(self.tmp)
+
+
+def _open_tar(path):
+    """
+    Gets a context manager providing the tar file at `path` open for reading, whatever its compression.
+    """
+    compression = _TarCompression.for_path(path)
+    if compression is None or compression.tarfile_can_read():
+        return tarfile.open(path)
+    return _DecompressedTarFile(path, compression)
+
+
 class AbstractTARDistribution(AbstractDistribution):
+    """
+    A distribution that is an uncompressed tar file locally. The `remoteCompression` attribute selects
+    the format used when it is deployed and pulled: `gz` (the default), `xz`, `zst` or `none` (store only).
+    """
     __metaclass__ = ABCMeta
-    __gzip_binary = None
+
+    def remote_compression(self):
+        """
+        Gets the compression of the deployed form of this distribution or None if it is deployed uncompressed.
+
+        :rtype: _TarCompression | None
+        """
+        name = getattr(self, 'remoteCompression', 'gz')
+        if name == 'none':
+            return None
+        return _TarCompression.get(name, context=self)
 
     def remoteExtension(self):
-        return 'tar.gz'
+        compression = self.remote_compression()
+        return 'tar.' + compression.name if compression else 'tar'
 
     def localExtension(self):
         return 'tar'
 
     def postPull(self, f):
-        assert f.endswith('.gz')
-        logv('Uncompressing {}...'.format(f))
-        tarfilename = f[:-len('.gz')]
-        if AbstractTARDistribution._has_gzip():
-            with open(tarfilename, 'wb') as tar:
-                # force, quiet, decompress, cat to stdout
-                run([AbstractTARDistribution._gzip_binary(), '-f', '-q', '-d', '-c', f], out=tar)
+        compression = self.remote_compression()
+        if compression:
+            assert f.endswith('.' + compression.name)
+            logv('Uncompressing {}...'.format(f))
+            tarfilename = f[:-len('.' + compression.name)]
+            compression.decompress(f, tarfilename)
+            os.remove(f)
         else:
-            with gzip.open(f, 'rb') as gz, open(tarfilename, 'wb') as tar:
-                shutil.copyfileobj(gz, tar)
-        os.remove(f)
+            tarfilename = f
         if self.output:
             output = self.get_output()
             with tarfile.open(tarfilename, 'r:') as tar:
                 logv('Extracting {} to {}'.format(tarfilename, output))
                 tar.extractall(output)
-        return tarfilename
+        # an uncompressed pull is already in place
+        return tarfilename if compression else None
 
     def prePush(self, f):
-        tgz = f + '.gz'
+        compression = self.remote_compression()
+        if not compression:
+            return f
+        compressed = f + '.' + compression.name
         logv('Compressing {}...'.format(f))
-        if AbstractTARDistribution._has_gzip():
-            with open(tgz, 'wb') as tar:
-                # force, quiet, cat to stdout
-                run([AbstractTARDistribution._gzip_binary(), '-f', '-q', '-c', f], out=tar)
-        else:
-            with gzip.open(tgz, 'wb') as gz, open(f, 'rb') as tar:
-                shutil.copyfileobj(tar, gz)
-        return tgz
+        compression.compress(f, compressed)
+        return compressed
 
     @staticmethod
     def _gzip_binary():
         if not AbstractTARDistribution._has_gzip():
             abort("No gzip binary could be found")
-        return AbstractTARDistribution.__gzip_binary
+        return _tar_compressions['gz'].binary()
 
     @staticmethod
     def _has_gzip():
-        if AbstractTARDistribution.__gzip_binary is None:
-            # Probe for pigz (parallel gzip) first and then try common gzip
-            for binary_name in ["pigz", "gzip"]:
-                gzip_ret_code = None
-                try:
-                    gzip_ret_code = run([binary_name, '-V'], nonZeroIsFatal=False, err=subprocess.STDOUT, out=OutputCapture())
-                except OSError as e:
-                    gzip_ret_code = e
-                if gzip_ret_code == 0:
-                    AbstractTARDistribution.__gzip_binary = binary_name
-                    break
-        return AbstractTARDistribution.__gzip_binary is not None
+        return _tar_compressions['gz'].binary() is not None
 
 
 class AbstractJARDistribution(AbstractDistribution):
@@ -2201,7 +2841,7 @@ class NativeTARDistribution(AbstractTARDistribution):
                     name = normpath(name)
                     if name != dest:
                         ensure_dirname_exists(dest)
-                        shutil.copy2(name, dest)
+                        _materialize_file(name, dest, shutil.copy2)
 
             for d in self.archived_deps():
                 if d.isNativeProject() or d.isArchivableProject():
@@ -2419,7 +3059,7 @@ class LayoutDistribution(AbstractDistribution):
             else:
                 ensure_dir_exists(dirname(absolute_destination))
                 archiver.add(src, dst, provenance)
-                shutil.copy(src, absolute_destination)
+                _materialize_file(src, absolute_destination, shutil.copy)
 
         def _install_source_files(files, include=None, excludes=None, optional=False):
             excludes = excludes or []
@@ -2521,17 +3161,20 @@ class LayoutDistribution(AbstractDistribution):
 
             if ext.endswith('zip') or ext.endswith('jar'):
                 with zipfile.ZipFile(source_archive_file) as zf:
+                    selected = []
                     for zipinfo in zf.infolist():
                         zipinfo.filename, _ = _filter_archive_name(zipinfo.filename)
-                        if not zipinfo.filename:
-                            continue
-                        extracted_file = zf.extract(zipinfo, unarchiver_dest_directory)
-                        unix_attributes = (zipinfo.external_attr >> 16) & 0xFFFF
-                        if unix_attributes != 0:
-                            os.chmod(extracted_file, unix_attributes)
-                        archiver.add(extracted_file, os.path.relpath(extracted_file, output), provenance)
-            elif 'tar' in ext or ext.endswith('tgz'):
-                with tarfile.TarFile.open(source_archive_file) as tf:
+                        if zipinfo.filename:
+                            selected.append(zipinfo)
+                # extract in parallel, then add to the archive in the original order
+                extracted_files = _extract_zip_members(source_archive_file, selected, unarchiver_dest_directory)
+                for zipinfo, extracted_file in zip(selected, extracted_files):
+                    unix_attributes = (zipinfo.external_attr >> 16) & 0xFFFF
+                    if unix_attributes != 0:
+                        os.chmod(extracted_file, unix_attributes)
+                    archiver.add(extracted_file, os.path.relpath(extracted_file, output), provenance)
+            elif 'tar' in ext or _TarCompression.for_path(source_archive_file):
+                with _open_tar(source_archive_file) as tf:
                     # from tarfile.TarFile.extractall:
                     directories = []
                     for tarinfo in tf:
@@ -2636,6 +3279,8 @@ class LayoutDistribution(AbstractDistribution):
     def make_archive(self):
         self._verify_layout()
         output = realpath(self.get_output())
+        # scan the inputs before they are read so that modifications during the build are seen by the next build
+        input_manifest = list(self._scan_file_inputs())
         with self.archive_factory(self.path,
                                   kind=self.localExtension(),
                                   duplicates_action='warn',
@@ -2645,6 +3290,7 @@ class LayoutDistribution(AbstractDistribution):
             for destination, source in self._walk_layout():
                 self._install_source(source, output, destination, arc)
         self._persist_layout()
+        self._persist_input_manifest(input_manifest)
 
     def needsUpdate(self, newestInput):
         sup = super(LayoutDistribution, self).needsUpdate(newestInput)
@@ -2652,37 +3298,122 @@ class LayoutDistribution(AbstractDistribution):
             return sup
         for destination, source in self._walk_layout():
             source_type = source['source_type']
-            if source_type == 'file':
-                for source_file in glob.iglob(join(self.suite.dir, source['path'])):
-                    up = _needsUpdate(source_file, self.path)
-                    if up:
-                        return up
-                    if islink(source_file):
-                        source_file = join(dirname(source_file), os.readlink(source_file))
-                        up = _needsUpdate(source_file, self.path)
-                        if up:
-                            return up
-                    elif isdir(source_file):
-                        for root, _, files in os.walk(source_file):
-                            up = _needsUpdate(root, self.path)
-                            if up:
-                                return up
-                            for f in files:
-                                up = _needsUpdate(join(root, f), self.path)
-                                if up:
-                                    return up
-            elif source_type == 'link':
-                pass  # this is handled by _persist_layout
-            elif source_type == 'string':
-                pass  # this is handled by _persist_layout
-            elif source_type in ('dependency', 'extracted-dependency'):
-                pass  # this is handled by a build task dependency
-            else:
-                abort("Unsupported source type: '{}' in '{}'".format(source_type, destination), context=suite)
+            if source_type not in ('file', 'link', 'string', 'dependency', 'extracted-dependency'):
+                abort("Unsupported source type: '{}' in '{}'".format(source_type, destination), context=self)
         if not self._check_persisted_layout():
             return "layout definition has changed"
+        start = time.time()
+        manifest = self._load_input_manifest()
+        if manifest is None:
+            # no manifest from a previous build: fall back to comparing with the archive's time stamp
+            archive_timestamp = TimeStampFile(self.path, followSymlinks=False)
+            reason = None
+            for path, _, mtime in self._scan_file_inputs():
+                if archive_timestamp.isOlderThan(mtime):
+                    reason = '{} is older than {}'.format(archive_timestamp, path)
+                    break
+        else:
+            reason = LayoutDistribution._compare_input_manifest(manifest, self._scan_file_inputs())
+        logv('[{}: checked file inputs in {:.3f}s]'.format(self.name, time.time() - start))
+        return reason
+
+    @staticmethod
+    def _compare_input_manifest(manifest, current_inputs):
+        """
+        Compares the saved `manifest` with `current_inputs` in order and stops at the first difference.
+        Returns a string describing the difference or None.
+        """
+        saved = iter(manifest)
+        for current in current_inputs:
+            previous = next(saved, None)
+            if previous is None:
+                return '{} was added'.format(current[0])
+            if previous[0] != current[0]:
+                return '{} was added or {} was removed'.format(current[0], previous[0])
+            if previous[1] != current[1] or previous[2] != current[2]:
+                return '{} has changed'.format(current[0])
+        previous = next(saved, None)
+        if previous is not None:
+            return '{} was removed'.format(previous[0])
         return None
 
+    def _scan_file_inputs(self):
+        """
+        Yields a `(path, size, mtime)` tuple, in a stable order, for each file, directory and symlink target
+        read by the `file` sources of this layout. Paths under the suite directory are relative to it.
+        """
+        suite_prefix = self.suite.dir + os.sep
+        scandir = getattr(os, 'scandir', None)
+
+        def _entry(path, st):
+            if path.startswith(suite_prefix):
+                path = path[len(suite_prefix):]
+            return path, st.st_size, st.st_mtime
+
+        def _followed_stat(path, st):
+            try:
+                return os.stat(path)
+            except OSError:
+                return st  # dangling link
+
+        def _scan_dir(directory):
+            if scandir:
+                entries = sorted(((e.name, e) for e in scandir(directory)), key=lambda e: e[0])
+                for name, e in entries:
+                    path = join(directory, name)
+                    st = e.stat(follow_symlinks=False)
+                    if e.is_symlink():
+                        yield _entry(path, _followed_stat(path, st))
+                    else:
+                        yield _entry(path, st)
+                        if e.is_dir(follow_symlinks=False):
+                            for sub in _scan_dir(path):
+                                yield sub
+            else:
+                for name in sorted(os.listdir(directory)):
+                    path = join(directory, name)
+                    st = os.lstat(path)
+                    if islink(path):
+                        yield _entry(path, _followed_stat(path, st))
+                    else:
+                        yield _entry(path, st)
+                        if isdir(path):
+                            for sub in _scan_dir(path):
+                                yield sub
+
+        for _, source in self._walk_layout():
+            if source['source_type'] != 'file':
+                continue
+            for source_file in sorted(glob.glob(join(self.suite.dir, source['path']))):
+                st = os.lstat(source_file)
+                yield _entry(source_file, st)
+                if islink(source_file):
+                    link_target = join(dirname(source_file), os.readlink(source_file))
+                    yield _entry(link_target, _followed_stat(link_target, st))
+                elif isdir(source_file):
+                    for entry in _scan_dir(source_file):
+                        yield entry
+
+    def _input_manifest_file(self):
+        return self._persisted_layout_file() + '.inputs'
+
+    def _load_input_manifest(self):
+        manifest_file = self._input_manifest_file()
+        if not exists(manifest_file) or not exists(self._persisted_layout_file()):
+            return None
+        try:
+            with open(manifest_file) as fp:
+                return [tuple(e) for e in json.load(fp)]
+        except ValueError as e:
+            logv('Ignoring corrupt input manifest {}: {}'.format(manifest_file, e))
+            return None
+
+    def _persist_input_manifest(self, manifest):
+        manifest_file = self._input_manifest_file()
+        ensure_dir_exists(dirname(manifest_file))
+        with SafeFileCreation(manifest_file) as sfc, open(sfc.tmpPath, 'w') as fp:
+            json.dump(manifest, fp, separators=(',', ':'))
+
     def _persist_layout(self):
         saved_layout_file = self._persisted_layout_file()
         current_layout = LayoutDistribution._layout_to_stable_str(self.layout)
@@ -2854,11 +3585,11 @@ class Project(Dependency):
             return os.sep.join([self.get_output_base(), '{}-parent-{}'.format(self.suite, parents)] + names[parents:] + [self.name])
         return join(self.get_output_base(), self.subDir, self.name)
 
-    def _walk_deps_visit_edges(self, visited, in_edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
+    def _walk_deps_edge_lists(self):
         deps = [(DEP_STANDARD, self.deps)]
         if hasattr(self, 'buildDependencies'):
             deps.append((DEP_BUILD, self.buildDependencies))
-        self._walk_deps_visit_edges_helper(deps, visited, in_edge, preVisit=preVisit, visit=visit, ignoredEdges=ignoredEdges, visitEdge=visitEdge)
+        return deps
 
     def _compute_max_dep_distances(self, dep, distances, dist):
         currentDist = distances.get(dep)
@@ -3093,10 +3824,8 @@ class JavaProject(Project, ClasspathDependency):
                 if isinstance(dep, Project) and dep.is_test_project():
                     abort('Non-test project {} can not depend on the test project {}'.format(self.name, dep.name))
 
-    def _walk_deps_visit_edges(self, visited, in_edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        deps = [(DEP_ANNOTATION_PROCESSOR, self.declaredAnnotationProcessors)]
-        self._walk_deps_visit_edges_helper(deps, visited, in_edge, preVisit, visit, ignoredEdges, visitEdge)
-        Project._walk_deps_visit_edges(self, visited, in_edge, preVisit, visit, ignoredEdges, visitEdge)
+    def _walk_deps_edge_lists(self):
+        return [(DEP_ANNOTATION_PROCESSOR, self.declaredAnnotationProcessors)] + Project._walk_deps_edge_lists(self)
 
     def source_gen_dir_name(self):
         """
@@ -3760,7 +4489,7 @@ class JavaBuildTask(ProjectBuildTask):
                 ensure_dir_exists(dirname(dst))
                 dstFile = TimeStampFile(dst)
                 if dstFile.isOlderThan(src):
-                    shutil.copyfile(src, dst)
+                    _materialize_file(src, dst)
                     self._newestOutput = dstFile
         if self._nonJavaFileCount():
             logvv('Finished resource copy for {}'.format(self.subject.name))
@@ -3784,7 +4513,7 @@ class JavaBuildTask(ProjectBuildTask):
             for src, dst in self.copyfiles:
                 ensure_dir_exists(dirname(dst))
                 if not exists(dst) or getmtime(dst) < getmtime(src):
-                    shutil.copyfile(src, dst)
+                    _materialize_file(src, dst)
                     self._newestOutput = TimeStampFile(dst)
             logvv('Finished copying files from dependencies for {}'.format(self.subject.name))
 
@@ -4534,79 +5263,710 @@ def _make_absolute(path, prefix):
 def sha1(args):
     """generate sha1 digest for given file"""
     parser = ArgumentParser(prog='sha1')
-    parser.add_argument('--path', action='store', help='path to file', metavar='<path>', required=True)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--path', action='store', help='path to file', metavar='<path>')
+    group.add_argument('--verify-cache', action='store_true', help='verify the SHA1 digests of all files in the download cache')
     parser.add_argument('--plain', action='store_true', help='just the 40 chars', )
+    parser.add_argument('--no-index', action='store_false', dest='index', help='hash the files even if their digest is in the SHA1 index')
     args = parser.parse_args(args)
-    value = sha1OfFile(args.path)
+    if args.verify_cache:
+        if not _verify_cache_sha1s(use_index=args.index):
+            abort(1)
+        return
+    value = sha1OfFile(args.path) if args.index else _compute_sha1(args.path)
     if args.plain:
         sys.stdout.write(value)
     else:
         print('sha1 of ' + args.path + ': ' + value)
 
 
-def sha1OfFile(path):
-    with open(path, 'rb') as f:
-        d = hashlib.sha1()
-        while True:
-            buf = f.read(4096)
-            if not buf:
-                break
-            d.update(buf)
-        return d.hexdigest()
+def _compute_sha1(path):
+    with open(path, 'rb') as f:
+        d = hashlib.sha1()
+        while True:
+            buf = f.read(1024 * 1024)
+            if not buf:
+                break
+            d.update(buf)
+        return d.hexdigest()
+
+
+class _Sha1Index(object):
+    """
+    A persistent index of the SHA1 digests of the files in the download cache, keyed by the real path
+    of a file and validated against its inode, size and modification time (in nanoseconds). This avoids
+    rehashing large files whose `.sha1` side file is missing or older than the file (e.g. after the cache
+    was copied or restored). The digests computed by a process are saved once when it exits.
+    """
+    _version = 1
+
+    def __init__(self, path, root):
+        self.path = path
+        self.root = realpath(root) + os.sep
+        self._entries = None
+        self._updated = {}
+        self._save_registered = False
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(st):
+        mtime_ns = getattr(st, 'st_mtime_ns', None)
+        if mtime_ns is None:
+            mtime_ns = int(st.st_mtime * 1000000000)
+        return [st.st_ino, st.st_size, mtime_ns]
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path) as fp:
+                    index = json.load(fp)
+                if index.get('version') == _Sha1Index._version:
+                    self._entries = index['entries']
+            except (IOError, OSError, ValueError, KeyError, AttributeError):
+                pass
+        return self._entries
+
+    def covers(self, path):
+        """
+        Determines if the file denoted by `path` is in the directory whose files are indexed.
+        """
+        return realpath(path).startswith(self.root)
+
+    def lookup(self, path, st=None):
+        """
+        Gets the indexed digest of `path` or None if the file is not indexed or changed since it was indexed.
+        """
+        st = st or os.stat(path)
+        with self._lock:
+            entry = self._load().get(realpath(path))
+        if entry and entry[:3] == _Sha1Index._key(st):
+            return entry[3]
+        return None
+
+    def digest(self, path, force=False):
+        """
+        Gets the SHA1 digest of `path`, computing and indexing it if necessary (or if `force` is True).
+        A newly computed digest is saved when this process exits.
+        """
+        assert self.covers(path), path
+        st = os.stat(path)
+        value = None if force else self.lookup(path, st)
+        if value is None:
+            value = _compute_sha1(path)
+            if os.stat(path).st_mtime == st.st_mtime:
+                entry = _Sha1Index._key(st) + [value]
+                with self._lock:
+                    self._load()[realpath(path)] = entry
+                    self._updated[realpath(path)] = entry
+                    if not self._save_registered:
+                        self._save_registered = True
+                        import atexit
+                        atexit.register(self.save)
+        return value
+
+    def save(self, force=False):
+        """
+        Merges the digests computed by this process into the index file and removes the entries
+        for files that no longer exist. Unless `force` is True, nothing is written if this process
+        computed no digests.
+        """
+        with self._lock:
+            if not self._updated and not force:
+                return
+            updated = self._updated
+            self._updated = {}
+            self._entries = None
+            entries = self._load()
+            entries.update(updated)
+            for p in [p for p in entries if not exists(p)]:
+                del entries[p]
+            try:
+                with SafeFileCreation(self.path) as sfc, open(sfc.tmpPath, 'w') as fp:
+                    json.dump({'version': _Sha1Index._version, 'entries': entries}, fp, separators=(',', ':'))
+            except (IOError, OSError) as e:
+                logv('Could not save SHA1 index to {}: {}'.format(self.path, e))
+
+
+_sha1_index_instance = None
+
+
+def _sha1_index():
+    """
+    :rtype: _Sha1Index
+    """
+    global _sha1_index_instance
+    cache = _cache_dir()
+    if _sha1_index_instance is None or _sha1_index_instance.path != join(cache, 'sha1-index.json'):
+        _sha1_index_instance = _Sha1Index(join(cache, 'sha1-index.json'), cache)
+    return _sha1_index_instance
+
+
+def sha1OfFile(path):
+    index = _sha1_index()
+    if index.covers(path):
+        return index.digest(path)
+    return _compute_sha1(path)
+
+
+def _verify_cache_sha1s(use_index=True, jobs=None):
+    """
+    Verifies the files in the download cache against their `.sha1` side files and reports
+    the time that was saved by taking digests from the SHA1 index.
+
+    :return: True if all files match their expected digest
+    """
+    cache = _cache_dir()
+    files = []
+    for root, _, names in os.walk(cache):
+        for name in names:
+            path = join(root, name)
+            if name.endswith('.sha1') and os.path.isfile(path[:-len('.sha1')]):
+                with open(path) as fp:
+                    files.append((path[:-len('.sha1')], fp.read()[0:40]))
+    index = _sha1_index()
+    hashed = []
+    def _verify(item):
+        path, expected = item
+        if use_index:
+            value = index.lookup(path)
+            if value is not None:
+                return value
+        start = time.time()
+        value = index.digest(path, force=not use_index)
+        hashed.append((os.path.getsize(path), time.time() - start))
+        return value
+
+    start = time.time()
+    try:
+        results = _run_in_threads(_verify, files, jobs)
+    finally:
+        index.save(force=True)
+    elapsed = time.time() - start
+
+    ok = True
+    for (path, expected), value in zip(files, results):
+        if value != expected:
+            log_error('SHA1 of {} ({}) does not match expected value ({})'.format(path, value, expected))
+            ok = False
+    total_size = sum((os.path.getsize(path) for path, _ in files))
+    hashed_size = sum((size for size, _ in hashed))
+    hashing_time = sum((seconds for _, seconds in hashed))
+    log('Verified {} files ({} bytes) in {:.2f} seconds, {} files ({} bytes) had to be hashed'.format(len(files), total_size, elapsed, len(hashed), hashed_size))
+    if use_index and total_size > hashed_size:
+        # estimate the time for hashing the indexed files from the measured hashing throughput
+        throughput = hashed_size / hashing_time if hashing_time > 0 and hashed_size > 1024 * 1024 else None
+        if throughput is None:
+            start = time.time()
+            d = hashlib.sha1()
+            buf = b'\0' * (1024 * 1024)
+            for _ in range(64):
+                d.update(buf)
+            throughput = 64 * len(buf) / (time.time() - start)
+        log('The SHA1 index saved hashing {} bytes (about {:.2f} seconds of hashing time)'.format(total_size - hashed_size, (total_size - hashed_size) / throughput))
+    return ok
+
+
+def user_home():
+    return _opts.user_home if hasattr(_opts, 'user_home') else os.path.expanduser('~')
+
+
+def dot_mx_dir():
+    return join(user_home(), '.mx')
+
+
+def is_cache_path(path):
+    return path.startswith(_cache_dir())
+
+
+def _cache_dir():
+    return _cygpathW2U(get_env('MX_CACHE_DIR', join(dot_mx_dir(), 'cache')))
+
+
+def _get_path_in_cache(name, sha1, urls, ext=None, sources=False, oldPath=False):
+    """
+    Gets the path an artifact has (or would have) in the download cache.
+    """
+    assert sha1 != 'NOCHECK', 'artifact for ' + name + ' cannot be cached since its sha1 is NOCHECK'
+    if ext is None:
+        for url in urls:
+            # Use extension of first URL whose path component ends with a non-empty extension
+            o = _urllib_parse.urlparse(url)
+            if o.path == "/remotecontent" and o.query.startswith("filepath"):
+                path = o.query
+            else:
+                path = o.path
+            ext = get_file_extension(path)
+            if ext:
+                ext = '.' + ext
+                break
+        if not ext:
+            abort('Could not determine a file extension from URL(s):\n  ' + '\n  '.join(urls))
+    assert os.sep not in name, name + ' cannot contain ' + os.sep
+    assert os.pathsep not in name, name + ' cannot contain ' + os.pathsep
+    if oldPath:
+        return join(_cache_dir(), name + ('.sources' if sources else '') + '_' + sha1 + ext)  # mx < 5.176.0
+    filename = _map_to_maven_dist_name(name) + ('.sources' if sources else '') + ext
+    return join(_cache_dir(), name + '_' + sha1 + ('.dir' if not ext else ''), filename)
+
+
+_cache_accessed_entries = set()
+
+
+def _cache_entry(path):
+    """
+    Gets the top level file or directory of the download cache containing `path` or None if `path` is not in the cache.
+    Following a symlink to the cache is supported.
+    """
+    if islink(path):
+        path = realpath(path)
+    cache = _cache_dir()
+    if not path.startswith(cache + os.sep):
+        cache = realpath(cache)
+        if not path.startswith(cache + os.sep):
+            return None
+    name = path[len(cache) + 1:].split(os.sep)[0]
+    if name.endswith('.sha1'):
+        # the side file of an old style (mx < 5.176.0) cache entry
+        name = name[:-len('.sha1')]
+    return join(cache, name)
+
+
+def _record_cache_access(path):
+    """
+    Records a use of the download cache entry containing `path` (if any) for the cache GC.
+    The use of a directory entry is recorded in its modification time since its access time
+    also changes whenever it is listed. The use of an old style file entry is recorded in its
+    access time since its modification time validates the `.sha1` side file.
+    """
+    entry = _cache_entry(path)
+    if entry is None or entry in _cache_accessed_entries:
+        return
+    _cache_accessed_entries.add(entry)
+    try:
+        st = os.stat(entry)
+        now = time.time()
+        # a granularity of minutes is good enough for GC and avoids needless metadata writes
+        if isdir(entry):
+            if now - st.st_mtime > 60:
+                os.utime(entry, None)
+        elif now - st.st_atime > 60:
+            os.utime(entry, (now, st.st_mtime))
+    except OSError:
+        pass
+
+
+def _parse_size(value):
+    """
+    Parses a size such as `512M` or `10G` (binary units) into a number of bytes.
+    """
+    m = re.match(r'^(\d+(?:\.\d+)?)([KMGT]?)B?$', value.strip().upper())
+    if not m:
+        raise ArgumentTypeError('invalid size: ' + value)
+    return int(float(m.group(1)) * 1024 ** ' KMGT'.index(m.group(2) or ' '))
+
+
+def _parse_age(value):
+    """
+    Parses an age such as `12h` or `30d` into a number of seconds. A number without unit denotes days.
+    """
+    m = re.match(r'^(\d+(?:\.\d+)?)([smhdw]?)$', value.strip().lower())
+    if not m:
+        raise ArgumentTypeError('invalid age: ' + value)
+    return float(m.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}[m.group(2) or 'd']
+
+
+def _cache_referenced_entries():
+    """
+    Gets the download cache entries referenced by the libraries of the loaded suites, either
+    directly or through a symlink in a suite.
+    """
+    referenced = set()
+    for s in suites(True, includeBinary=True):
+        for l in s.libs:
+            paths = [getattr(l, 'path', None), getattr(l, 'sourcePath', None), getattr(l, 'extract_path', None)]
+            for p in paths:
+                if p:
+                    entry = _cache_entry(_make_absolute(p, s.dir))
+                    if entry:
+                        referenced.add(entry)
+    return referenced
+
+
+class _CacheEntryInfo(object):
+    """
+    The size and time of last use (see `_record_cache_access`) of a download cache entry.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.last_use = 0
+        for p in [path, path + '.sha1']:
+            if lexists(p):
+                st = os.lstat(p)
+                self.size += st.st_size
+                if isdir(p) and not islink(p):
+                    self.last_use = max(self.last_use, st.st_mtime)
+                    for root, dirs, files in os.walk(p):
+                        for name in dirs + files:
+                            self.size += os.lstat(join(root, name)).st_size
+                else:
+                    self.last_use = max(self.last_use, st.st_atime, st.st_mtime)
+
+
+def _try_lock_dir(lock, stale_after):
+    """
+    Tries to acquire the lock `lock` by creating it as a directory. A lock that is older than
+    `stale_after` seconds was left behind by a crashed process and is taken over by renaming
+    it, which only one of the processes attempting this at the same time succeeds with.
+
+    :return: True if the lock was acquired, in which case the caller must remove it with `os.rmdir`
+    """
+    for _ in range(2):
+        try:
+            os.mkdir(lock)
+            return True
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        try:
+            if time.time() - os.path.getmtime(lock) < stale_after:
+                return False
+            stale = '{}.stale-{}'.format(lock, os.getpid())
+            os.rename(lock, stale)
+        except OSError:
+            # released or taken over by another process in the meantime
+            return False
+        if time.time() - os.path.getmtime(stale) < stale_after:
+            # the lock was taken over and acquired again by another process since it was checked
+            try:
+                os.rename(stale, lock)
+            except OSError:
+                os.rmdir(stale)
+            return False
+        os.rmdir(stale)
+    return False
+
+
+def _is_pid_alive(pid):
+    """
+    Determines if a process with id `pid` exists. On Windows, where probing a process with
+    `os.kill` terminates it, the process is assumed to exist.
+    """
+    if is_windows():
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError as e:
+        return e.errno == errno.EPERM
+
+
+def _remove_cache_trash(trash):
+    if isdir(trash) and not islink(trash):
+        rmtree(trash, ignore_errors=True)
+    else:
+        os.remove(trash)
+
+
+def _cache_gc(max_size=None, max_age=None, dry_run=False, grace=600):
+    """
+    Evicts the least recently used entries of the download cache until it is at most `max_size` bytes
+    and holds no entry unused for more than `max_age` seconds. Entries referenced by the loaded suites
+    and entries used within the last `grace` seconds (e.g. by a concurrent mx process) are never evicted.
+    Evicted entries are first renamed so that concurrent mx processes never see partially deleted entries.
+    Renamed entries left behind by a GC that died or failed to delete them are removed once the process
+    that renamed them is gone or they were renamed more than `grace` seconds ago.
+
+    :return: the number of bytes freed
+    """
+    cache = _cache_dir()
+    if not isdir(cache):
+        return 0
+    lock = join(cache, '.gc.lock')
+    if not _try_lock_dir(lock, stale_after=3600):
+        log('Cache garbage collection is already running in another process (' + lock + ')')
+        return 0
+    try:
+        referenced = _cache_referenced_entries() if _primary_suite else set()
+        entries = []
+        total = 0
+        for name in os.listdir(cache):
+            if name.startswith('.evicted-') and not dry_run:
+                _, _, pid = name.rpartition('-')
+                trash = join(cache, name)
+                # renaming an entry updates its ctime
+                if not pid.isdigit() or not _is_pid_alive(int(pid)) or time.time() - os.lstat(trash).st_ctime > grace:
+                    logv('Removing {} left behind by a previous cache garbage collection'.format(trash))
+                    _remove_cache_trash(trash)
+                continue
+            # skip mx metadata (e.g. the SHA1 index) and hidden files such as the lock
+            if name.startswith('.') or name.endswith('.json') or name.endswith('.sha1'):
+                continue
+            info = _CacheEntryInfo(join(cache, name))
+            total += info.size
+            entries.append(info)
+        now = time.time()
+        evict = []
+        size = total
+        for info in sorted(entries, key=lambda e: e.last_use):
+            if info.path in referenced or now - info.last_use < grace:
+                continue
+            if (max_age is not None and now - info.last_use > max_age) or (max_size is not None and size > max_size):
+                evict.append(info)
+                size -= info.size
+        for info in evict:
+            logv('{} {} ({} bytes, last used {})'.format('Would evict' if dry_run else 'Evicting', info.path, info.size, datetime.fromtimestamp(info.last_use)))
+            if not dry_run:
+                for p in [info.path, info.path + '.sha1']:
+                    if lexists(p):
+                        trash = join(cache, '.evicted-' + basename(p) + '-' + str(os.getpid()))
+                        os.rename(p, trash)
+                        _remove_cache_trash(trash)
+        freed = total - size
+        log('{} {} of {} cache entries ({} of {} bytes) in {}'.format('Would evict' if dry_run else 'Evicted', len(evict), len(entries), freed, total, cache))
+        if max_size is not None and size > max_size:
+            log('The cache is still larger than {} bytes since the remaining entries are referenced by the loaded suites or in use'.format(max_size))
+        return freed
+    finally:
+        os.rmdir(lock)
+
+
+def _auto_cache_gc():
+    """
+    Runs the download cache GC if the MX_CACHE_GC_MAX_SIZE or MX_CACHE_GC_MAX_AGE environment variables
+    are set, at most once per MX_CACHE_GC_INTERVAL (default: 1d).
+    """
+    max_size = get_env('MX_CACHE_GC_MAX_SIZE')
+    max_age = get_env('MX_CACHE_GC_MAX_AGE')
+    if not max_size and not max_age:
+        return
+    stamp = join(_cache_dir(), '.gc.last')
+    interval = _parse_age(get_env('MX_CACHE_GC_INTERVAL', '1d'))
+    if exists(stamp) and time.time() - os.path.getmtime(stamp) < interval:
+        return
+    ensure_dir_exists(_cache_dir())
+    with open(stamp, 'w'):
+        pass
+    _cache_gc(max_size=_parse_size(max_size) if max_size else None, max_age=_parse_age(max_age) if max_age else None)
+
+
+class _CachePack(object):
+    """
+    A single file holding download cache entries for offline use. It is a zip file whose
+    entries are stored uncompressed at their path relative to the cache directory, plus an
+    index (`_CachePack.index_name`) mapping these paths to their SHA1 digest. The zip
+    central directory provides random access to single artifacts.
+    """
+    index_name = 'mx-cache-pack.json'
+    _version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+
+    @property
+    def entries(self):
+        """
+        :rtype: dict[str, str]
+        """
+        if self._entries is None:
+            with zipfile.ZipFile(self.path) as zf:
+                index = json.loads(_decode(zf.read(_CachePack.index_name)))
+            if index.get('version') != _CachePack._version:
+                abort('Unsupported version of cache pack {}: {}'.format(self.path, index.get('version')))
+            entries = dict(((str(name), str(sha1)) for name, sha1 in index['entries'].items()))
+            for name in entries:
+                self._cache_path(name)
+            self._entries = entries
+        return self._entries
+
+    def _cache_path(self, name):
+        """
+        Gets the path of entry `name` in the cache directory, aborting if `name` is not a relative
+        path denoting a location within the cache directory (e.g. a malicious `../` path).
+        """
+        normalized = normpath(name)
+        if isabs(name) or os.path.splitdrive(name)[0] or normalized == os.curdir or normalized.split(os.sep)[0] == os.pardir:
+            abort('Invalid entry in cache pack {}: {}'.format(self.path, name))
+        return join(_cache_dir(), normalized)
+
+    @staticmethod
+    def create(path, files):
+        """
+        Creates a pack at `path` holding `files`, a dict from paths relative to the cache directory to their SHA1 digest.
+        """
+        cache = _cache_dir()
+        with SafeFileCreation(path) as sfc:
+            with zipfile.ZipFile(sfc.tmpPath, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+                zf.writestr(_CachePack.index_name, json.dumps({'version': _CachePack._version, 'entries': files}, indent=1, sort_keys=True))
+                for name in sorted(files):
+                    zf.write(join(cache, name), name.replace(os.sep, '/'))
 
+    def extract(self, name, zf=None):
+        """
+        Extracts the entry `name` (a path relative to the cache directory) into the cache directory if it
+        is not already there, verifying its SHA1 digest while it is written.
 
-def user_home():
-    return _opts.user_home if hasattr(_opts, 'user_home') else os.path.expanduser('~')
+        :return: True if the entry was extracted, False if it was already present
+        """
+        expected = self.entries[name]
+        dst = self._cache_path(name)
+        if exists(dst) and _check_file_with_sha1(dst, expected, dst + '.sha1'):
+            return False
+        if zf is None:
+            with zipfile.ZipFile(self.path) as zf:
+                return self.extract(name, zf)
+        d = hashlib.sha1()
+        with SafeFileCreation(dst) as sfc:
+            with zf.open(name.replace(os.sep, '/')) as src, open(sfc.tmpPath, 'wb') as fp:
+                while True:
+                    buf = src.read(1024 * 1024)
+                    if not buf:
+                        break
+                    d.update(buf)
+                    fp.write(buf)
+            if d.hexdigest() != expected:
+                os.remove(sfc.tmpPath)
+                abort('SHA1 of {} in {} ({}) does not match expected value ({})'.format(name, self.path, d.hexdigest(), expected))
+        with SafeFileCreation(dst + '.sha1') as sfc, open(sfc.tmpPath, 'w') as fp:
+            fp.write(expected)
+        return True
 
+    def extract_all(self, jobs=None):
+        """
+        Extracts all entries that are not yet in the cache directory using parallel threads.
 
-def dot_mx_dir():
-    return join(user_home(), '.mx')
+        :return: the number of extracted entries
+        """
+        names = sorted(self.entries)
+        local = _ThreadLocal()
+        opened = []
+        def _extract(name):
+            if not hasattr(local, 'zf'):
+                local.zf = zipfile.ZipFile(self.path)
+                opened.append(local.zf)
+            return self.extract(name, local.zf)
+        try:
+            return len([extracted for extracted in _run_in_threads(_extract, names, jobs) if extracted])
+        finally:
+            for zf in opened:
+                zf.close()
 
 
-def is_cache_path(path):
-    return path.startswith(_cache_dir())
+_cache_packs_list = None
 
 
-def _cache_dir():
-    return _cygpathW2U(get_env('MX_CACHE_DIR', join(dot_mx_dir(), 'cache')))
+def _cache_packs():
+    """
+    Gets the packs specified by the MX_CACHE_PACKS environment variable (a list of paths separated by
+    `os.pathsep`) from which missing download cache entries are extracted instead of being downloaded.
+
+    :rtype: list[_CachePack]
+    """
+    global _cache_packs_list
+    if _cache_packs_list is None:
+        _cache_packs_list = [_CachePack(p) for p in get_env('MX_CACHE_PACKS', '').split(os.pathsep) if p]
+    return _cache_packs_list
 
 
-def _get_path_in_cache(name, sha1, urls, ext=None, sources=False, oldPath=False):
+def _extract_from_cache_packs(cache_path):
     """
-    Gets the path an artifact has (or would have) in the download cache.
+    Extracts the download cache entry `cache_path` from the first cache pack containing it.
+
+    :return: True if `cache_path` was provided by a cache pack
     """
-    assert sha1 != 'NOCHECK', 'artifact for ' + name + ' cannot be cached since its sha1 is NOCHECK'
-    if ext is None:
-        for url in urls:
-            # Use extension of first URL whose path component ends with a non-empty extension
-            o = _urllib_parse.urlparse(url)
-            if o.path == "/remotecontent" and o.query.startswith("filepath"):
-                path = o.query
-            else:
-                path = o.path
-            ext = get_file_extension(path)
-            if ext:
-                ext = '.' + ext
-                break
-        if not ext:
-            abort('Could not determine a file extension from URL(s):\n  ' + '\n  '.join(urls))
-    assert os.sep not in name, name + ' cannot contain ' + os.sep
-    assert os.pathsep not in name, name + ' cannot contain ' + os.pathsep
-    if oldPath:
-        return join(_cache_dir(), name + ('.sources' if sources else '') + '_' + sha1 + ext)  # mx < 5.176.0
-    filename = _map_to_maven_dist_name(name) + ('.sources' if sources else '') + ext
-    return join(_cache_dir(), name + '_' + sha1 + ('.dir' if not ext else ''), filename)
+    cache = _cache_dir()
+    if not cache_path.startswith(cache + os.sep):
+        return False
+    name = cache_path[len(cache) + 1:]
+    for pack in _cache_packs():
+        if name in pack.entries:
+            logv('Extracting {} from cache pack {}'.format(name, pack.path))
+            pack.extract(name)
+            return True
+    return False
 
 
-def _urlopen(*args, **kwargs):
+def _cache_pack_files(libs):
+    """
+    Gets the download cache files of `libs` (including sources and packed resource archives)
+    as a dict from paths relative to the cache directory to their SHA1 digest.
+    """
+    cache = realpath(_cache_dir())
+    files = {}
+    for l in libs:
+        artifacts = [(ResourceLibrary.get_path(l, True) if l.isPackedResourceLibrary() else l.get_path(True), l.sha1)]
+        if l.isLibrary():
+            artifacts.append((l.get_source_path(True), l.sourceSha1))
+        for path, sha1 in artifacts:
+            if path and exists(path) and sha1 and sha1 != 'NOCHECK':
+                path = realpath(path)
+                if path.startswith(cache + os.sep):
+                    files[path[len(cache) + 1:]] = sha1
+    return files
+
+
+def _cache_export(pack_path, jobs=None):
+    libs = [l for s in suites(True, includeBinary=True) for l in s.libs if (l.isLibrary() or l.isResourceLibrary()) and not l.optional]
+    _fetch_libraries(libs, jobs=jobs)
+    files = _cache_pack_files(libs)
+    _CachePack.create(pack_path, files)
+    log('Exported {} files of {} libraries to {} ({} bytes)'.format(len(files), len(libs), pack_path, os.path.getsize(pack_path)))
+
+
+def _cache_import(pack_path, jobs=None):
+    pack = _CachePack(pack_path)
+    start = time.time()
+    extracted = pack.extract_all(jobs)
+    log('Imported {} of {} files from {} into {} in {:.1f} seconds'.format(extracted, len(pack.entries), pack_path, _cache_dir(), time.time() - start))
+
+
+@optional_suite_context
+def cache(args):
+    """manage the download cache"""
+    parser = ArgumentParser(prog='mx cache')
+    subparsers = parser.add_subparsers(dest='subcommand', metavar='<subcommand>')
+    gc_parser = subparsers.add_parser('gc', help='evict least recently used entries from the download cache. Entries referenced by the loaded suites are kept.')
+    gc_parser.add_argument('--max-size', type=_parse_size, help='evict entries until the cache is at most this big (e.g. 10G)', metavar='<size>')
+    gc_parser.add_argument('--max-age', type=_parse_age, help='evict entries not used for this long (e.g. 30d or 12h)', metavar='<age>')
+    gc_parser.add_argument('-n', '--dry-run', action='store_true', help='only show what would be evicted')
+    export_parser = subparsers.add_parser('export', help='write the artifacts of the libraries of the loaded suites to a single pack file, downloading them first if necessary')
+    export_parser.add_argument('pack', help='the pack file to create', metavar='<path>')
+    export_parser.add_argument('-j', '--jobs', type=int, help='maximum number of concurrent downloads', metavar='<n>')
+    import_parser = subparsers.add_parser('import', help='add the artifacts in a pack file created by "mx cache export" to the download cache')
+    import_parser.add_argument('pack', help='the pack file to import', metavar='<path>')
+    import_parser.add_argument('-j', '--jobs', type=int, help='maximum number of threads writing files', metavar='<n>')
+    args = parser.parse_args(args)
+    if args.subcommand == 'gc':
+        if args.max_size is None and args.max_age is None:
+            abort('mx cache gc requires --max-size and/or --max-age')
+        _cache_gc(max_size=args.max_size, max_age=args.max_age, dry_run=args.dry_run)
+    elif args.subcommand == 'export':
+        if not _primary_suite:
+            abort('mx cache export requires a primary suite')
+        _cache_export(args.pack, args.jobs)
+    elif args.subcommand == 'import':
+        _cache_import(args.pack, args.jobs)
+    else:
+        parser.print_help()
+
+
+def _with_url_retries(url, open_url, timeout=None, timeout_retries=3):
+    """
+    Calls `open_url(timeout)` to open `url` and returns its result, retrying the transient failures
+    of opening a URL: a timeout is retried with a doubled timeout (at most `timeout_retries` times),
+    an HTTP 500 response is retried up to 5 times and an interrupted system call (EINTR) in an
+    interactive session is retried without a timeout. A `timeout` of None denotes the default timeout.
+    """
+    timeout = [timeout]
     timeout_attempts = [0]
-    timeout_retries = kwargs.pop('timeout_retries', 3)
 
     def on_timeout():
         if timeout_attempts[0] <= timeout_retries:
             timeout_attempts[0] += 1
-            kwargs['timeout'] = kwargs.get('timeout', 5) * 2
-            warn("urlopen() timed out! Retrying with timeout of {}s.".format(kwargs['timeout']))
+            timeout[0] = (timeout[0] or 5) * 2
+            warn("urlopen() timed out! Retrying with timeout of {}s.".format(timeout[0]))
             return True
         return False
 
@@ -4615,34 +5975,45 @@ def _urlopen(*args, **kwargs):
 
     while True:
         try:
-            return _urllib_request.urlopen(*args, **kwargs)
+            return open_url(timeout[0])
         except (_urllib_error.HTTPError) as e:
             if e.code == 500:
                 if error500_attempts < error500_limit:
                     error500_attempts += 1
-                    url = '?' if len(args) == 0 else args[0]
                     warn("Retrying after error reading from " + url + ": " + str(e))
                     time.sleep(0.2)
                     continue
             raise
-        except _urllib_error.URLError as e:
-            if isinstance(e.reason, socket.error):
-                if e.reason.errno == errno.EINTR and 'timeout' in kwargs and is_interactive():
+        except (_urllib_error.URLError, socket.error, socket.timeout) as e:
+            reason = e.reason if isinstance(e, _urllib_error.URLError) else e
+            if isinstance(reason, socket.timeout):
+                if on_timeout():
+                    continue
+            elif isinstance(reason, socket.error):
+                if reason.errno == errno.EINTR and timeout[0] is not None and is_interactive():
                     warn("urlopen() failed with EINTR. Retrying without timeout.")
-                    del kwargs['timeout']
-                    return _urllib_request.urlopen(*args, **kwargs)
-                if e.reason.errno == errno.EINPROGRESS:
+                    timeout[0] = None
+                    continue
+                if reason.errno == errno.EINPROGRESS:
                     if on_timeout():
                         continue
-            if isinstance(e.reason, socket.timeout):
-                if on_timeout():
-                    continue
             raise
-        except socket.timeout:
-            if on_timeout():
-                continue
-            raise
-        abort("should not reach here")
+
+
+def _urlopen(*args, **kwargs):
+    timeout_retries = kwargs.pop('timeout_retries', 3)
+    url = args[0] if args else kwargs.get('url', '?')
+    if isinstance(url, _urllib_request.Request):
+        url = url.get_full_url()
+
+    def _open(timeout):
+        if timeout is None:
+            kwargs.pop('timeout', None)
+        else:
+            kwargs['timeout'] = timeout
+        return _urllib_request.urlopen(*args, **kwargs)
+
+    return _with_url_retries(url, _open, kwargs.get('timeout'), timeout_retries)
 
 
 def download_file_exists(urls):
@@ -4724,8 +6095,9 @@ def download_file_with_sha1(name, path, urls, sha1, sha1path, resolve, mustExist
             if exists(cachePath):
                 log('SHA1 of ' + cachePath + ' does not match expected value (' + sha1 + ') - found ' + sha1OfFile(cachePath) + ' - re-downloading')
 
-            log('Downloading ' + ("sources " if sources else "") + name + ' from ' + str(urls))
-            download(cachePath, urls)
+            if not _extract_from_cache_packs(cachePath):
+                log('Downloading ' + ("sources " if sources else "") + name + ' from ' + str(urls))
+                download(cachePath, urls)
 
         if path != cachePath:
             _copy_or_symlink(cachePath, path)
@@ -4733,6 +6105,7 @@ def download_file_with_sha1(name, path, urls, sha1, sha1path, resolve, mustExist
         if not _check_file_with_sha1(path, sha1, sha1path, newFile=True, logErrors=True):
             abort("No valid file for {} after download. Broken download? SHA1 not updated in suite.py file?".format(path))
 
+    _record_cache_access(path)
     return path
 
 
@@ -4792,8 +6165,8 @@ class BaseLibrary(Dependency):
         Dependency.__init__(self, suite, name, theLicense, **kwArgs)
         self.optional = optional
 
-    def _walk_deps_visit_edges(self, visited, edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        pass
+    def _walk_deps_edge_lists(self):
+        return []
 
     def resolveDeps(self):
         licenseId = self.theLicense
@@ -4888,7 +6261,7 @@ class Extractor(object):
 
     @staticmethod
     def create(src):
-        if src.endswith(".tar") or src.endswith(".tar.gz"):
+        if src.endswith(".tar") or _TarCompression.for_path(src):
             return TarExtractor(src)
         if src.endswith(".zip"):
             return ZipExtractor(src)
@@ -4896,15 +6269,55 @@ class Extractor(object):
 
 
 class TarExtractor(Extractor):
+    """
+    Extracts a tar file by reading it sequentially and writing the regular files on a pool of threads.
+    """
+
+    # members larger than this are written by the reading thread to bound memory use
+    _max_buffered_member_size = 8 * 1024 * 1024
 
     def _open(self):
-        return tarfile.open(self.src)
+        return _open_tar(self.src)
 
     def _getnames(self, ar):
         return ar.getnames()
 
     def _extractall(self, ar, dst):
-        return ar.extractall(dst)
+        directories = []
+
+        def _write_member(tarinfo, path, data):
+            with open(path, 'wb') as fp:
+                fp.write(data)
+            ar.chmod(tarinfo, path)
+            ar.utime(tarinfo, path)
+
+        with _BoundedThreadPool(_extraction_jobs()) as pool:
+            # the paths being written by the pool
+            pending = set()
+            for tarinfo in ar:
+                path = join(dst, tarinfo.name.replace('/', os.sep))
+                if tarinfo.islnk() or os.path.normpath(path) in pending:
+                    # the link target must have been written and
+                    # a later member with the same name must replace the earlier one
+                    pool.join()
+                    pending.clear()
+                if tarinfo.isdir():
+                    ensure_dir_exists(path, 0o700)
+                    directories.append((tarinfo, path))
+                elif tarinfo.isreg() and tarinfo.size <= TarExtractor._max_buffered_member_size:
+                    ensure_dirname_exists(path)
+                    pending.add(os.path.normpath(path))
+                    pool.submit(_write_member, tarinfo, path, ar.extractfile(tarinfo).read())
+                else:
+                    ar.extract(tarinfo, dst)
+
+        # set attributes of directories (deepest first) now that their content is written
+        for tarinfo, path in reversed(directories):
+            try:
+                ar.utime(tarinfo, path)
+                ar.chmod(tarinfo, path)
+            except tarfile.ExtractError as e:
+                abort("tarfile: " + str(e))
 
 
 class ZipExtractor(Extractor):
@@ -4916,12 +6329,80 @@ class ZipExtractor(Extractor):
         return ar.namelist()
 
     def _extractall(self, ar, dst):
-        return ar.extractall(dst)
+        return _extract_zip_members(self.src, ar.infolist(), dst)
+
+
+def _extraction_jobs():
+    # extraction is mostly I/O bound: more threads than this rarely help
+    return min(cpu_count(), 8)
+
+
+def _zip_member_path(member, dst):
+    """
+    Gets the path to which `zipfile.ZipFile.extract` writes `member` in `dst`. Like `zipfile`, this
+    drops drive letters, leading slashes and `.` and `..` components so that the path is in `dst`.
+    """
+    arcname = member.filename.replace('/', os.sep)
+    if os.altsep:
+        arcname = arcname.replace(os.altsep, os.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    arcname = os.sep.join(x for x in arcname.split(os.sep) if x not in ('', os.curdir, os.pardir))
+    return join(dst, arcname)
+
+
+def _extract_zip_members(src, members, dst):
+    """
+    Extracts `members` (`zipfile.ZipInfo` objects) of the zip file `src` into `dst` using a pool of
+    threads, each with its own handle on `src`. Returns the paths of the extracted members in the order of `members`.
+    """
+    members = list(members)
+    jobs = _extraction_jobs() if len(members) >= 64 else 1
+    # create directories up front as `zipfile` does not tolerate another thread creating them concurrently
+    for m in members:
+        path = _zip_member_path(m, dst)
+        ensure_dir_exists(path if m.filename.endswith('/') else dirname(path))
+    chunks = [list(range(i, len(members), jobs)) for i in range(jobs)]
+    results = [None] * len(members)
+
+    def _extract_chunk(indexes):
+        with zipfile.ZipFile(src) as zf:
+            for i in indexes:
+                results[i] = zf.extract(members[i], dst)
+
+    _run_in_threads(_extract_chunk, chunks, jobs)
+    return results
+
+
+def _hardlink_tree(src, dst):
+    """
+    Recreates the directory tree `src` in `dst` (which must exist) with hard links to the files in `src`.
+    Files are copied instead if they cannot be linked (e.g. `src` and `dst` are on different file systems).
+    """
+    directories = []
+    for root, dirs, files in os.walk(src):
+        dst_root = join(dst, os.path.relpath(root, src))
+        for name in dirs + files:
+            src_path = join(root, name)
+            dst_path = join(dst_root, name)
+            if islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+            elif name in dirs:
+                os.mkdir(dst_path)
+                directories.append((src_path, dst_path))
+            else:
+                _materialize_file(src_path, dst_path, shutil.copy2, mode='hardlink')
+    # copy directory attributes last in case they make the directories read-only
+    for src_path, dst_path in reversed(directories):
+        shutil.copystat(src_path, dst_path)
 
 
 class PackedResourceLibrary(ResourceLibrary):
     """
     A ResourceLibrary that comes in an archive and should be extraced after downloading.
+
+    The sha1 of the extracted archive is recorded next to the extraction so that it is only repeated
+    when the archive changes. If the `MX_HARDLINK_EXTRACTED` environment variable is `true`, an archive
+    extracted to a custom path is extracted once in the download cache and its files are hard linked from there.
     """
 
     def __init__(self, *args, **kwargs):
@@ -4947,6 +6428,15 @@ class PackedResourceLibrary(ResourceLibrary):
             logvv("Destination does not exist")
             logvv("Destination: " + dst)
             return True
+        marker = PackedResourceLibrary._extracted_digest_file(dst)
+        if exists(marker):
+            with open(marker) as fp:
+                extracted_digest = fp.read().strip()
+            if extracted_digest == self._archive_digest(src):
+                return False
+            logvv("Destination was extracted from a different archive")
+            logvv("Destination: " + dst)
+            return True
         if getmtime(src) > getmtime(dst):
             logvv("Destination older than source")
             logvv("Destination: " + dst)
@@ -4954,6 +6444,27 @@ class PackedResourceLibrary(ResourceLibrary):
             return True
         return False
 
+    @staticmethod
+    def _extracted_digest_file(extract_path):
+        """
+        Gets the path of the file recording the sha1 of the archive extracted to `extract_path`.
+        """
+        return extract_path + '.sha1'
+
+    def _archive_digest(self, src):
+        if self.sha1 and self.sha1 != 'NOCHECK':
+            # `src` has been verified against this value when it was downloaded
+            return self.sha1
+        return sha1OfFile(src) if exists(src) else None
+
+    def _cached_extract_path(self):
+        """
+        Gets the location at which the archive is extracted in the download cache or None.
+        """
+        if not self.urls or not self.sha1 or self.sha1 == 'NOCHECK':
+            return None
+        return _get_path_in_cache(self.name, self.sha1, self.urls, ".extracted", sources=False)
+
     def is_available(self):
         if not self.extract_path:
             return False
@@ -4963,30 +6474,52 @@ class PackedResourceLibrary(ResourceLibrary):
         extract_path = _make_absolute(self.extract_path, self.suite.dir)
         download_path = super(PackedResourceLibrary, self).get_path(resolve)
         if resolve and self._check_extract_needed(extract_path, download_path):
-            extract_path_tmp = tempfile.mkdtemp(suffix=basename(extract_path), dir=dirname(extract_path))
-            try:
-                # extract archive
-                Extractor.create(download_path).extract(extract_path_tmp)
-                # ensure modification time is up to date
-                os.utime(extract_path_tmp, None)
-                logv("Moving temporary directory {} to {}".format(extract_path_tmp, extract_path))
-                try:
-                    # attempt atomic overwrite
-                    os.rename(extract_path_tmp, extract_path)
-                except OSError:
-                    # clean destination & re-try for cases where atomic overwrite doesn't work
-                    rmtree(extract_path, ignore_errors=True)
-                    os.rename(extract_path_tmp, extract_path)
-            except OSError as ose:
-                # Rename failed. Race with other process?
-                if self._check_extract_needed(extract_path, download_path):
-                    # ok something really went wrong
-                    abort("Extracting {} failed!".format(download_path), context=ose)
-            finally:
-                rmtree(extract_path_tmp, ignore_errors=True)
+            cached_extract_path = self._cached_extract_path()
+            link_from_cache = cached_extract_path and cached_extract_path != extract_path and get_env('MX_HARDLINK_EXTRACTED') == 'true'
+            if link_from_cache:
+                # extract once in the cache and link the files from there
+                self._extract(download_path, cached_extract_path)
+            self._extract(download_path, extract_path, cached_extract_path if link_from_cache else None)
 
         return extract_path
 
+    def _extract(self, download_path, extract_path, linked_extract_path=None):
+        """
+        Extracts the archive at `download_path` to `extract_path` unless it is already there. If
+        `linked_extract_path` is not None, the files are hard linked from that earlier extraction of the same archive.
+        """
+        if not self._check_extract_needed(extract_path, download_path):
+            return
+        extract_path_tmp = tempfile.mkdtemp(suffix=basename(extract_path), dir=dirname(extract_path))
+        try:
+            if linked_extract_path:
+                logv("Linking {} to {}".format(linked_extract_path, extract_path_tmp))
+                _hardlink_tree(linked_extract_path, extract_path_tmp)
+            else:
+                # extract archive
+                Extractor.create(download_path).extract(extract_path_tmp)
+            # ensure modification time is up to date
+            os.utime(extract_path_tmp, None)
+            logv("Moving temporary directory {} to {}".format(extract_path_tmp, extract_path))
+            try:
+                # attempt atomic overwrite
+                os.rename(extract_path_tmp, extract_path)
+            except OSError:
+                # clean destination & re-try for cases where atomic overwrite doesn't work
+                rmtree(extract_path, ignore_errors=True)
+                os.rename(extract_path_tmp, extract_path)
+            digest = self._archive_digest(download_path)
+            if digest:
+                with SafeFileCreation(PackedResourceLibrary._extracted_digest_file(extract_path)) as sfc, open(sfc.tmpPath, 'w') as fp:
+                    fp.write(digest)
+        except OSError as ose:
+            # Rename failed. Race with other process?
+            if self._check_extract_needed(extract_path, download_path):
+                # ok something really went wrong
+                abort("Extracting {} failed!".format(download_path), context=ose)
+        finally:
+            rmtree(extract_path_tmp, ignore_errors=True)
+
     def _check_download_needed(self):
         need_download = super(PackedResourceLibrary, self)._check_download_needed()
         extract_path = _make_absolute(self.extract_path, self.suite.dir)
@@ -5165,9 +6698,8 @@ class JdkLibrary(BaseLibrary, ClasspathDependency):
     def isJar(self):
         return True
 
-    def _walk_deps_visit_edges(self, visited, in_edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        deps = [(DEP_STANDARD, self.deps)]
-        self._walk_deps_visit_edges_helper(deps, visited, in_edge, preVisit, visit, ignoredEdges, visitEdge)
+    def _walk_deps_edge_lists(self):
+        return [(DEP_STANDARD, self.deps)]
 
 class Library(BaseLibrary, ClasspathDependency):
     """
@@ -5218,9 +6750,8 @@ class Library(BaseLibrary, ClasspathDependency):
         BaseLibrary.resolveDeps(self)
         self._resolveDepsHelper(self.deps)
 
-    def _walk_deps_visit_edges(self, visited, in_edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
-        deps = [(DEP_STANDARD, self.deps)]
-        self._walk_deps_visit_edges_helper(deps, visited, in_edge, preVisit, visit, ignoredEdges, visitEdge)
+    def _walk_deps_edge_lists(self):
+        return [(DEP_STANDARD, self.deps)]
 
     def _comparison_key(self):
         return (self.sha1, self.name)
@@ -6172,6 +7703,16 @@ class GitConfig(VC):
     """
     Encapsulates access to Git (git)
     """
+
+    # Metadata of HEAD and the repository queried so far, keyed by the real path of the root
+    # of a repository. The entries live as long as the process and are discarded by the
+    # operations of this class that modify the repository (see _invalidate). The state of the
+    # working directory is not cached as files are also modified outside of this class.
+    _metadata_cache = {}
+
+    # The fields of the single `git log -1` invocation that describes HEAD
+    _head_fields = [('rev', '%H'), ('author', '%an <%ae>'), ('author-ts', '%at'), ('committer', '%cn <%ce>'), ('committer-ts', '%ct'), ('refs', '%D'), ('description', '%s')]
+
     def __init__(self):
         VC.__init__(self, 'git', 'Git')
         self.missing = 'No Git executable found. You must install Git in order to proceed!'
@@ -6201,11 +7742,62 @@ class GitConfig(VC):
         self.check_for_git()
         return run(*args, **kwargs)
 
+    @staticmethod
+    def _repository_key(vcdir):
+        """
+        Gets the real path of the root of the repository containing `vcdir` (or of `vcdir` if it
+        is not in a repository yet) so that all the directories of a repository share its metadata.
+        """
+        path = os.path.realpath(vcdir)
+        git_dir = VC._find_metadata_dir(path, '.git')
+        return dirname(git_dir) if git_dir else path
+
+    @staticmethod
+    def _metadata(vcdir):
+        key = GitConfig._repository_key(vcdir)
+        metadata = GitConfig._metadata_cache.get(key)
+        if metadata is None:
+            metadata = GitConfig._metadata_cache.setdefault(key, {})
+        return metadata
+
+    @staticmethod
+    def _invalidate(vcdir=None):
+        """
+        Discards the cached metadata of the repository at `vcdir` or of all repositories if `vcdir` is None.
+        """
+        if vcdir is None:
+            GitConfig._metadata_cache.clear()
+        else:
+            GitConfig._metadata_cache.pop(GitConfig._repository_key(vcdir), None)
+
+    def _head(self, vcdir):
+        """
+        Gets the revision, author, committer, decorations and subject of HEAD in the repository
+        at `vcdir` with a single git invocation.
+
+        :return: a dict with the keys in `_head_fields` or None if HEAD cannot be resolved
+        """
+        metadata = GitConfig._metadata(vcdir)
+        if 'head' not in metadata:
+            self.check_for_git()
+            names = [name for name, _ in GitConfig._head_fields]
+            fmt = '%x00'.join((f for _, f in GitConfig._head_fields))
+            # We don't use run because this can be called very early before _opts is set
+            try:
+                out = _check_output_str(['git', 'log', '-1', '--format=' + fmt, 'HEAD'], cwd=vcdir)
+                values = out.rstrip('\r\n').split('\x00')
+                assert len(values) == len(names), 'Unexpected format: ' + out
+                metadata['head'] = dict(zip(names, values))
+            except subprocess.CalledProcessError:
+                return None
+        return metadata['head']
+
     def init(self, vcdir, abortOnError=True, bare=False):
         cmd = ['git', 'init']
         if bare:
             cmd.append('--bare')
         cmd.append(vcdir)
+        GitConfig._invalidate(vcdir)
         return self.run(cmd, nonZeroIsFatal=abortOnError) == 0
 
     def is_this_vc(self, vcdir):
@@ -6218,6 +7810,8 @@ class GitConfig(VC):
         if not quiet:
             print('{0}'.format(" ".join(args)))
         out = OutputCapture()
+        # `args` may modify the repository
+        GitConfig._invalidate(vcdir)
         rc = self.run(args, cwd=vcdir, nonZeroIsFatal=False, out=out)
         if rc in (0, 1):
             return out.data
@@ -6229,9 +7823,11 @@ class GitConfig(VC):
     def add(self, vcdir, path, abortOnError=True):
         # git add does not support quiet mode, so we capture the output instead ...
         out = OutputCapture()
+        GitConfig._invalidate(vcdir)
         return self.run(['git', 'add', path], cwd=vcdir, out=out) == 0
 
     def commit(self, vcdir, msg, abortOnError=True):
+        GitConfig._invalidate(vcdir)
         return self.run(['git', 'commit', '-a', '-m', msg], cwd=vcdir) == 0
 
     def tip(self, vcdir, abortOnError=True):
@@ -6244,15 +7840,12 @@ class GitConfig(VC):
                  None if failure and `abortOnError` is False
         :rtype: str
         """
-        self.check_for_git()
-        # We don't use run because this can be called very early before _opts is set
-        try:
-            return _check_output_str(['git', 'rev-list', 'HEAD', '-1'], cwd=vcdir)
-        except subprocess.CalledProcessError:
+        head = self._head(vcdir)
+        if head is None:
             if abortOnError:
-                abort('git rev-list HEAD failed')
-            else:
-                return None
+                abort('git log HEAD failed')
+            return None
+        return head['rev']
 
     def parent(self, vcdir, abortOnError=True):
         """
@@ -6270,25 +7863,20 @@ class GitConfig(VC):
             if abortOnError:
                 abort('More than one parent exist during merge')
             return None
-        try:
-            out = _check_output_str(['git', 'show', '--pretty=format:%H', "-s", 'HEAD'], cwd=vcdir)
-            return out.strip()
-        except subprocess.CalledProcessError:
+        head = self._head(vcdir)
+        if head is None:
             if abortOnError:
-                abort('git show failed')
-            else:
-                return None
+                abort('git log failed')
+            return None
+        return head['rev']
 
     def parent_info(self, vcdir, abortOnError=True):
-        out = self.git_command(vcdir, ["show", "-s", "--format=%an <%ae>|||%at|||%cn <%ce>|||%ct|||%s", "HEAD"], abortOnError=abortOnError)
-        author, author_ts, committer, committer_ts, description = out.split("|||")
-        return self._sanitize_parent_info({
-            "author": author,
-            "author-ts": author_ts,
-            "committer": committer,
-            "committer-ts": committer_ts,
-            "description": description,
-        })
+        head = self._head(vcdir)
+        if head is None:
+            if abortOnError:
+                abort('git log failed')
+            return None
+        return self._sanitize_parent_info({k: head[k] for k in ('author', 'author-ts', 'committer', 'committer-ts', 'description')})
 
     def _tags(self, vcdir, prefix, abortOnError=True):
         """
@@ -6300,26 +7888,51 @@ class GitConfig(VC):
         :param bool abortOnError: if True abort on mx error
         :rtype: list of str
         """
+        revisions = self._tag_revisions(vcdir, abortOnError=abortOnError)
+        if revisions is None:
+            return None
+        return [tag for tag in revisions if tag.startswith(prefix)]
+
+    def _tag_revisions(self, vcdir, abortOnError=True):
+        """
+        Get the tags that are ancestors of the current HEAD in the repository at `vcdir`
+        together with the commits they point to.
+
+        :param str vcdir: a valid repository path
+        :param bool abortOnError: if True abort on mx error
+        :return: a dict from tag name to commit hash, None if failure and `abortOnError` is False
+        :rtype: dict
+        """
+        metadata = GitConfig._metadata(vcdir)
+        if 'tags' not in metadata:
+            self.check_for_git()
+            try:
+                tags_out = _check_output_str(['git', 'log', '--simplify-by-decoration', '--pretty=format:%H%x00%D', 'HEAD'], cwd=vcdir)
+            except subprocess.CalledProcessError as e:
+                if abortOnError:
+                    abort('git tag failed: ' + str(e))
+                else:
+                    return None
+            metadata['tags'] = GitConfig._decorated_tags(tags_out)
+        return metadata['tags']
+
+    @staticmethod
+    def _decorated_tags(log_out):
+        """
+        Extracts the tags from the output of ``git log --pretty=format:%H%x00%D``.
+        """
         _tags_prefix = 'tag: '
-        try:
-            tags_out = _check_output_str(['git', 'log', '--simplify-by-decoration', '--pretty=format:%d', 'HEAD'], cwd=vcdir)
-            tags_out = tags_out.strip()
-            tags = []
-            for line in tags_out.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                assert line.startswith('(') and line.endswith(')'), "Unexpected format: " + line
-                search = _tags_prefix + prefix
-                for decoration in line[1:-1].split(', '):
-                    if decoration.startswith(search):
-                        tags.append(decoration[len(_tags_prefix):])
-            return tags
-        except subprocess.CalledProcessError as e:
-            if abortOnError:
-                abort('git tag failed: ' + str(e))
-            else:
-                return None
+        tags = OrderedDict()
+        for line in log_out.strip().split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            assert '\x00' in line, "Unexpected format: " + line
+            rev, decorations = line.split('\x00', 1)
+            for decoration in decorations.split(', '):
+                if decoration.startswith(_tags_prefix):
+                    tags[decoration[len(_tags_prefix):]] = rev
+        return tags
 
     def _commitish_revision(self, vcdir, commitish, abortOnError=True):
         """
@@ -6344,7 +7957,10 @@ class GitConfig(VC):
                 return None
 
     def _latest_revision(self, vcdir, abortOnError=True):
-        return self._commitish_revision(vcdir, 'HEAD', abortOnError=abortOnError)
+        head = self._head(vcdir)
+        if head is None:
+            return self._commitish_revision(vcdir, 'HEAD', abortOnError=abortOnError)
+        return head['rev']
 
 
     def release_version_from_tags(self, vcdir, prefix, snapshotSuffix='dev', abortOnError=True):
@@ -6369,15 +7985,15 @@ class GitConfig(VC):
                 matching_versions = sorted(matching_versions, reverse=True)
                 most_recent_version = matching_versions[0]
                 most_recent_tag = tag_prefix + '.'.join((str(x) for x in most_recent_version))
-                most_recent_tag_revision = self._commitish_revision(vcdir, most_recent_tag)
+                most_recent_tag_revision = self._tag_revisions(vcdir)[most_recent_tag]
                 return VC._version_string_helper(latest_rev, most_recent_tag_revision, most_recent_version, snapshotSuffix)
         return None
 
     def parent_tags(self, vcdir):
-        try:
-            return _check_output_str(['git', 'tag', '--list', '--points-at', 'HEAD'], cwd=vcdir).strip().split('\r\n')
-        except subprocess.CalledProcessError as e:
-            abort('git tag failed: ' + str(e))
+        head = self._head(vcdir)
+        if head is None:
+            abort('git log failed')
+        return list(GitConfig._decorated_tags(head['rev'] + '\x00' + head['refs']))
 
     @classmethod
     def _head_to_ref(cls, head_name):
@@ -6395,6 +8011,7 @@ class GitConfig(VC):
         :param with_remote: if True (default) the change is propagated to origin
         :return: 0 if setting branch was successful
         """
+        GitConfig._invalidate(vcdir)
         run(['git', 'branch', '--no-track', '--force', branch_name, branch_commit], cwd=vcdir)
         if not with_remote:
             return 0
@@ -6484,6 +8101,7 @@ class GitConfig(VC):
             cmd.append(url)
         if dest:
             cmd.append(dest)
+        GitConfig._invalidate(dest)
         self._log_clone(url, dest, rev)
         out = OutputCapture()
         if self.object_cache_mode:
@@ -6496,6 +8114,7 @@ class GitConfig(VC):
         cmd = ['git']
         cwd = None if dest is None else dest
         cmd.extend(['reset', '--hard', rev])
+        GitConfig._invalidate(dest)
         out = OutputCapture()
         rc = self.run(cmd, nonZeroIsFatal=abortOnError, cwd=cwd, out=out)
         logvv(out.data)
@@ -6548,8 +8167,15 @@ class GitConfig(VC):
                     cmd.append(refspec)
             if lock:
                 cmd = self._locked_cmd(vcdir, cmd)
+            GitConfig._invalidate(vcdir)
             logvv(' '.join(map(pipes.quote, cmd)))
-            return subprocess.check_call(cmd, cwd=vcdir)
+            out = _RepositoryOutput.collector(sys.stdout)
+            if out is None:
+                return subprocess.check_call(cmd, cwd=vcdir)
+            # run instead of check_call so that the output is grouped with the rest of the repository's output
+            if self.run(cmd, cwd=vcdir, nonZeroIsFatal=False, out=out, err=_RepositoryOutput.collector(sys.stderr)) != 0:
+                raise subprocess.CalledProcessError(1, cmd)
+            return 0
         except subprocess.CalledProcessError:
             if abortOnError:
                 abort('git fetch failed')
@@ -6574,6 +8200,12 @@ class GitConfig(VC):
             return None
 
     def active_branch(self, vcdir, abortOnError=True):
+        head = self._head(vcdir)
+        if head is not None:
+            # the first decoration names the checked out branch unless HEAD is detached
+            decoration = head['refs'].split(', ')[0]
+            if decoration.startswith('HEAD -> '):
+                return decoration[len('HEAD -> '):]
         out = OutputCapture()
         cmd = ['git', 'symbolic-ref', '--short', '--quiet', 'HEAD']
         rc = self.run(cmd, nonZeroIsFatal=abortOnError, cwd=vcdir, out=out)
@@ -6584,6 +8216,7 @@ class GitConfig(VC):
 
     def update_to_branch(self, vcdir, branch, abortOnError=True):
         cmd = ['git', 'checkout', branch, '--']
+        GitConfig._invalidate(vcdir)
         self.run(cmd, nonZeroIsFatal=abortOnError, cwd=vcdir)
 
     def incoming(self, vcdir, abortOnError=True):
@@ -6637,6 +8270,7 @@ class GitConfig(VC):
         if update and not rev:
             cmd = ['git', 'pull']
             self._log_pull(vcdir, rev)
+            GitConfig._invalidate(vcdir)
             out = OutputCapture()
             rc = self.run(cmd, nonZeroIsFatal=abortOnError, cwd=vcdir, out=out)
             logvv(out.data)
@@ -6696,6 +8330,10 @@ class GitConfig(VC):
         return None
 
     def _path(self, vcdir, name, abortOnError=True):
+        metadata = GitConfig._metadata(vcdir)
+        key = 'path.' + name
+        if key in metadata:
+            return metadata[key]
         branch = self.active_branch(vcdir, abortOnError=False)
         if not branch:
             branch = 'master'
@@ -6705,7 +8343,8 @@ class GitConfig(VC):
             remote = self._branch_remote(vcdir, 'master', abortOnError=False)
         if not remote:
             remote = 'origin'
-        return self._remote_url(vcdir, remote, name == 'push', abortOnError=abortOnError)
+        metadata[key] = self._remote_url(vcdir, remote, name == 'push', abortOnError=abortOnError)
+        return metadata[key]
 
     def default_push(self, vcdir, abortOnError=True):
         """
@@ -6748,6 +8387,7 @@ class GitConfig(VC):
         cmd.append(dest if dest else 'origin')
         cmd.append('{0}master'.format('{0}:'.format(rev) if rev else ''))
         self._log_push(vcdir, dest, rev)
+        GitConfig._invalidate(vcdir)
         out = OutputCapture()
         rc = self.run(cmd, cwd=vcdir, nonZeroIsFatal=abortOnError, out=out)
         logvv(out.data)
@@ -6782,6 +8422,7 @@ class GitConfig(VC):
                 cmd.append('-q')
         else:
             cmd.extend(['master', '--'])
+        GitConfig._invalidate(vcdir)
         return self.run(cmd, cwd=vcdir, nonZeroIsFatal=abortOnError) == 0
 
     def locate(self, vcdir, patterns=None, abortOnError=True):
@@ -6851,6 +8492,7 @@ class GitConfig(VC):
         :return: True on success, False otherwise
         :rtype: bool
         """
+        GitConfig._invalidate(vcdir)
         return run(['git', 'branch', '-f', name, rev], cwd=vcdir, nonZeroIsFatal=abortOnError) == 0
 
     def latest(self, vcdir, rev1, rev2, abortOnError=True):
@@ -6898,10 +8540,14 @@ class GitConfig(VC):
 
     def root(self, directory, abortOnError=True):
         if VC._find_metadata_dir(directory, '.git'):
+            metadata = GitConfig._metadata(directory)
+            if 'root' in metadata:
+                return metadata['root']
             if self.check_for_git(abortOnError=abortOnError):
                 try:
                     out = _check_output_str(['git', 'rev-parse', '--show-toplevel'], cwd=directory, stderr=subprocess.STDOUT)
-                    return out.strip()
+                    metadata['root'] = out.strip()
+                    return metadata['root']
                 except subprocess.CalledProcessError:
                     if abortOnError:
                         abort('`git rev-parse --show-toplevel` (root) failed')
@@ -7740,6 +9386,9 @@ def _maven_deploy_dists(dists, versionGetter, repo, settingsXml,
                         generateJavadoc=False,
                         deployMapFiles=False,
                         deployRepoMetadata=False):
+    skipped = [dist.name for dist in dists if dist.isJARDistribution() and dist._sources_skipped()]
+    if skipped:
+        abort('Cannot deploy distributions without their sources archive (--no-sources was given): ' + ', '.join(skipped))
     if repo != maven_local_repository():
         # Non-local deployment requires license checking
         for dist in dists:
@@ -8361,6 +10010,9 @@ class SCMMetadata(object):
         self.write = write
 
 
+# references to environment variables expanded by os.path.expandvars
+_env_var_reference = re.compile(r'\$(\w+)|\$\{([^}]*)\}|%([^%]*)%')
+
 class Suite(object):
     """
     Command state and methods for all suite subclasses.
@@ -8410,9 +10062,10 @@ class Suite(object):
         Calls _parse_env and _load_extensions
         """
         logvv("Loading suite " + self.name)
-        self._load_suite_dict()
-        self._parse_env()
-        self._load_extensions()
+        with _Phase('suite loading'):
+            self._load_suite_dict()
+            self._parse_env()
+            self._load_extensions()
 
     def getMxCompatibility(self):
         return mx_compat.getMxCompatibility(self.requiredMxVersion)
@@ -8460,14 +10113,90 @@ class Suite(object):
         """
         return join(self.get_output_root(), basename(self.mxDir))
 
-    def _preload_suite_dict(self):
-        dictName = 'suite'
-        moduleName = 'suite'
-        modulePath = self.suite_py()
-        assert modulePath.endswith(moduleName + ".py")
-        if not exists(modulePath):
-            abort('{} is missing'.format(modulePath))
+    _suite_dict_cache_format = 1
+
+    def _suite_dict_cache_path(self):
+        # marshal data is not compatible between Python 2 and 3
+        return join(dot_mx_dir(), 'suite-dicts', self.name + '-' + hashlib.sha1(_encode(self.suite_py())).hexdigest()[:12] + '.py' + str(sys.version_info[0]))
+
+    def _load_cached_suite_dict(self, digest):
+        """
+        Loads the expanded suite dict saved by `_save_cached_suite_dict`.
+
+        :return: the suite dict or None if it is not cached or if `digest`, the mx version
+                 or the value of an environment variable referenced by the suite dict changed
+        """
+        if get_env('MX_SUITE_DICT_CACHE', 'true') == 'false':
+            return None
+        try:
+            with open(self._suite_dict_cache_path(), 'rb') as fp:
+                cacheFormat, mxVersion, cachedDigest, envVars, d = marshal.load(fp)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if cacheFormat != Suite._suite_dict_cache_format or mxVersion != str(version) or cachedDigest != digest:
+            return None
+        if any((os.environ.get(n) != v for n, v in envVars.items())):
+            return None
+        return d
+
+    def _save_cached_suite_dict(self, digest, envVars, d):
+        if get_env('MX_SUITE_DICT_CACHE', 'true') == 'false':
+            return
+        path = self._suite_dict_cache_path()
+        try:
+            ensure_dir_exists(dirname(path))
+            with SafeFileCreation(path) as sfc, open(sfc.tmpPath, 'wb') as fp:
+                marshal.dump((Suite._suite_dict_cache_format, str(version), digest, {n: os.environ.get(n) for n in envVars}, d), fp)
+        except (IOError, OSError, ValueError) as e:
+            logv('Could not save suite dict of {} to {}: {}'.format(self.name, path, e))
+
+    def _preload_suite_dict(self):
+        dictName = 'suite'
+        moduleName = 'suite'
+        modulePath = self.suite_py()
+        assert modulePath.endswith(moduleName + ".py")
+        if not exists(modulePath):
+            abort('{} is missing'.format(modulePath))
+
+        with open(modulePath, 'rb') as fp:
+            digest = hashlib.sha1(fp.read()).hexdigest()
+        notJsonifiableMessage = None
+        self._preloaded_suite_dict = self._load_cached_suite_dict(digest)
+        if self._preloaded_suite_dict is None:
+            notJsonifiableMessage = self._import_suite_dict(dictName, moduleName, modulePath, digest)
+
+        if self.name == 'mx':
+            self.requiredMxVersion = version
+        elif 'mxversion' in self._preloaded_suite_dict:
+            try:
+                self.requiredMxVersion = VersionSpec(self._preloaded_suite_dict['mxversion'])
+            except AssertionError as ae:
+                abort('Exception while parsing "mxversion" in suite file: ' + str(ae), context=self)
+
+        conflictResolution = self._preloaded_suite_dict.get('versionConflictResolution')
+        if conflictResolution:
+            self.versionConflictResolution = conflictResolution
+
+        _imports = self._preloaded_suite_dict.get('imports', {})
+        for _suite in _imports.get('suites', []):
+            context = "suite import '" + _suite.get('name', '<undefined>') + "'"
+            os_arch = Suite._pop_os_arch(_suite, context)
+            Suite._merge_os_arch_attrs(_suite, os_arch, context)
+
+        if notJsonifiableMessage:
+            if self.getMxCompatibility().requireJsonifiableSuite():
+                abort(notJsonifiableMessage)
+            else:
+                warn(notJsonifiableMessage)
+
+    def _import_suite_dict(self, dictName, moduleName, modulePath, digest):
+        """
+        Imports `modulePath` and expands the value of its `dictName` variable into `self._preloaded_suite_dict`.
+        If the file only contains JSON like data, the expanded dict is also saved for `_load_cached_suite_dict`.
+        Other suite files can compute their dict in arbitrary ways and are therefore imported every time.
 
+        :return: an error message if the file does not only contain JSON like data, None otherwise
+        """
         savedModule = sys.modules.get(moduleName)
         if savedModule:
             warn(modulePath + ' conflicts with ' + savedModule.__file__)
@@ -8501,6 +10230,7 @@ class Suite(object):
                 for i in range(len(value)):
                     value[i] = expand(value[i], context + [str(i)])
             elif isinstance(value, str):
+                envVars.update((m.group(1) or m.group(2) or m.group(3) for m in _env_var_reference.finditer(value)))
                 value = expandvars(value)
                 if '$' in value or '%' in value:
                     abort('value of ' + '.'.join(context) + ' contains an undefined environment variable: ' + value)
@@ -8514,33 +10244,14 @@ class Suite(object):
         if not hasattr(module, dictName):
             abort(modulePath + ' must define a variable named "' + dictName + '"')
 
+        envVars = set()
         self._preloaded_suite_dict = expand(getattr(module, dictName), [dictName])
 
-        if self.name == 'mx':
-            self.requiredMxVersion = version
-        elif 'mxversion' in self._preloaded_suite_dict:
-            try:
-                self.requiredMxVersion = VersionSpec(self._preloaded_suite_dict['mxversion'])
-            except AssertionError as ae:
-                abort('Exception while parsing "mxversion" in suite file: ' + str(ae), context=self)
-
-        conflictResolution = self._preloaded_suite_dict.get('versionConflictResolution')
-        if conflictResolution:
-            self.versionConflictResolution = conflictResolution
-
-        _imports = self._preloaded_suite_dict.get('imports', {})
-        for _suite in _imports.get('suites', []):
-            context = "suite import '" + _suite.get('name', '<undefined>') + "'"
-            os_arch = Suite._pop_os_arch(_suite, context)
-            Suite._merge_os_arch_attrs(_suite, os_arch, context)
-
         (jsonifiable, errorMessage) = self._is_jsonifiable(modulePath)
         if not jsonifiable:
-            msg = "Cannot parse file {}. Please make sure that this file only contains dicts and arrays. {}".format(modulePath, errorMessage)
-            if self.getMxCompatibility().requireJsonifiableSuite():
-                abort(msg)
-            else:
-                warn(msg)
+            return "Cannot parse file {}. Please make sure that this file only contains dicts and arrays. {}".format(modulePath, errorMessage)
+        self._save_cached_suite_dict(digest, envVars, self._preloaded_suite_dict)
+        return None
 
     def _is_jsonifiable(self, suiteFile):
         """Other tools require the suite.py files to be parseable without running a python interpreter.
@@ -8715,11 +10426,13 @@ class Suite(object):
         for r in self.repositoryDefs:
             r.resolveLicenses()
         self.resolved_dependencies = True
+        _invalidate_dep_graph()
 
     def _post_init_finish(self):
         if hasattr(self, 'mx_post_parse_cmd_line'):
             self.mx_post_parse_cmd_line(_opts)
         self.post_init = True
+        _invalidate_dep_graph()
 
     def version(self, abortOnError=True):
         abort('version not implemented')
@@ -8936,7 +10649,7 @@ class Suite(object):
         elif layout is not None:
             d = LayoutJARDistribution(self, name, deps, layout, path, platformDependent, theLicense, testDistribution=testDistribution, **attrs)
         else:
-            subDir = attrs.pop('subDir', None)
+            subDir = _intern(attrs.pop('subDir', None))
             sourcesPath = attrs.pop('sourcesPath', None)
             if sourcesPath == "<unified>":
                 sourcesPath = path
@@ -8962,6 +10675,7 @@ class Suite(object):
         self.dists = [d for d in self.dists if d.name != name]
         d = _dists[name]
         del _dists[name]
+        _invalidate_dep_graph(removed=[d])
         return d
 
     @staticmethod
@@ -8971,7 +10685,8 @@ class Suite(object):
             return []
         if not isinstance(v, list):
             abort('Attribute "' + name + '" for ' + context + ' must be a list', context)
-        return v
+        # the lists are mostly names of dependencies which are interned like the names of the dependencies themselves
+        return [_intern(e) for e in v]
 
     @staticmethod
     def _pop_os_arch(attrs, context):
@@ -9316,7 +11031,8 @@ class SourceSuite(Suite):
         """
         Return the current head changeset of this suite.
         """
-        # we do not cache the version because it changes in development
+        # the suite does not cache the version because it changes in development,
+        # the VC only remembers it until mx itself updates the repository
         if not self.vc:
             return None
         return self.vc.parent(self.vc_dir, abortOnError=abortOnError)
@@ -9406,7 +11122,7 @@ class SourceSuite(Suite):
                 else:
                     srcDirs = Suite._pop_list(attrs, 'sourceDirs', context)
                     projectDir = attrs.pop('dir', None)
-                    subDir = attrs.pop('subDir', None)
+                    subDir = _intern(attrs.pop('subDir', None))
                     if projectDir:
                         d = join(self.dir, projectDir)
                     elif subDir is None:
@@ -9736,6 +11452,7 @@ class BinarySuite(Suite):
         # Remove projects from dist dependencies
         for d in self.dists:
             d.deps = [dep for dep in d.deps if dep and not dep.isJavaProject()]
+        _invalidate_dep_graph()
 
 
 class InternalSuite(SourceSuite):
@@ -9838,7 +11555,7 @@ class XMLDoc(xml.dom.minidom.Document):
             result = '<?xml version="1.0" encoding="UTF-8"?>\n' + result
         if escape:
             entities = {'"':  "&quot;", "'":  "&apos;", '\n': '&#10;'}
-            result = xml.sax.saxutils.escape(result, entities)
+            result = _xml_sax_saxutils.escape(result, entities)
         if standalone is not None:
             result = result.replace('encoding="UTF-8"?>', 'encoding="UTF-8" standalone="' + str(standalone) + '"?>')
         return result
@@ -10256,6 +11973,121 @@ def library(name, fatalIfMissing=True, context=None):
     return l
 
 
+class _DepClosureIndex(object):
+    """
+    An index of the graph formed by the registered dependencies and the edges followed by `classpath_entries`.
+    The dependencies are numbered in topological order (i.e. a dependency is numbered before the dependencies
+    that depend on it) and the transitive closure of each dependency is stored as a bitset in a Python int.
+
+    The index only decides which memoized `classpath_entries` results are invalidated by a change of the graph.
+    The entries themselves are not derived from it: their order is the order in which a walk from the roots
+    first reaches them, which a topological order of the whole graph does not preserve, and `excludes` and
+    `preferProjects` prune edges during the walk rather than filtering the closure.
+    """
+    def __init__(self):
+        self.order = []
+        self.ids = {}
+        successors = {}
+
+        def _visit(dep, edge):
+            self.ids[dep] = len(self.order)
+            self.order.append(dep)
+
+        def _visitEdge(src, dst, edge):
+            successors.setdefault(src, []).append(dst)
+
+        walk_deps(visit=_visit, visitEdge=_visitEdge, ignoredEdges=[DEP_ANNOTATION_PROCESSOR, DEP_BUILD])
+        self.closures = []
+        for i, dep in enumerate(self.order):
+            closure = 1 << i
+            for dst in successors.get(dep, []):
+                dst_id = self.ids.get(dst)
+                # a successor is numbered after `dep` only if there is a cycle in which case
+                # its closure is not yet known and the closure of `dep` is an approximation
+                if dst_id is not None and dst_id < i:
+                    closure |= self.closures[dst_id]
+                elif dst_id is not None:
+                    closure |= 1 << dst_id
+            self.closures.append(closure)
+
+    def closure(self, deps):
+        """
+        Gets the union of the transitive closures of `deps` as a bitset or None if any of `deps` is not in this index.
+        """
+        closure = 0
+        for dep in deps:
+            dep_id = self.ids.get(dep)
+            if dep_id is None:
+                return None
+            closure |= self.closures[dep_id]
+        return closure
+
+    def mask(self, deps):
+        """Gets the bitset of the dependencies in `deps` that are in this index."""
+        mask = 0
+        for dep in deps:
+            dep_id = self.ids.get(dep)
+            if dep_id is not None:
+                mask |= 1 << dep_id
+        return mask
+
+
+_dep_closure_index = None
+
+"""
+The set of the dependencies archived by a distribution with unified sources (see `JARDistribution._sources_skipped`).
+"""
+_unified_sources_archived = None
+
+"""
+Map from the arguments of a `classpath_entries` call to the bitset of the closure of its roots
+in `_dep_closure_index` and its result.
+"""
+_classpath_entries_cache = {}
+
+
+def _invalidate_dep_graph(removed=None):
+    """
+    Discards the results memoized against the dependency graph. This must be called when dependencies
+    or edges are added to the graph (i.e. when suites are loaded or their dependencies resolved). If
+    only dependencies or edges were removed, `removed` is the dependencies that were removed or from which
+    edges were removed and only the results whose closure contains one of these dependencies are discarded.
+    The index remains usable in that case as its closures are then a superset of the actual closures.
+    """
+    global _dep_closure_index, _unified_sources_archived
+    _unified_sources_archived = None
+    if removed is None or _dep_closure_index is None:
+        _dep_closure_index = None
+        _classpath_entries_cache.clear()
+    elif _classpath_entries_cache:
+        mask = _dep_closure_index.mask(removed)
+        if mask:
+            for key, (closure, _) in list(_classpath_entries_cache.items()):
+                if closure & mask:
+                    del _classpath_entries_cache[key]
+
+
+def _get_unified_sources_archived():
+    global _unified_sources_archived
+    archived = _unified_sources_archived
+    if archived is None:
+        archived = set()
+        for d in _dists.values():
+            if d.isJARDistribution() and d._sources_path == d.original_path():
+                archived.update(d.archived_deps())
+        _unified_sources_archived = archived
+    return archived
+
+
+def _get_dep_closure_index():
+    global _dep_closure_index
+    index = _dep_closure_index
+    if index is None:
+        index = _DepClosureIndex()
+        _dep_closure_index = index
+    return index
+
+
 def classpath_entries(names=None, includeSelf=True, preferProjects=False, excludes=None):
     """
     Gets the transitive set of dependencies that need to be on the class path
@@ -10297,6 +12129,11 @@ def classpath_entries(names=None, includeSelf=True, preferProjects=False, exclud
 
     assert len(set(roots) & set(excludes)) == 0
 
+    key = (None if names is None else tuple(roots), includeSelf, preferProjects, tuple(excludes))
+    cached = _classpath_entries_cache.get(key)
+    if cached is not None:
+        return list(cached[1])
+
     cpEntries = []
     def _preVisit(dst, edge):
         if not isinstance(dst, ClasspathDependency):
@@ -10316,6 +12153,9 @@ def classpath_entries(names=None, includeSelf=True, preferProjects=False, exclud
             return
         cpEntries.append(dep)
     walk_deps(roots=roots, visit=_visit, preVisit=_preVisit, ignoredEdges=[DEP_ANNOTATION_PROCESSOR, DEP_BUILD])
+    closure = _get_dep_closure_index().closure(roots)
+    if closure is not None:
+        _classpath_entries_cache[key] = closure, tuple(cpEntries)
     return cpEntries
 
 
@@ -10506,9 +12346,10 @@ def walk_deps(roots=None, preVisit=None, visit=None, ignoredEdges=None, visitEdg
            `Dependency` and a `DepEdge` value for the edge that can also be used to trace the path from
            a traversal root to the edge.
     """
-    visited = set()
-    for dep in dependencies() if not roots else roots:
-        dep.walk_deps(preVisit, visit, visited, ignoredEdges, visitEdge)
+    if not ignoredEdges:
+        # Default ignored edges
+        ignoredEdges = [DEP_ANNOTATION_PROCESSOR, DEP_EXCLUDED, DEP_BUILD]
+    _walk_deps_from(dependencies() if not roots else roots, None, None, preVisit, visit, ignoredEdges, visitEdge)
 
 def sorted_dists():
     """
@@ -10649,6 +12490,11 @@ environment variables:
         self.add_argument('--version-conflict-resolution', dest='version_conflict_resolution', action='store', help='resolution mechanism used when a suite is imported with different versions', default='suite', choices=['suite', 'none', 'latest', 'latest_all', 'ignore'])
         self.add_argument('-c', '--max-cpus', action='store', type=int, dest='cpu_count', help='the maximum number of cpus to use during build', metavar='<cpus>', default=None)
         self.add_argument('--strip-jars', action='store_true', help='produce and use stripped jars in all mx commands.')
+        self.add_argument('--no-sources', action='store_true', help='do not produce the separate sources archives of JAR distributions (faster developer builds).')
+        self.add_argument('--startup-profile', action='store_true', help='report the time spent in the startup phases of mx and in importing modules on demand')
+        self.add_argument('--profile', nargs='?', const='mx.prof', help='run mx under cProfile and write the statistics in pstats format to <file> (default: mx.prof) ' +
+                          'and the time spent in the phases of mx (suite discovery, JDK probing, subprocess wait, ...) as JSON to <file> with a .json extension. ' +
+                          'The option is passed on to mx processes started with run_mx, which write to <file> with a numbered infix.', metavar='<file>')
         self.add_argument('--env', dest='additional_env', help='load an additional env file in the mx dir of the primary suite', metavar='<name>')
 
         if not is_windows():
@@ -10683,6 +12529,15 @@ environment variables:
 
             self.initialCommandAndArgs = opts.__dict__.pop('initialCommandAndArgs')
 
+            # the global options precede the command and its arguments which may include a --profile of their own
+            global_args = sys.argv[1:len(sys.argv) - len(self.initialCommandAndArgs)]
+            if '--profile' in global_args:
+                # only --profile=<file> specifies a file, in "--profile cmd" the command is not the file
+                profile_index = global_args.index('--profile')
+                if global_args[profile_index + 1:profile_index + 2] == [opts.profile]:
+                    self.initialCommandAndArgs.insert(0, opts.profile)
+                    opts.profile = 'mx.prof'
+
             # For some reason, argparse considers an unknown argument starting with '-'
             # and containing a space as a positional argument instead of an optional
             # argument. We need to treat these as unknown optional arguments.
@@ -10735,10 +12590,9 @@ environment variables:
 
             opts.ignored_projects += os.environ.get('IGNORED_PROJECTS', '').split(',')
 
-            mx_gate._jacoco = opts.jacoco
-            mx_gate._jacoco_whitelisted_packages.extend(opts.jacoco_whitelist_package)
-            mx_gate.add_jacoco_excluded_annotations(opts.jacoco_exclude_annotation)
-            mx_gate.Task.verbose = opts.verbose
+            global _gate_opts
+            _gate_opts = opts
+            _configure_mx_gate()
         else:
             parser = ArgParser(parents=[self])
             parser.add_argument('commandAndArgs', nargs=REMAINDER, metavar='command args...')
@@ -11044,7 +12898,7 @@ def _find_jdk(versionCheck=None, versionDescription=None):
         candidateJdks += os.environ.get('EXTRA_JAVA_HOMES').split(os.pathsep)
         source = 'EXTRA_JAVA_HOMES'
 
-    result = _filtered_jdk_configs(candidateJdks, versionCheck, missingIsError=False, source=source)
+    result = _filtered_jdk_configs(candidateJdks, versionCheck, missingIsError=False, source=source, first=True)
     if result:
         return result[0]
     return None
@@ -11084,10 +12938,69 @@ def _probe_JDK(home):
         _probed_JDKs[home] = res
     return res
 
-def _filtered_jdk_configs(candidates, versionCheck, missingIsError=False, source=None):
+def _jdk_probe_jobs():
+    # probing mostly waits for JVM launches so use more threads than there are CPUs
+    return max(cpu_count(), 8)
+
+def _probe_JDKs(homes, jobs=None):
+    """
+    Probes the JDKs in `homes` concurrently and yields the `(home, result)` pairs, where result is the
+    result of `_probe_JDK`, in the order of `homes`. Probing is started for at most `jobs` homes from
+    the one whose result is awaited on, so homes after the point where the caller stops iterating are
+    not probed unless their probing had already started.
+    """
+    jobs = jobs or _jdk_probe_jobs()
+    unique = list(OrderedDict.fromkeys(homes))
+    position = dict((home, i) for i, home in enumerate(unique))
+    threads = {}
+    next_start = 0
+    for home in homes:
+        while next_start < min(len(unique), position[home] + jobs):
+            h = unique[next_start]
+            next_start += 1
+            if h not in _probed_JDKs:
+                t = Thread(target=_probe_JDK, args=(h,))
+                t.daemon = True
+                t.start()
+                threads[h] = t
+        t = threads.get(home)
+        if t is not None:
+            t.join()
+        yield home, _probe_JDK(home)
+
+def _release_file_version(home):
+    """
+    Gets the JAVA_VERSION value of the ``release`` file in `home` as a VersionSpec
+    without launching the JDK or None if it cannot be determined.
+    """
+    try:
+        with open(join(home, 'release')) as fp:
+            for line in fp:
+                if line.startswith('JAVA_VERSION='):
+                    return VersionSpec(line[len('JAVA_VERSION='):].strip().strip('"'))
+    except (IOError, OSError, AssertionError):
+        pass
+    return None
+
+def _filtered_jdk_configs(candidates, versionCheck, missingIsError=False, source=None, first=False):
+    """
+    Gets the JDKConfig objects for the JDKs in `candidates` that satisfy `versionCheck`.
+
+    The candidates are probed concurrently (see `_probe_JDKs`). Candidates whose ``release``
+    file shows they cannot satisfy `versionCheck` are not probed at all. If `first` is true,
+    the result is the first matching JDK (if any). The candidates after it are only probed
+    if their probing had already started, i.e., at most `_jdk_probe_jobs() - 1` of them.
+    """
     filtered = []
-    for candidate in candidates:
-        jdk = _probe_JDK(candidate)
+    if versionCheck:
+        def _may_match(candidate):
+            releaseVersion = _release_file_version(candidate)
+            if releaseVersion is None or versionCheck(releaseVersion):
+                return True
+            logv('Not probing {}: the JAVA_VERSION in its release file ({}) does not match'.format(candidate, releaseVersion))
+            return False
+        candidates = [c for c in candidates if _may_match(c)]
+    for candidate, jdk in _probe_JDKs(candidates):
         if isinstance(jdk, JDKConfigException):
             if source:
                 message = 'Path in ' + source + ' is not pointing to a JDK (' + jdk.message + '): ' + candidate
@@ -11103,6 +13016,8 @@ def _filtered_jdk_configs(candidates, versionCheck, missingIsError=False, source
         else:
             if not versionCheck or versionCheck(jdk.version):
                 filtered.append(jdk)
+                if first:
+                    return filtered
     return filtered
 
 def find_classpath_arg(vmArgs):
@@ -11374,6 +13289,8 @@ def run_mx(args, suite=None, mxpy=None, nonZeroIsFatal=True, out=None, err=None,
             commands.append('-v')
     if _opts.version_conflict_resolution != 'suite':
         commands += ['--version-conflict-resolution', _opts.version_conflict_resolution]
+    if _opts.profile:
+        commands.append('--profile=' + _child_profile_path())
     return run(commands + args, nonZeroIsFatal=nonZeroIsFatal, out=out, err=err, timeout=timeout, env=env, cwd=cwd)
 
 def _get_new_progress_group_args():
@@ -11408,6 +13325,12 @@ def run(args, nonZeroIsFatal=True, out=None, err=None, cwd=None, timeout=None, e
             abort('Type of argument {} is not str but {}: {}\nArguments: {}'.format(idx, type(arg).__name__, arg, args))
         idx = idx + 1
 
+    # the output of an operation on one of several repositories processed concurrently is grouped (see _run_per_repository)
+    if out is None:
+        out = _RepositoryOutput.collector(sys.stdout)
+    if err is None:
+        err = _RepositoryOutput.collector(sys.stderr)
+
     if env is None:
         env = os.environ.copy()
 
@@ -11453,6 +13376,7 @@ def run(args, nonZeroIsFatal=True, out=None, err=None, cwd=None, timeout=None, e
         timeout = _opts.ptimeout
 
     sub = None
+    started = None
 
     try:
         if timeout or is_windows():
@@ -11467,6 +13391,7 @@ def run(args, nonZeroIsFatal=True, out=None, err=None, cwd=None, timeout=None, e
         stdout = out if not callable(out) else subprocess.PIPE
         stderr = err if not callable(err) else subprocess.PIPE
         stdin_pipe = None if stdin is None else subprocess.PIPE
+        started = time.time()
         p = subprocess.Popen(args, cwd=cwd, stdout=stdout, stderr=stderr, preexec_fn=preexec_fn, creationflags=creationflags, env=env, stdin=stdin_pipe, **kwargs) #pylint: disable=subprocess-popen-preexec-fn
         sub = _addSubprocess(p, args)
         joiners = []
@@ -11511,6 +13436,8 @@ def run(args, nonZeroIsFatal=True, out=None, err=None, cwd=None, timeout=None, e
     except KeyboardInterrupt:
         abort(1, killsig=signal.SIGINT)
     finally:
+        if started is not None:
+            _record_phase('subprocess wait', time.time() - started)
         _removeSubprocess(sub)
         os.remove(subprocessCommandFile)
 
@@ -11623,6 +13550,9 @@ class DuplicateSuppressingStream:
 A JavaCompliance simplifies comparing Java compliance values extracted from a JDK version string.
 """
 class JavaCompliance(Comparable):
+    # there is one instance per project
+    __slots__ = ('value', '_upper_bound')
+
     def __init__(self, ver):
         ver = str(ver)
         pattern = r'(?:1\.)?(\d+)(.*)'
@@ -11752,6 +13682,170 @@ def java_debug_args():
     return debug_args
 
 
+class _JDKProbes(object):
+    """
+    The results of launching the tools of a JDK to probe its properties (e.g. the output of
+    ``java -version``), persisted in ``~/.mx/jdk-probes`` so that steady state mx invocations
+    do not have to launch any JVM. The persisted results are keyed by the real JDK home and
+    are discarded when the modification time of the ``release`` or ``lib/modules`` file of
+    the JDK or the mx version changes. Setting MX_JDK_PROBE_CACHE to false disables persisting.
+    """
+    def __init__(self, home):
+        self.home = home
+        self.path = join(dot_mx_dir(), 'jdk-probes', basename(home) + '-' + hashlib.sha1(_encode(home)).hexdigest()[:12] + '.json')
+        self._values = None
+
+    def _key(self):
+        def _mtime(path):
+            return os.path.getmtime(path) if exists(path) else None
+        return [self.home, _mtime(join(self.home, 'release')), _mtime(join(self.home, 'lib', 'modules')), str(version)]
+
+    def _load(self):
+        values = {}
+        if get_env('MX_JDK_PROBE_CACHE', 'true') != 'false':
+            try:
+                with open(self.path) as fp:
+                    probes = json.load(fp)
+                if probes.get('key') == self._key():
+                    values = _JDKProbes._str_values(probes['values'])
+            except (IOError, OSError, ValueError, KeyError, AttributeError):
+                pass
+        return values
+
+    @staticmethod
+    def _str_values(value):
+        """
+        Converts the unicode strings produced by the Python 2 JSON parser to str.
+        """
+        if isinstance(value, dict):
+            return dict(((_JDKProbes._str_values(k), _JDKProbes._str_values(v)) for k, v in value.items()))
+        if isinstance(value, list):
+            return [_JDKProbes._str_values(e) for e in value]
+        if sys.version_info[0] < 3 and isinstance(value, _unicode):
+            return value.encode('utf-8')
+        return value
+
+    def get(self, name, compute):
+        """
+        Gets the persisted result of the probe `name` or computes it with `compute` and persists it.
+        The result must be representable in JSON. Exceptions raised by `compute` are propagated and not persisted.
+        """
+        if self._values is None:
+            with _Phase('JDK probing'):
+                self._values = self._load()
+        if name not in self._values:
+            with _Phase('JDK probing'):
+                value = compute()
+            self._values[name] = value
+            if get_env('MX_JDK_PROBE_CACHE', 'true') != 'false':
+                # merge with the results persisted by other processes in the meantime
+                values = self._load()
+                values[name] = value
+                try:
+                    with SafeFileCreation(self.path) as sfc, open(sfc.tmpPath, 'w') as fp:
+                        json.dump({'key': self._key(), 'values': values}, fp, indent=1)
+                except (IOError, OSError) as e:
+                    logv('Could not save JDK probes to {}: {}'.format(self.path, e))
+        return self._values[name]
+
+
+class _JDKModuleDescriptors(object):
+    """
+    The module descriptors of a JDK. For a JDK image, they are persisted next to the JDK
+    probes (see `_JDKProbes`) in a compact binary form that is read lazily per module:
+    a 4 byte header length, a marshalled header with an index of the modules and then
+    one marshalled record per module.
+    """
+    _magic = 'mx-jdk-modules'
+    _format = 1
+
+    def __init__(self, probes):
+        self._probes = probes
+        # marshal data is not compatible between Python 2 and 3
+        self.path = probes.path[:-len('.json')] + '.modules' + str(sys.version_info[0])
+        self.keyword = None
+        self.names = []
+        self._index = {}
+        self._base = None
+        self._modules = {}
+
+    def load(self):
+        """
+        Loads the header of the persisted module descriptors.
+
+        :return: True if the descriptors were loaded, False if they have not been persisted or are out of date
+        """
+        if get_env('MX_JDK_PROBE_CACHE', 'true') == 'false':
+            return False
+        try:
+            with open(self.path, 'rb') as fp:
+                size = struct.unpack('>I', fp.read(4))[0]
+                header = marshal.loads(fp.read(size))
+            if header[0] != _JDKModuleDescriptors._magic or header[1] != _JDKModuleDescriptors._format or list(header[2]) != self._probes._key():
+                return False
+            self.keyword, self.names, self._index = header[3], list(header[4]), header[5]
+            self._base = 4 + size
+            return True
+        except (IOError, OSError, EOFError, ValueError, TypeError, IndexError, struct.error):
+            return False
+
+    def set(self, keyword, modules, persist):
+        """
+        Sets the module descriptors of the JDK, persisting them if `persist` is true.
+        """
+        self.keyword = keyword
+        self.names = [m.name for m in modules]
+        self._modules = {m.name: m for m in modules}
+        if persist and get_env('MX_JDK_PROBE_CACHE', 'true') != 'false':
+            index = {}
+            records = []
+            offset = 0
+            for m in modules:
+                record = marshal.dumps((m.name, m.exports, m.requires, sorted(m.uses), m.provides, sorted(m.packages), m.boot))
+                index[m.name] = (offset, len(record))
+                offset += len(record)
+                records.append(record)
+            header = marshal.dumps((_JDKModuleDescriptors._magic, _JDKModuleDescriptors._format, self._probes._key(), keyword, self.names, index))
+            try:
+                ensure_dir_exists(dirname(self.path))
+                with SafeFileCreation(self.path) as sfc, open(sfc.tmpPath, 'wb') as fp:
+                    fp.write(struct.pack('>I', len(header)))
+                    fp.write(header)
+                    for record in records:
+                        fp.write(record)
+            except (IOError, OSError) as e:
+                logv('Could not save JDK module descriptors to {}: {}'.format(self.path, e))
+
+    def get(self, name):
+        """
+        Gets the descriptor for the module named `name` or None if the JDK has no such module.
+        """
+        jmd = self._modules.get(name)
+        if jmd is None and name in self._index:
+            offset, length = self._index[name]
+            with open(self.path, 'rb') as fp:
+                fp.seek(self._base + offset)
+                name, exports, requires, uses, provides, packages, boot = marshal.loads(fp.read(length))
+            jmd = JavaModuleDescriptor(name, exports, requires, uses, provides, packages, boot=boot)
+            self._modules[name] = jmd
+        return jmd
+
+    def get_all(self):
+        """
+        Gets the descriptors for all modules, reading the persisted ones not yet loaded in one pass.
+        """
+        missing = [name for name in self.names if name not in self._modules]
+        if missing:
+            with open(self.path, 'rb') as fp:
+                fp.seek(self._base)
+                data = fp.read()
+            for name in missing:
+                offset, length = self._index[name]
+                _, exports, requires, uses, provides, packages, boot = marshal.loads(data[offset:offset + length])
+                self._modules[name] = JavaModuleDescriptor(name, exports, requires, uses, provides, packages, boot=boot)
+        return [self._modules[name] for name in self.names]
+
+
 class JDKConfig(Comparable):
     """
     A JDKConfig object encapsulates info about an installed or deployed JDK.
@@ -11791,17 +13885,24 @@ class JDKConfig(Comparable):
         self.java_args_pfx = sum(map(shlex.split, _opts.java_args_pfx), [])
         self.java_args_sfx = sum(map(shlex.split, _opts.java_args_sfx), [])
 
-        # Prepend the -d64 VM option only if the java command supports it
-        try:
-            output = _check_output_str([self.java, '-d64', '-version'], stderr=subprocess.STDOUT)
-            self.java_args = ['-d64'] + self.java_args
-        except OSError as e:
-            raise JDKConfigException('{}: {}'.format(e.errno, e.strerror))
-        except subprocess.CalledProcessError as e:
+        self._probes = _JDKProbes(home)
+
+        def _probe_version():
             try:
-                output = _check_output_str([self.java, '-version'], stderr=subprocess.STDOUT)
+                return {'d64': True, 'output': _check_output_str([self.java, '-d64', '-version'], stderr=subprocess.STDOUT)}
+            except OSError as e:
+                raise JDKConfigException('{}: {}'.format(e.errno, e.strerror))
             except subprocess.CalledProcessError as e:
-                raise JDKConfigException('{}: {}'.format(e.returncode, e.output))
+                try:
+                    return {'d64': False, 'output': _check_output_str([self.java, '-version'], stderr=subprocess.STDOUT)}
+                except subprocess.CalledProcessError as e:
+                    raise JDKConfigException('{}: {}'.format(e.returncode, e.output))
+
+        # Prepend the -d64 VM option only if the java command supports it
+        probe = self._probes.get('version', _probe_version)
+        output = probe['output']
+        if probe['d64']:
+            self.java_args = ['-d64'] + self.java_args
 
         def _checkOutput(out):
             return 'java version' in out
@@ -11831,9 +13932,11 @@ class JDKConfig(Comparable):
 
     def _init_classpaths(self):
         if not self._classpaths_initialized:
-            _, binDir = _compile_mx_class('ClasspathDump', jdk=self)
             if self.javaCompliance <= JavaCompliance('1.8'):
-                self._bootclasspath, self._extdirs, self._endorseddirs = [x if x != 'null' else None for x in _check_output_str([self.java, '-cp', _cygpathU2W(binDir), 'ClasspathDump'], stderr=subprocess.PIPE).split('|')]
+                def _probe_classpaths():
+                    _, binDir = _compile_mx_class('ClasspathDump', jdk=self)
+                    return _check_output_str([self.java, '-cp', _cygpathU2W(binDir), 'ClasspathDump'], stderr=subprocess.PIPE)
+                self._bootclasspath, self._extdirs, self._endorseddirs = [x if x != 'null' else None for x in self._probes.get('ClasspathDump', _probe_classpaths).split('|')]
                 # All 3 system properties accessed by ClasspathDump are expected to exist
                 if not self._bootclasspath or not self._extdirs or not self._endorseddirs:
                     warn("Could not find all classpaths: boot='" + str(self._bootclasspath) + "' extdirs='" + str(self._extdirs) + "' endorseddirs='" + str(self._endorseddirs) + "'")
@@ -11958,12 +14061,14 @@ class JDKConfig(Comparable):
         Gets the lint warnings supported by this JDK.
         """
         if self._knownJavacLints is None:
-            try:
-                out = _check_output_str([self.javac, '-X'], stderr=subprocess.STDOUT)
-            except subprocess.CalledProcessError as e:
-                if e.output:
-                    log(e.output)
-                raise e
+            def _probe_javac_options():
+                try:
+                    return _check_output_str([self.javac, '-X'], stderr=subprocess.STDOUT)
+                except subprocess.CalledProcessError as e:
+                    if e.output:
+                        log(e.output)
+                    raise e
+            out = self._probes.get('javac -X', _probe_javac_options)
             if self.javaCompliance < JavaCompliance('1.9'):
                 lintre = re.compile(r"-Xlint:\{([a-z-]+(?:,[a-z-]+)*)\}")
                 m = lintre.search(out)
@@ -11991,6 +14096,88 @@ class JDKConfig(Comparable):
                 warn('Did not find lint warnings in output of "javac -X"')
         return self._knownJavacLints
 
+    def _list_modules(self):
+        """
+        Runs ``ListModules`` on this JDK and parses its output.
+
+        :return: the keyword used to denote transitive dependencies and a list of `JavaModuleDescriptor` objects
+        """
+        addExportsArg = '--add-exports=java.base/jdk.internal.module=ALL-UNNAMED'
+        _, binDir = _compile_mx_class('ListModules', jdk=self, extraJavacArgs=[addExportsArg])
+        out = LinesOutputCapture()
+        run([self.java, '-cp', _cygpathU2W(binDir), addExportsArg, 'ListModules'], out=out)
+        lines = out.lines
+
+        modules = {}
+        name = None
+        requires = {}
+        exports = {}
+        provides = {}
+        uses = set()
+        packages = set()
+        boot = None
+
+        keyword = lines[0]
+        assert keyword in ('transitive', 'public')
+
+        for line in lines[1:]:
+            parts = line.strip().split()
+            assert len(parts) > 0, '>>>'+line+'<<<'
+            if len(parts) == 1:
+                if name is not None:
+                    assert name not in modules, 'duplicate module: ' + name
+                    modules[name] = JavaModuleDescriptor(name, exports, requires, uses, provides, packages, boot=boot)
+                name = parts[0]
+                requires = {}
+                exports = {}
+                provides = {}
+                uses = set()
+                packages = set()
+                boot = None
+            else:
+                assert name, 'cannot parse module descriptor line without module name: ' + line
+                a = parts[0]
+                if a == 'requires':
+                    module = parts[-1]
+                    modifiers = parts[1:-2] if len(parts) > 2 else []
+                    requires[module] = modifiers
+                elif a == 'boot':
+                    boot = parts[1] == 'true'
+                elif a == 'exports':
+                    source = parts[1]
+                    if len(parts) > 2:
+                        assert parts[2] == 'to'
+                        targets = parts[3:]
+                    else:
+                        targets = []
+                    exports[source] = targets
+                elif a == 'uses':
+                    uses.update(parts[1:])
+                elif a == 'package':
+                    packages.update(parts[1:])
+                elif a == 'provides':
+                    assert len(parts) == 4 and parts[2] == 'with'
+                    service = parts[1]
+                    provider = parts[3]
+                    provides.setdefault(service, []).append(provider)
+                else:
+                    abort('Cannot parse module descriptor line: ' + str(parts))
+        if name is not None:
+            assert name not in modules, 'duplicate module: ' + name
+            modules[name] = JavaModuleDescriptor(name, exports, requires, uses, provides, packages, boot=boot)
+        return keyword, list(modules.values())
+
+    def _module_descriptors(self):
+        if not hasattr(self, '.moduleDescriptors'):
+            descriptors = _JDKModuleDescriptors(self._probes)
+            # the modules of an exploded JDK build can change without the probe key changing
+            isImage = exists(join(self.home, 'lib', 'modules'))
+            if not isImage or not descriptors.load():
+                keyword, modules = self._list_modules()
+                descriptors.set(keyword, modules, persist=isImage)
+            setattr(self, '.moduleDescriptors', descriptors)
+        return getattr(self, '.moduleDescriptors')
+
     def get_modules(self):
         """
         Gets the modules in this JDK.
@@ -12001,86 +14188,19 @@ class JDKConfig(Comparable):
         if self.javaCompliance < '9':
             return []
         if not hasattr(self, '.modules'):
-            jdkModules = join(self.home, 'lib', 'modules')
-            cache = join(ensure_dir_exists(join(primary_suite().get_output_root(), '.jdk' + str(self.version))), 'listmodules')
-            isJDKImage = exists(jdkModules)
-            if not exists(cache) or not isJDKImage or TimeStampFile(jdkModules).isNewerThan(cache) or TimeStampFile(__file__).isNewerThan(cache):
-                addExportsArg = '--add-exports=java.base/jdk.internal.module=ALL-UNNAMED'
-                _, binDir = _compile_mx_class('ListModules', jdk=self, extraJavacArgs=[addExportsArg])
-                out = LinesOutputCapture()
-                run([self.java, '-cp', _cygpathU2W(binDir), addExportsArg, 'ListModules'], out=out)
-                lines = out.lines
-                if isJDKImage:
-                    try:
-                        with open(cache, 'w') as fp:
-                            fp.write('\n'.join(lines))
-                    except IOError as e:
-                        warn('Error writing to ' + cache + ': ' + str(e))
-                        os.remove(cache)
-            else:
-                with open(cache) as fp:
-                    lines = fp.read().split('\n')
-
-            modules = {}
-            name = None
-            requires = {}
-            exports = {}
-            provides = {}
-            uses = set()
-            packages = set()
-            boot = None
+            setattr(self, '.modules', tuple(self._module_descriptors().get_all()))
+        return getattr(self, '.modules')
 
-            keyword = lines[0]
-            setattr(self, '.transitiveRequiresKeyword', keyword)
-            assert keyword in ('transitive', 'public')
+    def get_module(self, name):
+        """
+        Gets the module named `name` in this JDK. Unlike `get_modules`, this
+        only loads the descriptor of the requested module.
 
-            for line in lines[1:]:
-                parts = line.strip().split()
-                assert len(parts) > 0, '>>>'+line+'<<<'
-                if len(parts) == 1:
-                    if name is not None:
-                        assert name not in modules, 'duplicate module: ' + name
-                        modules[name] = JavaModuleDescriptor(name, exports, requires, uses, provides, packages, boot=boot)
-                    name = parts[0]
-                    requires = {}
-                    exports = {}
-                    provides = {}
-                    uses = set()
-                    packages = set()
-                    boot = None
-                else:
-                    assert name, 'cannot parse module descriptor line without module name: ' + line
-                    a = parts[0]
-                    if a == 'requires':
-                        module = parts[-1]
-                        modifiers = parts[1:-2] if len(parts) > 2 else []
-                        requires[module] = modifiers
-                    elif a == 'boot':
-                        boot = parts[1] == 'true'
-                    elif a == 'exports':
-                        source = parts[1]
-                        if len(parts) > 2:
-                            assert parts[2] == 'to'
-                            targets = parts[3:]
-                        else:
-                            targets = []
-                        exports[source] = targets
-                    elif a == 'uses':
-                        uses.update(parts[1:])
-                    elif a == 'package':
-                        packages.update(parts[1:])
-                    elif a == 'provides':
-                        assert len(parts) == 4 and parts[2] == 'with'
-                        service = parts[1]
-                        provider = parts[3]
-                        provides.setdefault(service, []).append(provider)
-                    else:
-                        abort('Cannot parse module descriptor line: ' + str(parts))
-            if name is not None:
-                assert name not in modules, 'duplicate module: ' + name
-                modules[name] = JavaModuleDescriptor(name, exports, requires, uses, provides, packages, boot=boot)
-            setattr(self, '.modules', tuple(modules.values()))
-        return getattr(self, '.modules')
+        :return: a `JavaModuleDescriptor` object or None if this JDK has no module named `name`
+        """
+        if self.javaCompliance < '9':
+            return None
+        return self._module_descriptors().get(name)
 
     def get_root_modules(self):
         """
@@ -12118,9 +14238,8 @@ class JDKConfig(Comparable):
         """
         if self.javaCompliance < '9':
             abort('Cannot call get_transitive_requires_keyword() for pre-9 JDK ' + str(self))
-        self.get_modules()
         # see http://hg.openjdk.java.net/jdk9/hs/jdk/rev/89ef4b822745#l18.37
-        return getattr(self, '.transitiveRequiresKeyword')
+        return self._module_descriptors().keyword
 
     def get_automatic_module_name(self, modulejar):
         """
@@ -12454,100 +14573,542 @@ def _suggest_tlsv1_error(e):
         warn('It seems that you have a version of python ({}) that uses an older version of OpenSSL. '.format(sys.executable) +
             'This should be fixed by installing the latest 2.7 release from https://www.python.org/downloads')
 
-def _attempt_download(url, path, jarEntryName=None):
+_http_connections = _ThreadLocal()
+_http_connection_caches = []
+"""
+The keep-alive connection caches of all threads (see `_thread_http_connections`).
+"""
+_http_connection_caches_lock = Lock()
+
+
+def _thread_http_connections():
+    """
+    Gets the keep-alive connections of the current thread, a dict from (scheme, netloc) to connections.
+    """
+    connections = getattr(_http_connections, 'connections', None)
+    if connections is None:
+        connections = {}
+        _http_connections.connections = connections
+        with _http_connection_caches_lock:
+            _http_connection_caches.append(connections)
+    return connections
+
+
+def _http_close_connections():
+    """
+    Closes the keep-alive connections cached by all threads. Must only be called when no other
+    thread is making requests, e.g., after the threads of a concurrent prefetch have finished.
+    """
+    with _http_connection_caches_lock:
+        caches = list(_http_connection_caches)
+        del _http_connection_caches[:]
+    _http_connections.__dict__.pop('connections', None)
+    for connections in caches:
+        for conn in connections.values():
+            conn.close()
+        connections.clear()
+
+
+def _http_get(url, headers, timeout=10, max_redirects=5):
+    """
+    Sends a GET request for the http(s) `url` over a keep-alive connection to its host. The
+    connections are cached per thread and reused by subsequent requests to the same host.
+    Redirects are followed and transient failures are retried like `_urlopen` does.
+
+    :return: the response, which must be read completely or passed to `_http_discard` before the
+            next request to the same host is made. None is returned if `url` can not be requested
+            this way (e.g. it is not an http(s) URL or a proxy is configured for it).
+    :raises HTTPError: if the server responds with an error status
+    """
+    return _with_url_retries(url, lambda t: _http_get_once(url, headers, t, max_redirects), timeout)
+
+
+def _http_get_once(url, headers, timeout, max_redirects):
+    connections = _thread_http_connections()
+    for _ in range(max_redirects + 1):
+        parts = _urllib_parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https') or parts.username or _urllib_request.getproxies().get(scheme):
+            return None
+        key = (scheme, parts.netloc)
+        request_path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        response = None
+        while response is None:
+            conn = connections.get(key)
+            reused = conn is not None
+            if not reused:
+                conn_class = _http_client.HTTPSConnection if scheme == 'https' else _http_client.HTTPConnection
+                conn = conn_class(parts.hostname, parts.port, timeout=timeout)
+                connections[key] = conn
+            try:
+                conn.request('GET', request_path, headers=headers)
+                response = conn.getresponse()
+            except (_http_client.HTTPException, socket.error):
+                _http_discard(url)
+                if not reused:
+                    raise
+                # the server closed the kept-alive connection, retry with a new one
+        response.mx_final_url = url
+        if response.status in (301, 302, 303, 307, 308):
+            location = response.getheader('Location')
+            response.read()
+            url = _urllib_parse.urljoin(url, location)
+            continue
+        if response.status >= 400:
+            response.read()
+            raise _urllib_error.HTTPError(url, response.status, response.reason, response.msg, None)
+        return response
+    raise IOError('Too many redirects for ' + url)
+
+
+def _http_discard(url):
+    """
+    Closes and forgets the connection cached by the current thread for the host of `url`.
+    """
+    connections = _thread_http_connections()
+    parts = _urllib_parse.urlsplit(url)
+    conn = connections.pop((parts.scheme.lower(), parts.netloc), None)
+    if conn:
+        conn.close()
+
+
+def _download_backoff(attempt, base=0.5, limit=30.0):
+    """
+    Gets the number of seconds to wait before retry number `attempt` (starting at 1) of a download.
+    The delay grows exponentially and is randomized so that concurrent downloads do not retry in lockstep.
+    """
+    delay = min(limit, base * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+_partial_download_validators = {}
+"""
+Maps the temporary file of a partial download to the ETag or Last-Modified
+header of the response it was downloaded from, used for `If-Range`.
+"""
+
+
+class _MirrorStats(object):
+    """
+    Latency and throughput measured for the hosts downloads are made from, persisted in the mx
+    cache directory. The stats are keyed by the host of the URL actually downloaded from, i.e.,
+    after `mx_urlrewrites.rewriteurl` has been applied.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._hosts = None
+        self._samples = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def host(url):
+        m = re.match('jar:(.*)!/', url)
+        return _urllib_parse.urlsplit(m.group(1) if m else url).netloc.lower()
+
+    def _load(self):
+        if self._hosts is None:
+            self._hosts = {}
+            try:
+                with open(self.path) as fp:
+                    self._hosts = json.load(fp)
+            except (IOError, OSError, ValueError):
+                pass
+        return self._hosts
+
+    @staticmethod
+    def _apply(entry, name, value):
+        if name == 'success':
+            failures = entry.get('failures', 0)
+            entry['failures'] = failures // 2 if value else failures + 1
+        else:
+            old = entry.get(name)
+            # exponential moving average so that a single outlier does not dominate
+            entry[name] = value if old is None else 0.7 * old + 0.3 * value
+        entry['timestamp'] = time.time()
+
+    def _update(self, url, name, value):
+        host = _MirrorStats.host(url)
+        with self._lock:
+            _MirrorStats._apply(self._load().setdefault(host, {}), name, value)
+            # the samples are applied again to the stats in the file when saving
+            self._samples.setdefault(host, []).append((name, value))
+
+    def record_latency(self, url, latency):
+        """
+        Records that the response for `url` arrived after `latency` seconds.
+        """
+        self._update(url, 'latency', latency)
+
+    def record_throughput(self, url, size, seconds):
+        """
+        Records that `size` bytes were downloaded from `url` in `seconds`.
+        """
+        if size >= 64 * 1024 and seconds > 0:
+            self._update(url, 'throughput', size / seconds)
+
+    def record_result(self, url, success):
+        """
+        Records whether all attempts to download from `url` failed.
+        """
+        self._update(url, 'success', success)
+
+    def expected_time(self, url, size=1024 * 1024):
+        """
+        Gets the expected number of seconds for downloading `size` bytes from `url` or None if nothing is known about its host.
+        """
+        with self._lock:
+            entry = self._load().get(_MirrorStats.host(url))
+        if not entry or 'latency' not in entry:
+            return None
+        seconds = entry['latency']
+        if entry.get('throughput'):
+            seconds += size / entry['throughput']
+        return seconds * (1 + entry.get('failures', 0))
+
+    def order(self, urls):
+        """
+        Sorts `urls` by expected download time. URLs whose host has no stats yet come first (so that they are
+        measured) and URLs with the same expectation keep their relative order.
+        """
+        def _key(url):
+            expected = self.expected_time(url)
+            return (0, 0) if expected is None else (1, expected)
+        return sorted(urls, key=_key)
+
+    def save(self):
+        """
+        Merges the stats updated by this process into the stats file. The samples recorded by this
+        process are applied to the current content of the file so that the samples other processes
+        saved in the meantime (including those for the same hosts) are retained.
+        """
+        with self._lock:
+            if not self._samples:
+                return
+            samples = self._samples
+            self._samples = OrderedDict()
+            self._hosts = None
+            merged = self._load()
+            for host, host_samples in samples.items():
+                entry = merged.setdefault(host, {})
+                for name, value in host_samples:
+                    _MirrorStats._apply(entry, name, value)
+            try:
+                with SafeFileCreation(self.path) as sfc, open(sfc.tmpPath, 'w') as fp:
+                    json.dump(merged, fp, indent=1, sort_keys=True)
+            except (IOError, OSError) as e:
+                logv('Could not save mirror stats to {}: {}'.format(self.path, e))
+
+
+_mirror_stats_instance = None
+
+
+def _mirror_stats():
+    """
+    Gets the stats used to order download URLs if the MX_DOWNLOAD_MIRRORS environment variable is `fastest`, otherwise None.
+
+    :rtype: _MirrorStats | None
+    """
+    global _mirror_stats_instance
+    mode = get_env('MX_DOWNLOAD_MIRRORS', 'ordered')
+    if mode not in ('ordered', 'fastest'):
+        abort('Unknown value for MX_DOWNLOAD_MIRRORS: {} (expected "ordered" or "fastest")'.format(mode))
+    if mode != 'fastest':
+        return None
+    if _mirror_stats_instance is None:
+        _mirror_stats_instance = _MirrorStats(join(_cache_dir(), 'mirror-stats.json'))
+    return _mirror_stats_instance
+
+
+def _download_hedge_delay():
+    """
+    Gets the number of seconds after which a download is also started from the next URL if the
+    current one has not completed yet, as specified by the MX_DOWNLOAD_HEDGE_DELAY environment
+    variable. Returns None if hedged downloads are disabled (the default).
+    """
+    delay = get_env('MX_DOWNLOAD_HEDGE_DELAY')
+    if not delay:
+        return None
+    try:
+        return float(delay)
+    except ValueError:
+        abort('MX_DOWNLOAD_HEDGE_DELAY must be a number of seconds: ' + delay)
+
+
+def _attempt_download(url, path, jarEntryName=None, tmp=None, cancel=None):
     """
     Attempts to download content from `url` and save it to `path`.
     If `jarEntryName` is not None, then the downloaded content is
     expected to be a zip/jar file and the entry of the corresponding
     name is extracted and written to `path`.
 
+    If `tmp` is not None, the content is written to this temporary file instead of `path`.
+    When `tmp` already holds content from an earlier truncated attempt, the download is
+    resumed with a `Range` request if the server supports it. `tmp` is left in place
+    if this attempt fails so that a subsequent attempt can resume from it.
+
     :return: True if the download succeeded, "retry" if it failed but might succeed
             if retried, False otherwise
     """
+    if tmp is None:
+        # Use a temp file while downloading to avoid multiple threads overwriting the same file
+        with SafeFileCreation(path) as sfc:
+            res = _attempt_download(url, path, jarEntryName, sfc.tmpPath, cancel)
+            if res is not True:
+                os.remove(sfc.tmpPath)
+            return res
 
-    progress = not _opts.no_download_progress and sys.stdout.isatty()
+    aggregated = _download_progress
+    # `cancel` is only set for concurrent downloads which must not mix their progress lines
+    progress = not aggregated and cancel is None and not _opts.no_download_progress and sys.stdout.isatty()
+    stats = _mirror_stats()
+    start = time.time()
     conn = None
+    keep_alive = False
+    bytesRead = 0
     try:
-        # Use a temp file while downloading to avoid multiple threads overwriting the same file
-        with SafeFileCreation(path) as sfc:
-            tmp = sfc.tmpPath
+        url = url.replace('\\', '/')
+        requested_url = url
+        offset = os.path.getsize(tmp) if exists(tmp) else 0
+        headers = {'Accept-Encoding': 'identity', 'User-Agent': 'mx/' + str(version)}
+        validator = _partial_download_validators.get(tmp)
+        if offset and validator:
+            headers['Range'] = 'bytes={}-'.format(offset)
+            headers['If-Range'] = validator
+
+        # 10 second timeout to establish connection
+        conn = _http_get(url, headers, timeout=10)
+        keep_alive = conn is not None
+        if keep_alive:
+            # the connection to discard if the transfer fails
+            url = conn.mx_final_url
+            status = conn.status
+            header = conn.getheader
+        else:
+            conn = _urlopen(_urllib_request.Request(url, headers=headers), timeout=10)
+            status = conn.getcode()
+            header = conn.headers.get
+
+        latency = time.time() - start
+        if stats:
+            stats.record_latency(requested_url, latency)
+        if status == 206:
+            log('Resuming download of {} at byte {}'.format(url, offset))
+        else:
+            offset = 0
+        validator = header('ETag') or header('Last-Modified')
+        if validator:
+            _partial_download_validators[tmp] = validator
+        else:
+            _partial_download_validators.pop(tmp, None)
+
+        # Not all servers support the "Content-Length" header
+        lengthHeader = header('Content-Length')
+        length = offset + int(lengthHeader.strip()) if lengthHeader else -1
+
+        bytesRead = offset
+        # The read size grows while the reads are satisfied completely (i.e., the data arrives faster than it is consumed)
+        chunkSize = 64 * 1024
+        maxChunkSize = 1024 * 1024
+
+        with open(tmp, 'ab' if offset else 'wb') as fp:
+            chunk = conn.read(chunkSize)
+            while chunk:
+                bytesRead += len(chunk)
+                fp.write(chunk)
+                if aggregated:
+                    aggregated.read(len(chunk))
+                if length == -1:
+                    if progress:
+                        sys.stdout.write('\r {} bytes'.format(bytesRead))
+                else:
+                    if progress:
+                        sys.stdout.write('\r {} bytes ({}%)'.format(bytesRead, bytesRead * 100 / length))
+                    if bytesRead == length:
+                        break
+                if cancel is not None and cancel.is_set():
+                    if keep_alive:
+                        _http_discard(url)
+                    return False
+                if len(chunk) == chunkSize and chunkSize < maxChunkSize:
+                    chunkSize *= 2
+                chunk = conn.read(chunkSize)
+
+        if progress:
+            sys.stdout.write('\n')
+
+        if length not in (-1, bytesRead):
+            log_error('Download of {} truncated: read {} of {} bytes.'.format(url, bytesRead, length))
+            if keep_alive:
+                _http_discard(url)
+            return "retry"
+
+        if stats:
+            stats.record_throughput(requested_url, bytesRead - offset, time.time() - start - latency)
+        _partial_download_validators.pop(tmp, None)
+        if jarEntryName:
+            with zipfile.ZipFile(tmp, 'r') as zf:
+                jarEntry = zf.read(jarEntryName)
+            with open(tmp, 'wb') as fp:
+                fp.write(jarEntry)
+
+        return True
 
-            # 10 second timeout to establish connection
-            url = url.replace('\\', '/')
-            conn = _urlopen(url, timeout=10)
+    except (IOError, socket.timeout, _http_client.HTTPException) as e:
+        _http_discard(url)
+        log_error("Error reading from " + url + ": " + str(e))
+        _suggest_http_proxy_error(e)
+        _suggest_tlsv1_error(e)
+        if isinstance(e, _urllib_error.HTTPError):
+            if e.code == 416:
+                # the partial content does not match the remote file, start over
+                _partial_download_validators.pop(tmp, None)
+                return "retry"
+            if e.code in (500, 502, 503, 504):
+                return "retry"
+        elif bytesRead or isinstance(e, (socket.timeout, _http_client.HTTPException)):
+            # the connection dropped or stalled, resume from what has been received so far
+            return "retry"
+    finally:
+        if conn and not keep_alive:
+            conn.close()
+    return False
+
+def _download_with_retries(url, path, cancel=None, tmp_files=None):
+    """
+    Downloads `url` (which may be a `jar:<url>!/<entry>` URL) to `path`, retrying transient failures.
+    Gives up early if the `cancel` event is set. A successful download sets `cancel` so that it is the
+    only one of the downloads sharing `cancel` that moves its file to `path`. The temporary file used
+    for the download is appended to `tmp_files` (if not None).
+
+    :return: True if the download succeeded
+    """
+    log('Downloading ' + url + ' to ' + path)
+    # https://docs.oracle.com/javase/7/docs/api/java/net/JarURLConnection.html
+    m = re.match('jar:(.*)!/(.*)', url)
+    jarEntryName = None
+    if m:
+        url = m.group(1)
+        jarEntryName = m.group(2)
+
+    # Use a temp file while downloading to avoid multiple threads overwriting the same file.
+    # The temp file is kept across retries so that they can resume a truncated download.
+    with SafeFileCreation(path) as sfc:
+        if tmp_files is not None:
+            tmp_files.append(sfc.tmpPath)
+        for i in range(5):
+            if i != 0:
+                delay = _download_backoff(i)
+                warn('Retry {} to download from {} in {:.1f} seconds'.format(i, url, delay))
+                if cancel is not None:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+            if cancel is not None and cancel.is_set():
+                res = False
+                break
+            res = _attempt_download(url, path, jarEntryName, sfc.tmpPath, cancel)
+            if res != "retry":
+                break
+        _partial_download_validators.pop(sfc.tmpPath, None)
+        if res is True and cancel is not None:
+            # only the first of concurrent downloads that completes moves its file to `path`
+            with _hedged_download_lock:
+                if cancel.is_set():
+                    res = False
+                else:
+                    cancel.set()
+        if res is not True and exists(sfc.tmpPath):
+            os.remove(sfc.tmpPath)
+    stats = _mirror_stats()
+    if stats and not (cancel is not None and cancel.is_set() and res is not True):
+        stats.record_result(url, res is True)
+    return res is True
 
-            # Not all servers support the "Content-Length" header
-            lengthHeader = conn.headers.get('Content-Length')
-            length = int(lengthHeader.strip()) if lengthHeader else -1
 
-            bytesRead = 0
-            chunkSize = 8192
+_hedged_download_lock = Lock()
 
-            with open(tmp, 'wb') as fp:
-                chunk = conn.read(chunkSize)
-                while chunk:
-                    bytesRead += len(chunk)
-                    fp.write(chunk)
-                    if length == -1:
-                        if progress:
-                            sys.stdout.write('\r {} bytes'.format(bytesRead))
-                    else:
-                        if progress:
-                            sys.stdout.write('\r {} bytes ({}%)'.format(bytesRead, bytesRead * 100 / length))
-                        if bytesRead == length:
-                            break
-                    chunk = conn.read(chunkSize)
 
-            if progress:
-                sys.stdout.write('\n')
+def _hedged_download(path, urls, delay):
+    """
+    Downloads from the first of `urls` and additionally starts a download from the next URL whenever no download
+    has completed within `delay` seconds or a download failed. The first successful download wins and the others
+    are cancelled.
 
-            if length not in (-1, bytesRead):
-                log_error('Download of {} truncated: read {} of {} bytes.'.format(url, bytesRead, length))
-                return "retry"
+    :return: True if one of the downloads succeeded
+    """
+    pending = list(urls)
+    cancel = _ThreadEvent()
+    finished = _queue.Queue()
+    started = OrderedDict()
+    tmp_files = []
 
-            if jarEntryName:
-                with zipfile.ZipFile(tmp, 'r') as zf:
-                    jarEntry = zf.read(jarEntryName)
-                with open(tmp, 'wb') as fp:
-                    fp.write(jarEntry)
+    def _download(url):
+        finished.put((url, _download_with_retries(url, path, cancel, tmp_files)))
 
-            return True
+    def _start():
+        url = pending.pop(0)
+        if started:
+            log('Starting hedged download from ' + url)
+        started[url] = time.time()
+        t = Thread(target=_download, args=(url,))
+        t.daemon = True
+        t.start()
 
-    except (IOError, socket.timeout, _urllib_error.HTTPError) as e:
-        # In case of an exception the temp file is removed automatically, so no cleanup is necessary
-        log_error("Error reading from " + url + ": " + str(e))
-        _suggest_http_proxy_error(e)
-        _suggest_tlsv1_error(e)
-        if isinstance(e, _urllib_error.HTTPError) and e.code == 500:
-            return "retry"
+    _start()
+    try:
+        while started:
+            try:
+                url, success = finished.get(timeout=delay if pending else None)
+            except _queue.Empty:
+                _start()
+                continue
+            del started[url]
+            if success:
+                stats = _mirror_stats()
+                if stats:
+                    # the downloads that lost the race were at least this slow
+                    for other, start in started.items():
+                        stats.record_latency(other, time.time() - start)
+                return True
+            if pending:
+                # replace the failed download right away
+                _start()
+        return False
     finally:
-        if conn:
-            conn.close()
-    return False
+        # downloads still running give up at their next read but may be blocked
+        # waiting for a response so remove their temporary files now
+        cancel.set()
+        if started:
+            for tmp in list(tmp_files):
+                if exists(tmp):
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+
 
 def download(path, urls, verbose=False, abortOnError=True, verifyOnly=False):
     """
     Attempts to downloads content for each URL in a list, stopping after the first successful download.
     If the content cannot be retrieved from any URL, the program is aborted, unless abortOnError=False.
     The downloaded content is written to the file indicated by `path`.
-    """
-    if not verifyOnly:
-        ensure_dirname_exists(path)
-        assert not path.endswith(os.sep)
 
-    # https://docs.oracle.com/javase/7/docs/api/java/net/JarURLConnection.html
-    jarURLPattern = re.compile('jar:(.*)!/(.*)')
-    verify_errors = {}
-    for url in urls:
-        if not verifyOnly or verbose:
-            log('Downloading ' + url + ' to ' + path)
-        m = jarURLPattern.match(url)
-        jarEntryName = None
-        if m:
-            url = m.group(1)
-            jarEntryName = m.group(2)
+    Transient failures are retried with an exponential backoff and truncated transfers
+    are resumed where the server supports `Range` requests.
 
-        if verifyOnly:
+    If the MX_DOWNLOAD_MIRRORS environment variable is `fastest`, the URLs are tried in the order of
+    the download speed previously measured for their hosts. If MX_DOWNLOAD_HEDGE_DELAY is set, a download
+    from the next URL is started when the current one has not completed after that many seconds.
+    """
+    verify_errors = {}
+    if verifyOnly:
+        for url in urls:
+            if verbose:
+                log('Downloading ' + url + ' to ' + path)
+            # https://docs.oracle.com/javase/7/docs/api/java/net/JarURLConnection.html
+            m = re.match('jar:(.*)!/(.*)', url)
+            if m:
+                url = m.group(1)
             try:
                 conn = _urlopen(url, timeout=10)
                 conn.close()
@@ -12555,17 +15116,23 @@ def download(path, urls, verbose=False, abortOnError=True, verifyOnly=False):
             except (IOError, socket.timeout) as e:
                 _suggest_tlsv1_error(e)
                 verify_errors[url] = e
-            continue
-
-        for i in range(4):
-            if i != 0:
-                time.sleep(1)
-                warn('Retry {} to download from {}'.format(i, url))
-            res = _attempt_download(url, path, jarEntryName)
-            if res is True:
-                return True
-            if res is False:
-                break
+    elif urls:
+        ensure_dirname_exists(path)
+        assert not path.endswith(os.sep)
+        stats = _mirror_stats()
+        try:
+            ordered_urls = stats.order(urls) if stats else urls
+            hedge_delay = _download_hedge_delay()
+            if hedge_delay is not None and len(ordered_urls) > 1:
+                if _hedged_download(path, ordered_urls, hedge_delay):
+                    return True
+            else:
+                for url in ordered_urls:
+                    if _download_with_retries(url, path):
+                        return True
+        finally:
+            if stats:
+                stats.save()
 
     if abortOnError:
         msg = 'Could not download to ' + path + ' from any of the following URLs: ' + ', '.join(urls)
@@ -12576,6 +15143,122 @@ def download(path, urls, verbose=False, abortOnError=True, verifyOnly=False):
     else:
         return False
 
+
+class _DownloadProgress(object):
+    """
+    The aggregated progress of concurrent downloads, shown on a single line
+    instead of one progress line per downloaded file.
+    """
+    def __init__(self, files):
+        self.files = files
+        self.done = 0
+        self.bytes_read = 0
+        self.enabled = not _opts.no_download_progress and sys.stdout.isatty()
+        self._lock = Lock()
+        self._last_shown = 0
+
+    def read(self, n):
+        with self._lock:
+            self.bytes_read += n
+            self._show()
+
+    def file_done(self):
+        with self._lock:
+            self.done += 1
+            self._show(force=True)
+
+    def _show(self, force=False):
+        now = time.time()
+        if self.enabled and (force or now - self._last_shown > 0.2):
+            self._last_shown = now
+            sys.stdout.write('\r {}/{} libraries, {} bytes'.format(self.done, self.files, self.bytes_read))
+            sys.stdout.flush()
+
+    def finish(self):
+        if self.enabled and self.files:
+            sys.stdout.write('\n')
+
+
+_download_progress = None
+"""
+The aggregated progress of the downloads performed by `_fetch_libraries` (if any).
+
+:type: _DownloadProgress | None
+"""
+
+
+def _fetch_libraries(libs, sources=True, jobs=None):
+    """
+    Downloads the files of the libraries in `libs` that are missing or fail their SHA1 check
+    (including the sources of `Library` dependencies if `sources` is True) using at most `jobs` threads.
+    The SHA1 checks of existing and downloaded files are performed concurrently as well.
+    Packed resource libraries are only downloaded, they are extracted when they are used.
+
+    :return: the libraries that had to be fetched
+    """
+    libs = [l for l in libs if l.isLibrary() or l.isResourceLibrary()]
+    jobs = jobs or _fetch_jobs()
+
+    def _needs_fetch(lib):
+        if lib.isPackedResourceLibrary():
+            return ResourceLibrary._check_download_needed(lib)
+        return lib._check_download_needed()
+
+    needed = [l for l, n in zip(libs, _run_in_threads(_needs_fetch, libs, jobs)) if n]
+    if not needed:
+        return needed
+
+    def _fetch(lib):
+        if lib.isPackedResourceLibrary():
+            ResourceLibrary.get_path(lib, True)
+        else:
+            lib.get_path(True)
+        if sources and lib.isLibrary():
+            lib.get_source_path(True)
+        progress.file_done()
+
+    global _download_progress
+    progress = _DownloadProgress(len(needed))
+    _download_progress = progress
+    start = time.time()
+    try:
+        _run_in_threads(_fetch, needed, jobs)
+    finally:
+        _download_progress = None
+        _http_close_connections()
+        progress.finish()
+    logv('Fetched {} libraries ({} bytes) in {:.1f} seconds'.format(len(needed), progress.bytes_read, time.time() - start))
+    return needed
+
+
+def _fetch_jobs():
+    """
+    Gets the number of concurrent downloads (default: 8), which can be set with the MX_FETCH_JOBS environment variable.
+    """
+    return int(get_env('MX_FETCH_JOBS', '8'))
+
+
+def fetch(args):
+    """download the libraries required by the given dependencies concurrently"""
+    parser = ArgumentParser(prog='mx fetch')
+    parser.add_argument('--dependencies', action='store', help='comma separated dependencies whose libraries are downloaded (omit to download all libraries)', metavar='<names>')
+    parser.add_argument('-j', '--jobs', action='store', type=int, help='maximum number of concurrent downloads (default: {})'.format(_fetch_jobs()), metavar='<n>')
+    parser.add_argument('--no-sources', action='store_false', dest='sources', help='do not download the sources of libraries')
+    args = parser.parse_args(args)
+
+    if args.dependencies is not None:
+        roots = [dependency(name) for name in args.dependencies.split(',')]
+    else:
+        roots = _dependencies_opt_limit_to_suites(dependencies())
+    libs = []
+    def _visit(dep, edge):
+        if dep.isLibrary() or dep.isResourceLibrary():
+            libs.append(dep)
+    walk_deps(roots=roots, visit=_visit, ignoredEdges=[DEP_EXCLUDED])
+    fetched = _fetch_libraries(libs, sources=args.sources, jobs=args.jobs)
+    log('Fetched {} of {} libraries'.format(len(fetched), len(libs)))
+
+
 def update_file(path, content, showDiff=False):
     """
     Updates a file with some given content if the content differs from what's in
@@ -12666,6 +15349,10 @@ def build(cmd_args, parser=None):
     parser.add_argument('-A', dest='extra_javac_args', action='append', help='pass <flag> directly to Java source compiler', metavar='<flag>', default=[])
     parser.add_argument('--no-daemon', action='store_true', dest='no_daemon', help='disable use of daemon Java compiler (if available)')
     parser.add_argument('--all', action='store_true', help='build all dependencies (not just default targets)')
+    parser.add_argument('--no-prefetch', action='store_false', dest='prefetch', help='do not download the required libraries concurrently before building')
+    parser.add_argument('--gc-freeze', action='store_true', dest='gc_freeze', default=get_env('MX_BUILD_GC_FREEZE') == 'true',
+                        help='move the objects allocated while loading suites out of reach of the garbage collector before forking build workers ' +
+                        'so that their memory stays shared with the workers (requires Python 3.7+, also enabled by MX_BUILD_GC_FREEZE=true)')
 
     compilerSelect = parser.add_mutually_exclusive_group()
     compilerSelect.add_argument('--error-prone', dest='error_prone', help='path to error-prone.jar', metavar='<path>')
@@ -12749,6 +15436,10 @@ def build(cmd_args, parser=None):
             roots = _dependencies_opt_limit_to_suites(roots)
             # N.B. Limiting to a suite only affects the starting set of dependencies. Dependencies in other suites will still be built
 
+    global _materialization_stats
+    if _layout_link_mode() != 'copy':
+        _materialization_stats = _MaterializationStats()
+
     sortedTasks = []
     taskMap = {}
     depsMap = {}
@@ -12782,6 +15473,10 @@ def build(cmd_args, parser=None):
                 log(str(task))
         log("-- Serialized build plan --")
 
+    if args.prefetch and onlyDeps is None:
+        # Download the libraries concurrently instead of in individual build tasks
+        _fetch_libraries([t.subject for t in sortedTasks if isinstance(t, LibraryDownloadTask)])
+
     if len(sortedTasks) == 1:
         # Spinning up a daemon for a single task doesn't make sense
         if not args.no_daemon:
@@ -12827,63 +15522,76 @@ def build(cmd_args, parser=None):
             return sorted(tasks, key=remainingDepsDepth)
 
         cpus = cpu_count()
-        worklist = sortWorklist(sortedTasks)
-        active = []
-        failed = []
-        def _activeCpus(_active):
-            cpus = 0
-            for t in _active:
-                cpus += t.parallelism
-            return cpus
-
-        while len(worklist) != 0:
-            while True:
-                active, failed = checkTasks(active)
+        _get_compile_mx_class_lock()
+        # A collection in a worker touches the header of every tracked object and thereby
+        # un-shares the copy-on-write pages holding the (mostly immutable) suite model.
+        gc_frozen = args.gc_freeze and hasattr(gc, 'freeze')
+        if gc_frozen:
+            gc.collect()
+            gc.freeze()
+        elif args.gc_freeze:
+            warn('--gc-freeze requires Python 3.7 or later')
+        try:
+            worklist = sortWorklist(sortedTasks)
+            active = []
+            failed = []
+            def _activeCpus(_active):
+                cpus = 0
+                for t in _active:
+                    cpus += t.parallelism
+                return cpus
+
+            while len(worklist) != 0:
+                while True:
+                    active, failed = checkTasks(active)
+                    if len(failed) != 0:
+                        assert not active, active
+                        break
+                    if _activeCpus(active) >= cpus:
+                        # Sleep for 0.2 second
+                        time.sleep(0.2)
+                    else:
+                        break
+
                 if len(failed) != 0:
-                    assert not active, active
-                    break
-                if _activeCpus(active) >= cpus:
-                    # Sleep for 0.2 second
-                    time.sleep(0.2)
-                else:
                     break
 
-            if len(failed) != 0:
-                break
-
-            def executeTask(task):
-                # Clear sub-process list cloned from parent process
-                del _currentSubprocesses[:]
-                task.execute()
-                task.pushSharedMemoryState()
+                def executeTask(task):
+                    # Clear sub-process list cloned from parent process
+                    del _currentSubprocesses[:]
+                    task.execute()
+                    task.pushSharedMemoryState()
 
-            def depsDone(task):
-                for d in task.deps:
-                    if d.proc is None or not d._finished:
-                        return False
-                return True
+                def depsDone(task):
+                    for d in task.deps:
+                        if d.proc is None or not d._finished:
+                            return False
+                    return True
 
-            added_new_tasks = False
-            for task in worklist:
-                if depsDone(task) and _activeCpus(active) + task.parallelism <= cpus:
-                    worklist.remove(task)
-                    task.initSharedMemoryState()
-                    task.prepare(daemons)
-                    task.proc = multiprocessing.Process(target=executeTask, args=(task,))
-                    task._finished = False
-                    task.proc.start()
-                    active.append(task)
-                    task.sub = _addSubprocess(task.proc, [str(task)])
-                    added_new_tasks = True
-                if _activeCpus(active) >= cpus:
-                    break
+                added_new_tasks = False
+                for task in worklist:
+                    if depsDone(task) and _activeCpus(active) + task.parallelism <= cpus:
+                        worklist.remove(task)
+                        task.initSharedMemoryState()
+                        task.prepare(daemons)
+                        task.proc = multiprocessing.Process(target=executeTask, args=(task,))
+                        task._finished = False
+                        task.proc.start()
+                        active.append(task)
+                        task.sub = _addSubprocess(task.proc, [str(task)])
+                        added_new_tasks = True
+                    if _activeCpus(active) >= cpus:
+                        break
 
-            if not added_new_tasks:
-                time.sleep(0.2)
+                if not added_new_tasks:
+                    time.sleep(0.2)
 
-            worklist = sortWorklist(worklist)
+                worklist = sortWorklist(worklist)
 
-        failed += joinTasks(active)
+            failed += joinTasks(active)
+        finally:
+            if gc_frozen:
+                gc.unfreeze()
 
         if len(failed):
             for t in failed:
@@ -12900,6 +15608,9 @@ def build(cmd_args, parser=None):
     for daemon in daemons.values():
         daemon.shutdown()
 
+    if _materialization_stats:
+        _materialization_stats.report()
+
     # TODO check for distributions overlap (while loading suites?)
 
     if suppliedParser:
@@ -13361,11 +16072,13 @@ class SafeFileCreation(object):
 class Archiver(SafeFileCreation):
     """
     Utility for creating and updating a zip or tar file atomically.
+    Supported kinds are `zip`, `jar`, `tar`, `tgz` and the compressed tar kinds of `_TarCompression` (e.g. `tar.xz` or `tar.zst`).
     """
     def __init__(self, path, kind='zip', reset_user_group=False, duplicates_action=None, context=None, compress=False):
         SafeFileCreation.__init__(self, path)
         self.kind = kind
         self.zf = None
+        self._compressed_out = None
         self._add_f = None
         self._add_str = None
         self._add_link = None
@@ -13449,6 +16162,15 @@ class Archiver(SafeFileCreation):
                 self._add_f = self._add_tar
                 self._add_str = self._add_str_tar
                 self._add_link = self._add_link_tar
+            elif _TarCompression.for_path('.' + self.kind):
+                if self.compress:
+                    warn("Archiver created with compress=True and kind={}, ignoring compression setting".format(self.kind))
+                # stream the tar through the compressor
+                self._compressed_out = _TarCompression.for_path('.' + self.kind).open_writer(self.tmpPath)
+                self.zf = tarfile.open(self.tmpPath, 'w|', fileobj=self._compressed_out)
+                self._add_f = self._add_tar
+                self._add_str = self._add_str_tar
+                self._add_link = self._add_link_tar
             else:
                 abort('unsupported archive kind: ' + self.kind, context=self.context)
         return self
@@ -13457,6 +16179,8 @@ class Archiver(SafeFileCreation):
         if self.path:
             if self.zf:
                 self.zf.close()
+            if self._compressed_out:
+                self._compressed_out.close()
             SafeFileCreation.__exit__(self, exc_type, exc_value, traceback)
 
     def add(self, filename, archive_name, provenance):
@@ -13525,6 +16249,63 @@ def archive(args):
         logv("generated archives: " + str(archives))
     return archives
 
+@suite_context_free
+def archivebench(args):
+    """compare creation time, extraction time and size of the supported archive formats"""
+    default_kinds = ['tar', 'tgz'] + [c.extensions()[0] for c in _tar_compressions.values() if c.name != 'gz']
+    parser = ArgumentParser(prog='mx archivebench')
+    parser.add_argument('--kinds', action='store', default=','.join(default_kinds), help='comma separated archive kinds to compare (default: %(default)s)')
+    parser.add_argument('paths', nargs='+', metavar='<path>', help='files or directories to put in the archives')
+    args = parser.parse_args(args)
+
+    def _add_path(arc, path, arcname):
+        if isdir(path) and not islink(path):
+            for name in sorted(os.listdir(path)):
+                _add_path(arc, join(path, name), arcname + '/' + name)
+        elif islink(path):
+            arc.add_link(os.readlink(path), arcname, None)
+        else:
+            arc.add(path, arcname, None)
+
+    input_size = 0
+    for path in args.paths:
+        for root, _, files in os.walk(path):
+            input_size += sum(os.path.getsize(join(root, f)) for f in files if not islink(join(root, f)))
+        if not isdir(path):
+            input_size += os.path.getsize(path)
+
+    rows = []
+    with TempDir() as tmp:
+        for kind in args.kinds.split(','):
+            compression = _TarCompression.for_path('.' + kind)
+            if compression and not compression.is_available():
+                log('Skipping {}: none of {} found and no python module available'.format(kind, ', '.join(compression.binaries)))
+                continue
+            arc_path = join(tmp, 'bench.' + kind)
+            start = time.time()
+            with Archiver(arc_path, kind=kind) as arc:
+                for path in args.paths:
+                    _add_path(arc, path, basename(normpath(path)))
+            create_time = time.time() - start
+            extract_dir = join(tmp, kind + '.extracted')
+            start = time.time()
+            Extractor.create(arc_path).extract(extract_dir)
+            extract_time = time.time() - start
+            size = os.path.getsize(arc_path)
+            if kind == 'tgz':
+                codec = 'python'  # Archiver uses tarfile's gzip support for this kind
+            else:
+                codec = (compression.binary() or 'python') if compression else '-'
+            rows.append((kind, codec, create_time, extract_time, size))
+            os.remove(arc_path)
+            rmtree(extract_dir)
+
+    log('Input: {} bytes'.format(input_size))
+    log('{:<10} {:<8} {:>10} {:>10} {:>14} {:>7}'.format('kind', 'codec', 'create(s)', 'extract(s)', 'size', 'ratio'))
+    for kind, codec, create_time, extract_time, size in rows:
+        ratio = float(size) / input_size if input_size else 0
+        log('{:<10} {:<8} {:>10.2f} {:>10.2f} {:>14} {:>7.3f}'.format(kind, codec, create_time, extract_time, size, ratio))
+
 def checkoverlap(args):
     """check all distributions for overlap
 
@@ -13893,6 +16674,91 @@ def open(name, mode='r'): # pylint: disable=redefined-builtin
     """
     return builtins.open(_safe_path(name), mode=mode)
 
+# ioctl request for cloning a file on Linux (see ioctl_ficlone(2))
+_FICLONE = 0x40049409
+
+
+def _layout_link_mode():
+    """
+    Gets the mode used by `_materialize_file` as selected by the MX_LAYOUT_LINK_MODE environment variable.
+    """
+    mode = get_env('MX_LAYOUT_LINK_MODE', 'copy')
+    if mode not in ('copy', 'hardlink', 'reflink'):
+        abort("Unsupported value for MX_LAYOUT_LINK_MODE: '{}'. Supported values: copy, hardlink, reflink".format(mode))
+    return mode
+
+
+def _reflink(src, dst):
+    """
+    Creates `dst` as a copy-on-write clone of `src`. Returns False if the platform or file system does not support it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with builtins.open(src, 'rb') as src_fp, builtins.open(dst, 'wb') as dst_fp:
+            fcntl.ioctl(dst_fp.fileno(), _FICLONE, src_fp.fileno())
+    except (IOError, OSError):
+        if exists(dst):
+            os.remove(dst)
+        return False
+    shutil.copymode(src, dst)
+    return True
+
+
+def _materialize_file(src, dst, copy_function=shutil.copyfile, mode=None):
+    """
+    Makes the file `src` available at `dst` by hard linking it, cloning it (reflink) or copying it
+    with `copy_function` according to `mode` (default: `_layout_link_mode()`). Linking and cloning
+    fall back to copying if `src` and `dst` are on different file systems or if the file system
+    does not support the operation. An existing `dst` is replaced.
+    """
+    mode = mode or _layout_link_mode()
+    materialized_by = 'copy'
+    if mode != 'copy' and os.stat(src).st_dev == os.stat(dirname(dst) or '.').st_dev:
+        if lexists(dst):
+            os.remove(dst)
+        if mode == 'hardlink' and hasattr(os, 'link'):
+            try:
+                os.link(src, dst)
+                materialized_by = 'hardlink'
+            except OSError as e:
+                logvv('Could not hard link {} to {}: {}'.format(src, dst, e))
+        elif mode == 'reflink' and _reflink(src, dst):
+            materialized_by = 'reflink'
+    if materialized_by == 'copy':
+        if exists(dst) and hasattr(os.path, 'samefile') and os.path.samefile(src, dst):
+            # `dst` is a hard link to `src` created in another mode
+            os.remove(dst)
+        copy_function(src, dst)
+    if _materialization_stats:
+        _materialization_stats.record(materialized_by, os.path.getsize(dst))
+
+
+class _MaterializationStats(object):
+    """
+    Counts the bytes materialized by `_materialize_file` per mode. The counters are
+    shared with the processes forked by a parallel build.
+    """
+    def __init__(self):
+        self._bytes = dict((mode, multiprocessing.Value('d', 0)) for mode in ('copy', 'hardlink', 'reflink'))
+
+    def record(self, mode, size):
+        value = self._bytes[mode]
+        with value.get_lock():
+            value.value += size
+
+    def report(self):
+        copied, linked, cloned = (int(self._bytes[mode].value) for mode in ('copy', 'hardlink', 'reflink'))
+        if linked or cloned:
+            log('Materialized {} MB: {} MB hard linked, {} MB reflinked, {} MB copied ({} MB of disk writes saved)'.format(
+                (copied + linked + cloned) // (1024 * 1024), linked // (1024 * 1024), cloned // (1024 * 1024), copied // (1024 * 1024), (linked + cloned) // (1024 * 1024)))
+
+
+_materialization_stats = None
+
+
 def copytree(src, dst, symlinks=False, ignore=None):
     shutil.copytree(_safe_path(src), _safe_path(dst), symlinks, ignore)
 
@@ -17250,6 +20116,7 @@ def scloneimports(args):
     parser.add_argument('--source', help='path to primary suite')
     parser.add_argument('--manual', action='store_true', help='this option has no effect, it is deprecated')
     parser.add_argument('--ignore-version', action='store_true', help='ignore version mismatch for existing suites')
+    parser.add_argument('-j', '--jobs', type=int, help='maximum number of repositories processed concurrently (default: {})'.format(_discovery_jobs()), metavar='<n>')
     parser.add_argument('nonKWArgs', nargs=REMAINDER, metavar='source')
     args = parser.parse_args(args)
 
@@ -17275,30 +20142,49 @@ def scloneimports(args):
     mxDir = _is_suite_dir(source)
     if not mxDir:
         abort("'{}' is not an mx suite".format(source))
-    _discover_suites(mxDir, load=False, register=False, update_existing=True)
+    _discover_suites(mxDir, load=False, register=False, update_existing=True, jobs=args.jobs)
+
 
+def _supdate_import_visitor(s, suite_import, updates, **extra_args):
+    _supdate(suite(suite_import.name), suite_import, updates)
 
-def _supdate_import_visitor(s, suite_import, **extra_args):
-    _supdate(suite(suite_import.name), suite_import)
 
+def _supdate(s, suite_import, updates):
+    """
+    Appends the updates of the repositories of `s` and its imports, imports first, to `updates`.
+    """
+    s.visit_imports(_supdate_import_visitor, updates=updates)
 
-def _supdate(s, suite_import):
-    s.visit_imports(_supdate_import_visitor)
-    s.vc.update(s.vc_dir)
+    def _update(abortOnError):
+        # a failed update does not abort supdate
+        s.vc.update(s.vc_dir, abortOnError=False)
+    updates.append((s.vc_dir, _update))
 
 
 @no_suite_loading
 def supdate(args):
     """update primary suite and all its imports"""
     parser = ArgumentParser(prog='mx supdate')
+    parser.add_argument('-j', '--jobs', type=int, help='maximum number of repositories processed concurrently (default: {})'.format(_discovery_jobs()), metavar='<n>')
     args = parser.parse_args(args)
 
-    _supdate(primary_suite(), None)
+    updates = []
+    _supdate(primary_suite(), None, updates)
+    _run_per_repository(updates, args.jobs)
 
-def _sbookmark_visitor(s, suite_import):
+def _sbookmark_visitor(s, suite_import, bookmarks=None):
+    """
+    Bookmarks the version of `suite_import` or, if `bookmarks` is not None, appends
+    the operation doing so to `bookmarks` (see _run_per_repository).
+    """
     imported_suite = suite(suite_import.name)
     if isinstance(imported_suite, SourceSuite):
-        imported_suite.vc.bookmark(imported_suite.vc_dir, s.name + '-import', suite_import.version)
+        def _bookmark(abortOnError=True):
+            return imported_suite.vc.bookmark(imported_suite.vc_dir, s.name + '-import', suite_import.version, abortOnError=abortOnError)
+        if bookmarks is None:
+            _bookmark()
+        else:
+            bookmarks.append((imported_suite.vc_dir, _bookmark))
 
 
 @no_suite_loading
@@ -17306,12 +20192,15 @@ def sbookmarkimports(args):
     """place bookmarks on the imported versions of suites in version control"""
     parser = ArgumentParser(prog='mx sbookmarkimports')
     parser.add_argument('--all', action='store_true', help='operate on all suites (default: primary suite only)')
+    parser.add_argument('-j', '--jobs', type=int, help='maximum number of repositories processed concurrently (default: {})'.format(_discovery_jobs()), metavar='<n>')
     args = parser.parse_args(args)
+    bookmarks = []
     if args.all:
         for s in suites():
-            s.visit_imports(_sbookmark_visitor)
+            s.visit_imports(_sbookmark_visitor, bookmarks=bookmarks)
     else:
-        primary_suite().visit_imports(_sbookmark_visitor)
+        primary_suite().visit_imports(_sbookmark_visitor, bookmarks=bookmarks)
+    _run_per_repository(bookmarks, args.jobs)
 
 
 def _scheck_imports_visitor(s, suite_import, bookmark_imports, ignore_uncommitted):
@@ -17359,18 +20248,19 @@ def sforceimports(args):
     """force working directory revision of imported suites to match primary suite imports"""
     parser = ArgumentParser(prog='mx sforceimports')
     parser.add_argument('--strict-versions', action='store_true', help='DEPRECATED/IGNORED strict version checking')
+    parser.add_argument('-j', '--jobs', type=int, help='maximum number of repositories processed concurrently (default: {})'.format(_discovery_jobs()), metavar='<n>')
     args = parser.parse_args(args)
     if args.strict_versions:
         warn("'--strict-versions' argument is deprecated and ignored. For version conflict resolution, see mx's '--version-conflict-resolution' flag.")
-    _discover_suites(primary_suite().mxDir, load=False, register=False, update_existing=True)
+    _discover_suites(primary_suite().mxDir, load=False, register=False, update_existing=True, jobs=args.jobs)
 
 
-def _spull_import_visitor(s, suite_import, update_versions, only_imports, update_all, no_update):
+def _spull_import_visitor(s, suite_import, update_versions, only_imports, update_all, no_update, jobs, fetched):
     """pull visitor for Suite.visit_imports"""
-    _spull(s, suite(suite_import.name), suite_import, update_versions, only_imports, update_all, no_update)
+    _spull(s, suite(suite_import.name), suite_import, update_versions, only_imports, update_all, no_update, jobs, fetched)
 
 
-def _spull(importing_suite, imported_suite, suite_import, update_versions, only_imports, update_all, no_update):
+def _spull(importing_suite, imported_suite, suite_import, update_versions, only_imports, update_all, no_update, jobs=None, fetched=None):
     # suite_import is None if importing_suite is primary suite
     primary = suite_import is None
     # proceed top down to get any updated version ids first
@@ -17402,7 +20292,34 @@ def _spull(importing_suite, imported_suite, suite_import, update_versions, only_
     imported_suite.re_init_imports()
     if not primary and not update_all:
         update_versions = False
-    imported_suite.visit_imports(_spull_import_visitor, update_versions=update_versions, only_imports=only_imports, update_all=update_all, no_update=no_update)
+    if fetched is None:
+        fetched = set()
+    _spull_fetch_imports(imported_suite, jobs, fetched)
+    imported_suite.visit_imports(_spull_import_visitor, update_versions=update_versions, only_imports=only_imports, update_all=update_all, no_update=no_update, jobs=jobs, fetched=fetched)
+
+
+def _spull_fetch_imports(s, jobs, fetched):
+    """
+    Concurrently fetches the repositories of the source suites imported by `s` that are not in `fetched`.
+    The imports are then pulled one after the other in depth first order as the version a repository
+    ends up at is the one pulled last (e.g. the version imported by the primary suite wins over the
+    version imported by one of its imports) but these pulls find the fetched changes locally.
+    A failed fetch is ignored here and reported by the subsequent pull.
+    """
+    repositories = OrderedDict()
+    for suite_import in s.suite_imports:
+        imported_suite = suite(suite_import.name)
+        if isinstance(imported_suite, SourceSuite) and imported_suite.vc_dir not in fetched:
+            repositories[imported_suite.vc_dir] = imported_suite.vc
+    if len(repositories) <= 1 or (jobs or _discovery_jobs()) == 1:
+        # nothing would be fetched concurrently
+        return
+
+    def _fetch(vc_dir):
+        repositories[vc_dir].pull(vc_dir, update=False, abortOnError=False)
+
+    fetched.update(repositories)
+    _run_per_repository([(vc_dir, lambda abortOnError, vc_dir=vc_dir: _fetch(vc_dir)) for vc_dir in repositories], jobs)
 
 
 @no_suite_loading
@@ -17413,6 +20330,7 @@ def spull(args):
     parser.add_argument('--update-all', action='store_true', help='pull tip of all imported suites (transitively)')
     parser.add_argument('--only-imports', action='store_true', help='only pull imported suites, not the primary suite')
     parser.add_argument('--no-update', action='store_true', help='only pull, without updating')
+    parser.add_argument('-j', '--jobs', type=int, help='maximum number of repositories processed concurrently (default: {})'.format(_discovery_jobs()), metavar='<n>')
     args = parser.parse_args(args)
 
     warn("The spull command is deprecated and is scheduled for removal.")
@@ -17420,7 +20338,7 @@ def spull(args):
     if args.update_all and not args.update_versions:
         abort('--update-all can only be used in conjuction with --update-versions')
 
-    _spull(primary_suite(), primary_suite(), None, args.update_versions, args.only_imports, args.update_all, args.no_update)
+    _spull(primary_suite(), primary_suite(), None, args.update_versions, args.only_imports, args.update_all, args.no_update, args.jobs)
 
 
 def _sincoming_import_visitor(s, suite_import, **extra_args):
@@ -17926,7 +20844,18 @@ def verify_ci(args, base_suite, dest_suite, common_file=None, common_dirs=None,
     if not args.quiet:
         log("CI setup is fine.")
 
-__compile_mx_class_lock = multiprocessing.Lock()
+__compile_mx_class_lock = None
+
+def _get_compile_mx_class_lock():
+    """
+    Gets the lock serializing compilations by `_compile_mx_class`. Build worker processes
+    only share the lock if it is created before they are forked.
+    """
+    global __compile_mx_class_lock
+    if __compile_mx_class_lock is None:
+        __compile_mx_class_lock = multiprocessing.Lock()
+    return __compile_mx_class_lock
+
 def _compile_mx_class(javaClassNames, classpath=None, jdk=None, myDir=None, extraJavacArgs=None, as_jar=False):
     if not isinstance(javaClassNames, list):
         javaClassNames = [javaClassNames]
@@ -17940,7 +20869,7 @@ def _compile_mx_class(javaClassNames, classpath=None, jdk=None, myDir=None, extr
         assert len(javaClassNames) == 1, 'can only compile multiple sources when producing a jar'
         output = javaClasses[0]
     if not exists(output) or TimeStampFile(output).isOlderThan(javaSources):
-        with __compile_mx_class_lock:
+        with _get_compile_mx_class_lock():
             ensure_dir_exists(binDir)
             javac = jdk.javac if jdk else get_jdk(tag=DEFAULT_JDK_TAG).javac
             cmd = [javac, '-d', _cygpathU2W(binDir)]
@@ -18080,7 +21009,7 @@ def _copy_eclipse_settings(p, files=None):
         if files:
             files.append(join(settingsDir, name))
 
-_tar_compressed_extensions = {'bz2', 'gz', 'lz', 'lzma', 'xz', 'Z'}
+_tar_compressed_extensions = {'bz2', 'gz', 'lz', 'lzma', 'xz', 'zst', 'Z'}
 _known_zip_pre_extensions = {'src'}
 
 
@@ -18257,14 +21186,12 @@ _utilities_commands = ['suites', 'envs', 'findclass', 'javap']
 
 update_commands("mx", {
     'archive': [_archive, '[options]'],
-    'benchmark' : [mx_benchmark.benchmark, '--vmargs [vmargs] --runargs [runargs] suite:benchname'],
-    'benchtable': [mx_benchplot.benchtable, '[options]'],
-    'benchplot': [mx_benchplot.benchplot, '[options]'],
+    'archivebench': [archivebench, '[options] <path>...'],
     'binary-url': [binary_url, '<repository id> <distribution name>'],
     'build': [build, '[options]'],
+    'cache': [cache, '<subcommand> [options]'],
     'canonicalizeprojects': [canonicalizeprojects, ''],
     'checkcopyrights': [checkcopyrights, '[options]'],
-    'checkheaders': [mx_gate.checkheaders, ''],
     'checkoverlap': [checkoverlap, ''],
     'checkstyle': [checkstyle, ''],
     'clean': [clean, ''],
@@ -18275,18 +21202,14 @@ update_commands("mx", {
     'exportlibs': [exportlibs, ''],
     'verifymultireleaseprojects' : [verifyMultiReleaseProjects, ''],
     'flattenmultireleasesources' : [flattenMultiReleaseSources, 'version'],
-    'findbugs': [mx_spotbugs.spotbugs, ''],
-    'spotbugs': [mx_spotbugs.spotbugs, ''],
+    'fetch': [fetch, '[options]'],
     'findclass': [findclass, ''],
     'fsckprojects': [fsckprojects, ''],
-    'gate': [mx_gate.gate, '[options]'],
     'help': [help_, '[command]'],
     'hg': [hg_command, '[options]'],
     'ideclean': [ideclean, ''],
     'ideinit': [ideinit, ''],
     'init' : [suite_init_cmd, '[options] name'],
-    'jackpot': [mx_jackpot.jackpot, ''],
-    'jacocoreport' : [mx_gate.jacocoreport, '[--format {html,xml}] [output directory]'],
     'java': [java_command, '[-options] class [args...]'],
     'javadoc': [javadoc, '[options]'],
     'javap': [javap, '[options] <class name patterns>'],
@@ -18304,17 +21227,13 @@ update_commands("mx", {
     'scloneimports': [scloneimports, '[options]'],
     'sforceimports': [sforceimports, ''],
     'sha1': [sha1, ''],
-    'sigtest': [mx_sigtest.sigtest, ''],
     'sincoming': [sincoming, ''],
     'site': [site, '[options]'],
-    'sonarqube-upload': [mx_gate.sonarqube_upload, '[options]'],
-    'coverage-upload': [mx_gate.coverage_upload, '[options]'],
     'spull': [spull, '[options]'],
     'stip': [stip, ''],
     'suites': [show_suites, ''],
     'supdate': [supdate, ''],
     'sversions': [sversions, '[options]'],
-    'testdownstream': [mx_downstream.testdownstream_cli, '[options]'],
     'update': [update, ''],
     'unstrip': [_unstrip, '[options]'],
     'urlrewrite': [mx_urlrewrites.urlrewrite_cli, 'url'],
@@ -18323,13 +21242,80 @@ update_commands("mx", {
     'version': [show_version, ''],
 })
 
-from mx_unittest import unittest
-_mx_commands.add_commands([
-    unittest,
-])
+_suite_context_properties = {
+    'suite_context_free': _suite_context_free,
+    'optional_suite_context': _optional_suite_context,
+    'no_suite_loading': _no_suite_loading,
+    'no_suite_discovery': _no_suite_discovery,
+}
+"""
+Maps the names of the suite context decorators to the lists of the commands they apply to.
+"""
+
+def _add_lazy_commands(suite_name, new_commands):
+    """
+    Adds commands whose functions are only imported when a command is run or its documentation is shown.
+
+    :param new_commands: keys are command names, values are lists: [<module name>, <function name>, <usage msg>, <format doc function>].
+            A list can end with a dict of properties of the command keyed by the name of the suite context decorator
+            (e.g. ``{'suite_context_free': True}``) the function is declared with. The decorator only takes effect
+            once the function is imported, which is too late for deciding whether suites are loaded.
+    """
+    commands = []
+    for command_name, command_list in new_commands.items():
+        if command_list and isinstance(command_list[-1], dict):
+            for name, value in command_list[-1].items():
+                if name not in _suite_context_properties:
+                    abort('Unknown property of command {}: {}'.format(command_name, name))
+                if value:
+                    _suite_context_properties[name].append(command_name)
+            command_list = command_list[:-1]
+        commands.append(MxLazyCommand(_mx_commands, command_list[0], command_list[1], suite_name, command_name, *command_list[2:]))
+    _mx_commands.add_commands(commands)
+
+_add_lazy_commands("mx", {
+    'benchmark': ['mx_benchmark', 'benchmark', '--vmargs [vmargs] --runargs [runargs] suite:benchname'],
+    'benchtable': ['mx_benchplot', 'benchtable', '[options]', {'suite_context_free': True}],
+    'benchplot': ['mx_benchplot', 'benchplot', '[options]', {'suite_context_free': True}],
+    'checkheaders': ['mx_gate', 'checkheaders', ''],
+    'findbugs': ['mx_spotbugs', 'spotbugs', ''],
+    'spotbugs': ['mx_spotbugs', 'spotbugs', ''],
+    'gate': ['mx_gate', 'gate', '[options]'],
+    'jackpot': ['mx_jackpot', 'jackpot', ''],
+    'jacocoreport': ['mx_gate', 'jacocoreport', '[--format {html,xml}] [output directory]'],
+    'mxbench': ['mx_mxbench', 'mxbench', '[options]'],
+    'sigtest': ['mx_sigtest', 'sigtest', ''],
+    'sonarqube-upload': ['mx_gate', 'sonarqube_upload', '[options]'],
+    'coverage-upload': ['mx_gate', 'coverage_upload', '[options]'],
+    'testdownstream': ['mx_downstream', 'testdownstream_cli', '[options]', {'no_suite_discovery': True}],
+    'unittest': ['mx_unittest', 'unittest'],
+})
+
+unittest = _mx_commands.command_function('unittest')
 
 _argParser = ArgParser()
 
+# the parsed mx options and the mx command line passed to the lazily imported mx_gate module
+_gate_opts = None
+_gate_command_line = None
+
+def _configure_mx_gate():
+    """
+    Passes the parsed mx options and the mx command line to mx_gate if it is loaded.
+    This is called when they become available and by mx_gate when it is loaded.
+    """
+    gate = sys.modules.get('mx_gate')
+    if gate is None:
+        return
+    if _gate_opts is not None and not getattr(gate, '_mx_opts_applied', False):
+        gate._jacoco = _gate_opts.jacoco
+        gate._jacoco_whitelisted_packages.extend(_gate_opts.jacoco_whitelist_package)
+        gate.add_jacoco_excluded_annotations(_gate_opts.jacoco_exclude_annotation)
+        gate.Task.verbose = _gate_opts.verbose
+        gate._mx_opts_applied = True
+    if _gate_command_line is not None:
+        gate._mx_args, gate._mx_command_and_args = _gate_command_line
+
 def _mxDirName(name):
     return 'mx.' + name
 
@@ -18502,6 +21488,7 @@ def _remove_unsatisfied_deps():
         res[dep.name] = reason
         dep.getSuiteRegistry().remove(dep)
         dep.getGlobalRegistry().pop(dep.name)
+    _invalidate_dep_graph(removed=removedDeps)
     return res
 
 
@@ -18514,6 +21501,180 @@ def _use_binary_suite(suite_name):
     return _binary_suites is not None and (len(_binary_suites) == 0 or suite_name in _binary_suites)
 
 
+def _get_suite_import_dir(importing_suite, suite_import, url, mode):
+    """Returns the directory to which the suite imported by `suite_import` is cloned from `url`."""
+    if mode == 'binary':
+        return importing_suite.binary_suite_dir(suite_import.name)
+    # Try use the URL first so that a big repo is cloned to a local
+    # directory whose named is based on the repo instead of a suite
+    # nested in the big repo.
+    root, _ = os.path.splitext(basename(_urllib_parse.urlparse(url).path))
+    if root:
+        return join(SiblingSuiteModel.siblings_dir(importing_suite.dir), root)
+    import_dir, _ = _suitemodel.importee_dir(importing_suite.dir, suite_import, check_alternate=False)
+    return import_dir
+
+
+def _suite_import_clone_kwargs(suite_import, mode):
+    if mode == 'binary':
+        return dict(result=dict(), suite_name=suite_import.name)
+    else:
+        return dict()
+
+
+def _discovery_jobs():
+    """
+    Gets the number of concurrent clones and binary suite downloads during suite discovery and the
+    default number of repositories processed concurrently by commands such as spull and supdate
+    (default: 8), which can be set with the MX_DISCOVERY_JOBS environment variable.
+    """
+    return int(get_env('MX_DISCOVERY_JOBS', '8'))
+
+
+class _RepositoryOutput(object):
+    """
+    Replaces `sys.stdout` or `sys.stderr` while operations on several repositories run concurrently
+    (see `_run_per_repository`). What a thread writes while it collects its output, including the
+    output of the subprocesses it starts with `run`, is appended to the thread's list of
+    (stream, data) pairs. Everything else is written to the replaced stream.
+    """
+    _local = _ThreadLocal()
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    @staticmethod
+    def collector(stream):
+        """
+        Gets a function collecting data as if it was written by the current thread to `stream` or
+        None if the current thread does not collect its output.
+        """
+        collected = getattr(_RepositoryOutput._local, 'collected', None)
+        if collected is None:
+            return None
+        return lambda data: collected.append((stream, data))
+
+    def write(self, data):
+        collected = getattr(_RepositoryOutput._local, 'collected', None)
+        if collected is None:
+            self._stream.write(data)
+        else:
+            collected.append((self, data))
+
+    def flush(self):
+        if getattr(_RepositoryOutput._local, 'collected', None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _run_per_repository(operations, jobs=None):
+    """
+    Calls the functions in `operations`, a list of (repository directory, function) pairs. A function is
+    called with an `abortOnError` argument and returns False if it failed without aborting. The functions
+    for one repository are called one after the other in list order while up to `jobs` (default:
+    `_discovery_jobs()`) repositories are processed concurrently. In the latter case, the output of
+    the functions for a repository is printed as one block once they have all returned and `abortOnError`
+    is False as aborting kills the subprocesses started for all repositories. The remaining functions for
+    a repository are skipped once one of them failed and mx aborts after all repositories were processed.
+    """
+    per_repository = OrderedDict()
+    for vc_dir, function in operations:
+        per_repository.setdefault(vc_dir, []).append(function)
+    jobs = jobs or _discovery_jobs()
+    if jobs == 1 or len(per_repository) <= 1:
+        for functions in per_repository.values():
+            for function in functions:
+                function(True)
+        return
+
+    print_lock = Lock()
+    failed = []
+
+    def _process(vc_dir):
+        collected = []
+        _RepositoryOutput._local.collected = collected
+        try:
+            for function in per_repository[vc_dir]:
+                if function(False) is False:
+                    failed.append(vc_dir)
+                    break
+        except SystemExit:
+            # a function aborted despite `abortOnError`
+            failed.append(vc_dir)
+        finally:
+            _RepositoryOutput._local.collected = None
+            if collected:
+                with print_lock:
+                    log(colorize('[{}]'.format(vc_dir), color='cyan', stream=sys.stdout))
+                    for stream, data in collected:
+                        stream.write(data)
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = _RepositoryOutput(stdout), _RepositoryOutput(stderr)
+    try:
+        _run_in_threads(_process, per_repository, jobs)
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    if failed:
+        abort('Failed to process {} repositor{}:\n  {}'.format(len(failed), 'y' if len(failed) == 1 else 'ies', '\n  '.join(failed)))
+
+
+def _prefetch_suite_imports(imports, jobs=None, fetch_missing=False):
+    """
+    Concurrently clones (or downloads in the case of binary suites) the suites imported by `imports`, a
+    list of (importing suite, SuiteImport) pairs, that have no local copy. Only the first URL that
+    `_find_suite_import` would try is used, any fallback is left to `_find_suite_import` which then simply
+    finds the prefetched suites locally. Imports resolving to the same directory are only cloned once.
+    If `fetch_missing` is true, the imported versions that are missing in the local repositories of
+    source suites are fetched at the same time so that updating the repositories does not need to pull.
+
+    :return: the set of real paths of the directories created by a successful clone
+    """
+    pending = OrderedDict()
+    fetches = OrderedDict()
+    for importing_suite, suite_import in imports:
+        mode = 'binary' if _use_binary_suite(suite_import.name) else 'source'
+        if mode == 'binary':
+            if importing_suite._find_binary_suite_dir(suite_import.name) is not None:
+                continue
+        else:
+            suite_dir = _suitemodel.find_suite_dir(suite_import)
+            if suite_dir is not None:
+                if fetch_missing and suite_import.version:
+                    vc, vc_dir = VC.get_vc_root(dirname(suite_dir), abortOnError=False)
+                    if vc and vc_dir not in fetches and not vc.exists(vc_dir, suite_import.version):
+                        fetches[vc_dir] = vc, suite_import.version
+                continue
+        for urlinfo in suite_import.urlinfos:
+            if urlinfo.abs_kind() == mode and urlinfo.vc.check(abortOnError=False):
+                import_dir = _get_suite_import_dir(importing_suite, suite_import, urlinfo.url, mode)
+                if not exists(import_dir) and import_dir not in pending:
+                    pending[import_dir] = suite_import, urlinfo, mode
+                break
+
+    cloned = set()
+
+    def _clone(import_dir):
+        suite_import, urlinfo, mode = pending[import_dir]
+        if urlinfo.vc.clone(urlinfo.url, import_dir, suite_import.version, abortOnError=False, **_suite_import_clone_kwargs(suite_import, mode)):
+            cloned.add(realpath(import_dir))
+        # a failed clone may have partially populated the target
+        elif exists(import_dir):
+            shutil.rmtree(import_dir)
+
+    def _fetch(vc_dir):
+        vc, rev = fetches[vc_dir]
+        vc.pull(vc_dir, rev=rev, update=False, abortOnError=False)
+
+    operations = [(d, lambda abortOnError, d=d: _clone(d)) for d in pending] + [(d, lambda abortOnError, d=d: _fetch(d)) for d in fetches]
+    _run_per_repository(operations, jobs)
+    return cloned
+
+
 def _find_suite_import(importing_suite, suite_import, fatalIfMissing=True, load=True, clone_binary_first=False):
     """
     :rtype : (Suite | None, bool)
@@ -18535,26 +21696,13 @@ def _find_suite_import(importing_suite, suite_import, fatalIfMissing=True, load=
 
     def _get_import_dir(url, mode):
         """Return directory where the suite will be cloned to"""
-        if mode == 'binary':
-            return importing_suite.binary_suite_dir(suite_import.name)
-        else:
-            # Try use the URL first so that a big repo is cloned to a local
-            # directory whose named is based on the repo instead of a suite
-            # nested in the big repo.
-            root, _ = os.path.splitext(basename(_urllib_parse.urlparse(url).path))
-            if root:
-                import_dir = join(SiblingSuiteModel.siblings_dir(importing_suite.dir), root)
-            else:
-                import_dir, _ = _suitemodel.importee_dir(importing_suite.dir, suite_import, check_alternate=False)
-            if exists(import_dir):
-                abort("Suite import directory ({0}) for suite '{1}' exists but no suite definition could be found.".format(import_dir, suite_import.name))
-            return import_dir
+        import_dir = _get_suite_import_dir(importing_suite, suite_import, url, mode)
+        if mode != 'binary' and exists(import_dir):
+            abort("Suite import directory ({0}) for suite '{1}' exists but no suite definition could be found.".format(import_dir, suite_import.name))
+        return import_dir
 
     def _clone_kwargs(mode):
-        if mode == 'binary':
-            return dict(result=dict(), suite_name=suite_import.name)
-        else:
-            return dict()
+        return _suite_import_clone_kwargs(suite_import, mode)
 
     _clone_status = [False]
     _found_mode = [None]
@@ -18624,7 +21772,7 @@ def _find_suite_import(importing_suite, suite_import, fatalIfMissing=True, load=
         return SourceSuite(import_mx_dir, importing_suite=importing_suite, load=load, dynamicallyImported=suite_import.dynamicImport), _clone_status[0]
 
 
-def _discover_suites(primary_suite_dir, load=True, register=True, update_existing=False):
+def _discover_suites(primary_suite_dir, load=True, register=True, update_existing=False, jobs=None):
 
     def _log_discovery(msg):
         dt = datetime.utcnow() - _mx_start_datetime
@@ -18831,6 +21979,25 @@ def _discover_suites(primary_suite_dir, load=True, register=True, update_existin
                         _log_discovery("Re-reached {} (collocated with {}) from {} with same version as {}".format(collocated_suite_name, _suite_import.name, _importing_suite.name, other_importer_name))
         return True
 
+    # The imports of a level of the breadth-first worklist are cloned (and in `update_existing` mode,
+    # their missing versions fetched) concurrently before their edges are processed one by one in
+    # worklist order, so that version conflicts are resolved as before.
+    prefetch_attempted = set()
+    prefetched_dirs = set()
+
+    def _prefetch_worklist_imports(_importing_suite, _suite_import):
+        to_prefetch = OrderedDict()
+        for _importing_suite_name, _imported_suite_name in [(_importing_suite.name, _suite_import.name)] + list(worklist):
+            if _imported_suite_name in discovered or _imported_suite_name in prefetch_attempted or _imported_suite_name in to_prefetch:
+                continue
+            __suite_import = discovered[_importing_suite_name].get_import(_imported_suite_name)
+            if not __suite_import.version_from:
+                to_prefetch[_imported_suite_name] = discovered[_importing_suite_name], __suite_import
+        prefetch_attempted.update(to_prefetch)
+        if len(to_prefetch) > 1:
+            _log_discovery("Prefetching " + ', '.join(to_prefetch))
+            prefetched_dirs.update(_prefetch_suite_imports(to_prefetch.values(), jobs, fetch_missing=update_existing))
+
     try:
         dynamic_imports_added = [False]
 
@@ -18869,7 +22036,12 @@ def _discover_suites(primary_suite_dir, load=True, register=True, update_existin
                 ancestor_names[suite_import.name] |= ancestor_names[importing_suite.name]
                 _check_and_handle_version_conflict(suite_import, importing_suite, discovered_suite)
             else:
+                if suite_import.name not in prefetch_attempted:
+                    _prefetch_worklist_imports(importing_suite, suite_import)
                 discovered_suite, is_clone = _find_suite_import(importing_suite, suite_import, load=False)
+                if not is_clone and discovered_suite.vc_dir and realpath(discovered_suite.vc_dir) in prefetched_dirs:
+                    prefetched_dirs.remove(realpath(discovered_suite.vc_dir))
+                    is_clone = True
                 _log_discovery("Discovered {} from {} ({}, newly cloned: {})".format(discovered_suite.name, importing_suite_name, discovered_suite.dir, is_clone))
                 if is_clone:
                     original_version[discovered_suite.vc_dir] = VersionType.CLONED, None
@@ -18895,8 +22067,12 @@ def _discover_suites(primary_suite_dir, load=True, register=True, update_existin
                 else:
                     _add_discovered_suite(discovered_suite, importing_suite.name)
             _maybe_add_dynamic_imports()
+        for d in prefetched_dirs:
+            _log_discovery("Removing {} which was prefetched but is not imported".format(d))
+            shutil.rmtree(d)
+        prefetched_dirs.clear()
     except SystemExit as se:
-        cloned_during_discovery = [d for d, (t, _) in original_version.items() if t == VersionType.CLONED]
+        cloned_during_discovery = [d for d, (t, _) in original_version.items() if t == VersionType.CLONED] + list(prefetched_dirs)
         if cloned_during_discovery:
             log_error("There was an error, removing " + ', '.join(("'" + d + "'" for d in cloned_during_discovery)))
             for d in cloned_during_discovery:
@@ -18947,6 +22123,76 @@ def _install_socks_proxy_opener(proxytype, proxyaddr, proxyport=None):
     _urllib_request.install_opener(opener)
 
 
+def _print_startup_profile():
+    """
+    Prints the durations of the phases recorded by `_startup_phase` and of the imports done by `_LazyModule`s.
+    """
+    print('Startup profile:', file=sys.stderr)
+    previous = _startup_phases[0][1]
+    for name, end in _startup_phases[1:]:
+        print('  {:<30} {:8.1f} ms'.format(name, (end - previous) * 1000), file=sys.stderr)
+        previous = end
+    print('  {:<30} {:8.1f} ms'.format('total', (previous - _startup_phases[0][1]) * 1000), file=sys.stderr)
+    if _lazy_imports:
+        print('Imported on demand:', file=sys.stderr)
+        for name, duration in _lazy_imports:
+            print('  {:<30} {:8.1f} ms'.format(name, duration * 1000), file=sys.stderr)
+
+_profiler = None
+_child_profiles = []
+
+def _start_profile():
+    """
+    Starts profiling mx as requested by --profile. The results are written when mx exits.
+    """
+    import atexit
+    import cProfile
+    global _profiler
+    # the file must not depend on the working directory of nested mx processes
+    _opts.profile = os.path.abspath(_opts.profile)
+    _profiler = cProfile.Profile()
+    atexit.register(_write_profile)
+    _profiler.enable()
+
+def _profile_summary_path(profile):
+    return os.path.splitext(profile)[0] + '.json'
+
+def _child_profile_path():
+    """
+    Gets the --profile file for a nested mx process.
+    """
+    root, ext = os.path.splitext(_opts.profile)
+    path = '{}.{}{}'.format(root, len(_child_profiles) + 1, ext)
+    _child_profiles.append(path)
+    return path
+
+def _write_profile():
+    """
+    Writes the cProfile statistics to the file given by --profile and a summary of the
+    startup phases and of the phases timed with `_Phase` next to it.
+    """
+    _profiler.disable()
+    _profiler.dump_stats(_opts.profile)
+    previous = _startup_phases[0][1]
+    startup = []
+    for name, end in _startup_phases[1:]:
+        startup.append({'name': name, 'ms': round((end - previous) * 1000, 3)})
+        previous = end
+    phases = {name: {'ms': round(seconds * 1000, 3), 'count': count} for name, (seconds, count) in _phase_timers.items()}
+    summary = {
+        'args': sys.argv[1:],
+        'pid': os.getpid(),
+        'total_ms': round((time.time() - _startup_phases[0][1]) * 1000, 3),
+        'startup': startup,
+        'phases': phases,
+        'profile': _opts.profile,
+        'children': [_profile_summary_path(p) for p in _child_profiles if exists(p)],
+    }
+    summary_path = _profile_summary_path(_opts.profile)
+    with open(summary_path, 'w') as fp:
+        json.dump(summary, fp, indent=2, sort_keys=True)
+    print('Profile written to {} (phases in {})'.format(_opts.profile, summary_path), file=sys.stderr)
+
 def main():
     # make sure logv, logvv and warn work as early as possible
     _opts.__dict__['verbose'] = '-v' in sys.argv or '-V' in sys.argv
@@ -19003,6 +22249,9 @@ def main():
         _check_socks_proxy()
 
     _argParser._parse_cmd_line(_opts, firstParse=True)
+    _startup_phase('parse options')
+    if _opts.profile:
+        _start_profile()
 
     global _mvn
     _mvn = MavenConfig()
@@ -19012,6 +22261,7 @@ def main():
     _mx_suite._init_metadata()
     _mx_suite._resolve_dependencies()
     _mx_suite._post_init()
+    _startup_phase('load mx suite')
 
     # Do not treat initial_command as an abbreviation as it would prevent
     # mx extensions from defining commands that match an abbreviation.
@@ -19057,7 +22307,8 @@ def main():
 
             _setup_binary_suites()
             if should_discover_suites:
-                primary = _discover_suites(primarySuiteMxDir, load=should_load_suites)
+                with _Phase('suite discovery'):
+                    primary = _discover_suites(primarySuiteMxDir, load=should_load_suites)
             else:
                 primary = SourceSuite(primarySuiteMxDir, load=False, primary=True)
             _primary_suite_init(primary)
@@ -19081,8 +22332,10 @@ def main():
         MXTestsSuite()
 
     if primarySuiteMxDir and not _mx_suite.primary and should_load_suites:
-        primary_suite().recursive_post_init()
-        _check_dependency_cycles()
+        with _Phase('metadata resolution'):
+            primary_suite().recursive_post_init()
+            _check_dependency_cycles()
+    _startup_phase('load suites')
 
     if len(commandAndArgs) == 0:
         print_simple_help()
@@ -19111,8 +22364,9 @@ def main():
                 d.set_archiveparticipant(JMHArchiveParticipant(d))
 
     command = commandAndArgs[0]
-    mx_gate._mx_command_and_args = commandAndArgs
-    mx_gate._mx_args = sys.argv[1:sys.argv.index(command)]
+    global _gate_command_line
+    _gate_command_line = (sys.argv[1:sys.argv.index(command)], commandAndArgs)
+    _configure_mx_gate()
     command_args = commandAndArgs[1:]
 
     if command not in _mx_commands.commands():
@@ -19129,7 +22383,8 @@ def main():
     if primarySuiteMxDir and should_load_suites:
         if not _mx_commands.get_command_property(command, "keepUnsatisfiedDependencies"):
             global _removedDeps
-            _removedDeps = _remove_unsatisfied_deps()
+            with _Phase('metadata resolution'):
+                _removedDeps = _remove_unsatisfied_deps()
 
     # Finally post_init remaining distributions
     for s_ in suites(includeBinary=False, include_mx=True):
@@ -19151,9 +22406,16 @@ def main():
                 abort('Command timed out after ' + str(_opts.timeout) + ' seconds: ' + ' '.join(commandAndArgs))
             signal.signal(signal.SIGALRM, alarm_handler)
             signal.alarm(_opts.timeout)
-        retcode = c(command_args)
+        try:
+            with _Phase('command execution'):
+                retcode = c(command_args)
+        finally:
+            if _opts.startup_profile:
+                _startup_phase('run command')
+                _print_startup_profile()
         if retcode is not None and retcode != 0:
             abort(retcode)
+        _auto_cache_gc()
     except KeyboardInterrupt:
         # no need to show the stack trace when the user presses CTRL-C
         abort(1, killsig=signal.SIGINT)
@@ -19164,6 +22426,7 @@ version = VersionSpec("5.215.6")  # GR-14974
 
 currentUmask = None
 _mx_start_datetime = datetime.utcnow()
+_startup_phase('initialize mx module')
 
 if __name__ == '__main__':
     # Capture the current umask since there's no way to query it without mutating it.
@@ -1940,6 +1940,8 @@ def init_benchmark_suites():
     add_bm_suite(JMHDistMxBenchmarkSuite())
     add_bm_suite(JMHJarMxBenchmarkSuite())
     add_bm_suite(TestBenchmarkSuite())
+    from mx_mxbench import MxBenchmarkSuite
+    add_bm_suite(MxBenchmarkSuite())
 
 
 def splitArgs(args, separator):
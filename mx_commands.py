@@ -148,3 +148,29 @@ class MxCommand(object):
         finally:
             for callback in self._mx_commands.command_after_callbacks:
                 callback(self, *args, **kwargs)
+
+
+class MxLazyCommand(MxCommand):
+    """
+    A command whose function is only imported from the module named `module_name` when the
+    command is run or its documentation is shown.
+    """
+
+    def __init__(self, mx_commands, module_name, function_name, suite_name, command, usage_msg='', doc_function=None, props=None):
+        super(MxLazyCommand, self).__init__(mx_commands, None, suite_name, command, usage_msg, doc_function, props)
+        self._module_name = module_name
+        self._function_name = function_name
+
+    @property
+    def command_function(self):
+        if self._command_function is None:
+            import importlib
+            function = getattr(importlib.import_module(self._module_name), self._function_name)
+            if isinstance(function, MxCommand):
+                # a function declared with the mx.command decorator
+                self.usage_msg = self.usage_msg or function.usage_msg
+                self.doc_function = self.doc_function or function.doc_function
+                self.props = self.props or function.props
+                function = function.command_function
+            self._command_function = function
+        return self._command_function
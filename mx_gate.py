@@ -451,6 +451,23 @@ def _collect_tasks(cleanArgs, args):
         Task.log = prevLog
     return tasks
 
+def _check_startup_time(task, runs=5):
+    """
+    Checks that the fastest of `runs` executions of ``mx version`` stays within the
+    time budget given in seconds by MX_STARTUP_TIME_BUDGET (default: 1.0).
+    """
+    budget = float(mx.get_env('MX_STARTUP_TIME_BUDGET', '1.0'))
+    cmd = [sys.executable, join(mx._mx_home, 'mx.py'), 'version']
+    fastest = None
+    for _ in range(runs):
+        start = time.time()
+        mx.run(cmd, out=mx.LinesOutputCapture())
+        duration = time.time() - start
+        fastest = duration if fastest is None else min(fastest, duration)
+    mx.log('Fastest of {} "mx version" runs: {:.0f} ms (budget: {:.0f} ms)'.format(runs, fastest * 1000, budget * 1000))
+    if fastest > budget:
+        task.abort('Startup time of mx exceeds the budget. Use "mx --startup-profile version" to find the cause.')
+
 def _run_gate(cleanArgs, args, tasks):
     global _jacoco
     with Task('Versions', tasks, tags=[Tags.always]) as t:
@@ -459,6 +476,14 @@ def _run_gate(cleanArgs, args, tasks):
             mx.command_function('sversions')([])
             mx.log("Python version: {}".format(sys.version_info))
 
+    with Task('StartupTime', tasks, tags=[Tags.always]) as t:
+        if t and mx.primary_suite() is mx._mx_suite:
+            _check_startup_time(t)
+
+    with Task('MxSelfTests', tasks, tags=[Tags.always]) as t:
+        if t and mx.primary_suite() is mx._mx_suite:
+            mx.run_mx(['mxt-selftest'], suite=join(mx._mx_home, 'tests'))
+
     with Task('JDKReleaseInfo', tasks, tags=[Tags.always]) as t:
         if t:
             jdkDirs = os.pathsep.join([mx.get_env('JAVA_HOME', ''), mx.get_env('EXTRA_JAVA_HOMES', '')])
@@ -993,3 +1018,6 @@ def sonarqube_upload(args):
             fp.seek(0)
             mx.abort('SonarQube scanner terminated with non-zero exit code: {}\n  Properties file:\n{}'.format(
                 exit_code, ''.join(('    ' + l for l in fp.readlines()))))
+
+# mx imports this module lazily so the mx options may already have been parsed
+mx._configure_mx_gate()
@@ -107,14 +107,15 @@ class JavaModuleDescriptor(object):
                 return None
         with open(path, 'rb') as fp:
             jmd = pickle.load(fp)
-        jdkmodules = {m.name: m for m in jdk.get_modules()}
         resolved = []
         for name in jmd.modulepath:
             if name.startswith('dist:'):
                 distName = name[len('dist:'):]
                 resolved.append(as_java_module(mx.distribution(distName), jdk))
             else:
-                resolved.append(jdkmodules[name])
+                jdkmodule = jdk.get_module(name)
+                assert jdkmodule is not None, name
+                resolved.append(jdkmodule)
         jmd.modulepath = resolved
         jmd.dist = mx.distribution(jmd.dist)
         if not os.path.isabs(jmd.jarpath):
@@ -295,16 +296,7 @@ def _expand_package_info(dep, packages):
     return result
 
 
-def get_library_as_module(dep, jdk):
-    """
-    Converts a (modular or non-modular) jar library to a module descriptor.
-
-    :param Library dep: a library dependency
-    :param JDKConfig jdk: a JDK with a version >= 9 that can be used to describe the module
-    :return: a module descriptor
-    """
-    assert dep.isLibrary()
-
+def _get_library_module_name(dep, jdk):
     def is_valid_module_name(name):
         identRE = re.compile(r"^[A-Za-z][A-Za-z0-9]*$")
         return all(identRE.match(ident) for ident in name.split('.'))
@@ -316,12 +308,88 @@ def get_library_as_module(dep, jdk):
         if not is_valid_module_name(moduleName):
             mx.abort("Invalid identifier in automatic module name derived for library {}: {} (path: {})".format(dep.name, moduleName, dep.path))
         dep.moduleName = moduleName
+    return moduleName
+
 
+def _get_library_module_description_cache(dep, moduleName, fullpath):
+    """
+    Gets the file in which the ``java --describe-module`` output for library `dep` is cached and
+    whether the cached output is up to date. The output for a library with a sha1 is cached in the
+    download cache next to the library's jar, keyed by the sha1 and the mx version (which determines
+    the format of the output). Otherwise, it is cached in the output root of the primary suite.
+
+    :return: a (path, up_to_date) tuple
+    """
+    cachedJar = os.path.realpath(fullpath)
+    if dep.sha1 and dep.sha1 != 'NOCHECK' and mx.is_cache_path(cachedJar):
+        cache = join(dirname(cachedJar), '{}.{}.mx{}.desc'.format(moduleName, dep.sha1, mx.version))
+        return cache, exists(cache)
     modulesDir = mx.ensure_dir_exists(join(mx.primary_suite().get_output_root(), 'modules'))
     cache = join(modulesDir, moduleName + '.desc')
+    return cache, exists(cache) and not mx.TimeStampFile(fullpath).isNewerThan(cache) and not mx.TimeStampFile(__file__).isNewerThan(cache)
+
+
+def _save_library_module_description(cache, lines):
+    try:
+        with mx.SafeFileCreation(cache) as sfc, open(sfc.tmpPath, 'w') as fp:
+            fp.write('\n'.join(lines) + '\n')
+    except (IOError, OSError) as e:
+        mx.warn('Error writing to ' + cache + ': ' + str(e))
+
+
+def describe_library_modules(deps, jdk):
+    """
+    Describes the modules defined by the libraries in `deps` whose descriptions are not yet
+    cached with a single JVM launch and caches the descriptions for `get_library_as_module`.
+
+    :param list deps: library dependencies
+    :param JDKConfig jdk: a JDK with a version >= 9 that can be used to describe the modules
+    """
+    pending = []
+    for dep in deps:
+        assert dep.isLibrary()
+        moduleName = _get_library_module_name(dep, jdk)
+        fullpath = dep.get_path(resolve=True)
+        cache, upToDate = _get_library_module_description_cache(dep, moduleName, fullpath)
+        if not upToDate:
+            pending.append((moduleName, fullpath, cache))
+    if len(pending) < 2:
+        # not worth compiling and launching the helper
+        return
+    _, binDir = mx._compile_mx_class('DescribeModules', jdk=jdk)
+    out = mx.LinesOutputCapture()
+    args = []
+    for moduleName, fullpath, _ in pending:
+        args += [mx._cygpathU2W(fullpath), moduleName]
+    mx.run([jdk.java, '-cp', mx._cygpathU2W(binDir), 'DescribeModules'] + args, out=out)
+    descriptions = []
+    for line in out.lines:
+        if line == '#':
+            descriptions.append([])
+        elif descriptions:
+            descriptions[-1].append(line)
+    assert len(descriptions) == len(pending), out.lines
+    for (moduleName, _, cache), lines in zip(pending, descriptions):
+        if lines and lines[0].startswith(moduleName):
+            _save_library_module_description(cache, lines)
+        # else: leave it to get_library_as_module to report the error
+
+
+def get_library_as_module(dep, jdk):
+    """
+    Converts a (modular or non-modular) jar library to a module descriptor.
+
+    :param Library dep: a library dependency
+    :param JDKConfig jdk: a JDK with a version >= 9 that can be used to describe the module
+    :return: a module descriptor
+    """
+    assert dep.isLibrary()
+
+    moduleName = _get_library_module_name(dep, jdk)
     fullpath = dep.get_path(resolve=True)
+    cache, upToDate = _get_library_module_description_cache(dep, moduleName, fullpath)
     save = False
-    if not exists(cache) or mx.TimeStampFile(fullpath).isNewerThan(cache) or mx.TimeStampFile(__file__).isNewerThan(cache):
+    if not upToDate:
         out = mx.LinesOutputCapture()
         rc = mx.run([jdk.java, '--module-path', fullpath, '--describe-module', moduleName], out=out, err=out, nonZeroIsFatal=False)
         lines = out.lines
@@ -344,7 +412,7 @@ def get_library_as_module(dep, jdk):
     for line in lines[1:]:
         parts = line.strip().split()
         assert len(parts) >= 2, '>>>'+line+'<<<'
-        if parts[0:2] == ['qualified', 'exports']:
+        if parts[0] == 'qualified':
             parts = parts[1:]
         a = parts[0]
         if a == 'requires':
@@ -359,6 +427,9 @@ def get_library_as_module(dep, jdk):
             else:
                 targets = []
             exports[source] = targets
+        elif a == 'opens':
+            # packages opened for reflection are not otherwise listed
+            packages.add(parts[1])
         elif a == 'uses':
             uses.update(parts[1:])
         elif a == 'contains':
@@ -373,12 +444,7 @@ def get_library_as_module(dep, jdk):
     packages.update(exports.keys())
 
     if save:
-        try:
-            with open(cache, 'w') as fp:
-                fp.write('\n'.join(lines) + '\n')
-        except IOError as e:
-            mx.warn('Error writing to ' + cache + ': ' + str(e))
-            os.remove(cache)
+        _save_library_module_description(cache, lines)
 
     return JavaModuleDescriptor(moduleName, exports, requires, uses, provides, packages, jarpath=fullpath)
 
@@ -437,7 +503,9 @@ def make_java_module(dist, jdk):
 
     if dist.suite.getMxCompatibility().moduleDepsEqualDistDeps():
         moduledeps = dist.archived_deps()
-        for dep in mx.classpath_entries(dist, includeSelf=False):
+        classpathDeps = mx.classpath_entries(dist, includeSelf=False)
+        describe_library_modules([dep for dep in classpathDeps if dep.isLibrary()], jdk)
+        for dep in classpathDeps:
             if dep.isJARDistribution():
                 jmd = as_java_module(dep, jdk)
                 modulepath.append(jmd)
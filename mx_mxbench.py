@@ -0,0 +1,360 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2019, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+
+"""
+Benchmarks measuring how mx itself scales with the size of the suites it works on.
+
+The benchmarks run mx on synthetic suites generated by `generate_suites` and are
+available as the ``mxbench`` benchmark suite of ``mx benchmark`` and through the
+``mx mxbench`` command.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from argparse import ArgumentParser
+from os.path import join
+
+import mx
+import mx_benchmark
+
+# The command added to the primary synthetic suite that measures the operations done within one mx process.
+_measure_command = 'mxbench-measure'
+
+_measure_extension = '''
+import time
+import mx
+import mx_unittest
+
+def _measure(args):
+    """measures an operation of mx on the loaded suites"""
+    operation = args[0]
+    if operation == 'suite-loading':
+        # from the start of mx until the command runs
+        elapsed = time.time() - mx._startup_phases[0][1]
+    else:
+        start = time.time()
+        if operation == 'walk-deps':
+            mx.walk_deps(visit=lambda dep, edge: None)
+        elif operation == 'classpath':
+            for p in mx.projects():
+                mx.classpath_entries(p)
+            mx.classpath_entries([d.name for d in mx.sorted_dists()])
+        elif operation == 'checkoverlap':
+            mx.checkoverlap([])
+        elif operation == 'unittest-discovery':
+            for p in mx.projects():
+                if p.isJavaProject():
+                    mx_unittest._find_classes_with_annotations(p, None, ['@Test'])
+        else:
+            mx.abort('unknown operation ' + operation)
+        elapsed = time.time() - start
+    print('{}: {} {}'.format(\'''' + _measure_command + '''\', operation, elapsed * 1000))
+
+mx.update_commands('%s', {
+    \'''' + _measure_command + '''\' : [_measure, 'operation'],
+})
+'''
+
+_generator_parser = ArgumentParser(prog='mx mxbench', add_help=False)
+_generator_parser.add_argument('--projects', action='store', type=int, default=500, help='number of projects in all synthetic suites (default: 500)', metavar='<n>')
+_generator_parser.add_argument('--distributions', action='store', type=int, default=20, help='number of distributions in all synthetic suites (default: 20)', metavar='<n>')
+_generator_parser.add_argument('--libraries', action='store', type=int, default=10, help='number of libraries in all synthetic suites (default: 10)', metavar='<n>')
+_generator_parser.add_argument('--imports', action='store', type=int, default=2, help='length of the chain of suites imported by the primary synthetic suite (default: 2)', metavar='<n>')
+_generator_parser.add_argument('--fanout', action='store', type=int, default=4, help='maximum number of project dependencies of a project (default: 4)', metavar='<n>')
+_generator_parser.add_argument('--iterations', action='store', type=int, default=5, help='number of measurements of each benchmark (default: 5)', metavar='<n>')
+_generator_parser.add_argument('--seed', action='store', type=int, default=42, help='seed for the random dependency graph (default: 42)', metavar='<n>')
+_generator_parser.add_argument('--keep', action='store_true', help='keep the synthetic suites')
+mx_benchmark.add_parser('mxbench', mx_benchmark.ParserEntry(_generator_parser, '\n\nShape of the synthetic suites of the mxbench benchmark suite:\n'))
+
+
+def _suite_name(index):
+    return 'synth' + str(index)
+
+
+def generate_suites(target_dir, projects, distributions, libraries, imports, fanout, seed):
+    """
+    Generates a chain of `imports` + 1 synthetic suites in the git repository `target_dir`,
+    each one importing the previous one. The `projects`, `distributions` and `libraries`
+    are divided evenly between the suites. Each project has one Java class and depends on
+    up to `fanout` projects defined before it in the same suite or distributions of the
+    imported suite. Every tenth class is a test class.
+
+    :return: the directory of the primary suite (i.e. the last one in the chain) and the names of its distributions
+    """
+    rnd = random.Random(seed)
+    suite_count = imports + 1
+
+    def _share(total, index):
+        return max(1, total // suite_count + (1 if index < total % suite_count else 0))
+
+    suite_dirs = []
+    imported_dists = []
+    for index in range(suite_count):
+        name = _suite_name(index)
+        suite_dir = join(target_dir, name)
+        suite_dirs.append(suite_dir)
+        mx_dir = mx.ensure_dir_exists(join(suite_dir, 'mx.' + name))
+
+        suite_libraries = {}
+        if libraries:
+            mx.ensure_dir_exists(join(suite_dir, 'lib'))
+            for i in range(_share(libraries, index)):
+                path = join('lib', 'lib{}.jar'.format(i))
+                with zipfile.ZipFile(join(suite_dir, path), 'w') as zf:
+                    zf.writestr('{}/lib{}/Resource.txt'.format(name, i), 'resource ' + str(i))
+                with open(join(suite_dir, path), 'rb') as fp:
+                    sha1 = hashlib.sha1(fp.read()).hexdigest()
+                suite_libraries['{}_LIB{}'.format(name.upper(), i)] = {
+                    'path' : path,
+                    'sha1' : sha1,
+                }
+        library_names = sorted(suite_libraries.keys())
+
+        project_names = []
+        suite_projects = {}
+        for i in range(_share(projects, index)):
+            p_name = '{}.p{}'.format(name, i)
+            # depending only on projects defined before avoids cycles and projects
+            # of other suites can only be referenced through their distributions
+            candidates = project_names + imported_dists
+            deps = set(rnd.choice(candidates) for _ in range(rnd.randint(0, min(fanout, len(candidates))))) if candidates else set()
+            if library_names and i % 10 == 0:
+                deps.add(rnd.choice(library_names))
+            if i == 0:
+                _write_java(suite_dir, p_name, 'Test', '@java.lang.annotation.Retention(java.lang.annotation.RetentionPolicy.RUNTIME)\npublic @interface Test {\n}\n')
+            elif i % 10 == 9:
+                deps.add(project_names[0])
+                _write_java(suite_dir, p_name, 'C', 'import {}.Test;\n\npublic class C {{\n    @Test\n    public void test() {{\n    }}\n}}\n'.format(project_names[0]))
+            else:
+                _write_java(suite_dir, p_name, 'C', 'public class C {\n}\n')
+            suite_projects[p_name] = {
+                'subDir' : 'src',
+                'sourceDirs' : ['src'],
+                'dependencies' : sorted(deps),
+                'javaCompliance' : '8+',
+                'workingSets' : 'Synthetic',
+            }
+            project_names.append(p_name)
+
+        # each distribution archives a consecutive range of projects and depends on the previous
+        # distribution such that the distributions of a suite do not overlap
+        suite_dists = {}
+        dist_count = _share(distributions, index)
+        previous_dist = imported_dists[-1] if imported_dists else None
+        dist_names = []
+        for i in range(dist_count):
+            dist_name = '{}_D{}'.format(name.upper(), i)
+            dist = {
+                'dependencies' : project_names[i * len(project_names) // dist_count:(i + 1) * len(project_names) // dist_count],
+            }
+            if previous_dist:
+                dist['distDependencies'] = [previous_dist]
+            suite_dists[dist_name] = dist
+            previous_dist = dist_name
+            dist_names.append(dist_name)
+
+        suite = {
+            'mxversion' : str(mx.version),
+            'name' : name,
+            'projects' : suite_projects,
+            'libraries' : suite_libraries,
+            'distributions' : suite_dists,
+        }
+        if index:
+            suite['imports'] = {'suites' : [{'name' : _suite_name(index - 1), 'subdir' : True}]}
+        with open(join(mx_dir, 'suite.py'), 'w') as fp:
+            # one entry per line as in suite.py files maintained by hand
+            fp.write('suite = ' + json.dumps(suite, indent=2, sort_keys=True).replace(': true', ': True') + '\n')
+        imported_dists = [name + ':' + d for d in dist_names]
+
+    primary_dir = suite_dirs[-1]
+    with open(join(primary_dir, 'mx.' + _suite_name(imports), 'mx_{}.py'.format(_suite_name(imports))), 'w') as fp:
+        fp.write(_measure_extension % _suite_name(imports))
+    # suites are versioned by the repository they are in
+    mx.run(['git', 'init', '-q', target_dir])
+    mx.run(['git', 'add', '.'], cwd=target_dir)
+    mx.run(['git', '-c', 'user.name=mxbench', '-c', 'user.email=mxbench@localhost', 'commit', '-q', '-m', 'synthetic suites'], cwd=target_dir)
+    return primary_dir, dist_names
+
+
+def _write_java(suite_dir, project, class_name, body):
+    package_dir = mx.ensure_dir_exists(join(suite_dir, project, 'src', *project.split('.')))
+    with open(join(package_dir, class_name + '.java'), 'w') as fp:
+        fp.write('package {};\n\n{}'.format(project, body))
+
+
+class MxBenchmarkSuite(mx_benchmark.BenchmarkSuite):
+    """
+    Measures the time mx needs for its core operations on synthetic suites.
+
+    The benchmarks that only need loaded suites are measured within an mx process
+    by a command added to the primary synthetic suite. The others are measured as
+    the time of a complete mx invocation.
+    """
+    _in_process = ['suite-loading', 'walk-deps', 'classpath', 'checkoverlap', 'unittest-discovery']
+
+    def __init__(self, *args, **kwargs):
+        super(MxBenchmarkSuite, self).__init__(*args, **kwargs)
+        self._target_dir = None
+        self._primary_dir = None
+        self._commands = {}
+        self._built = False
+
+    def name(self):
+        return 'mxbench'
+
+    def group(self):
+        return 'Graal'
+
+    def subgroup(self):
+        return 'mx'
+
+    def benchmarkList(self, bmSuiteArgs):
+        return ['suite-loading', 'walk-deps', 'classpath', 'build-noop', 'checkoverlap', 'ideinit', 'unittest-discovery']
+
+    def parserNames(self):
+        return ['mxbench']
+
+    def vmArgs(self, bmSuiteArgs):
+        return []
+
+    def runArgs(self, bmSuiteArgs):
+        return bmSuiteArgs
+
+    def _parse(self, bmSuiteArgs):
+        return _generator_parser.parse_args(bmSuiteArgs)
+
+    def before(self, bmSuiteArgs):
+        args = self._parse(bmSuiteArgs)
+        self._target_dir = tempfile.mkdtemp(prefix='mxbench-')
+        self._built = False
+        mx.log('Generating {} projects in {} suites in {}'.format(args.projects, args.imports + 1, self._target_dir))
+        self._primary_dir, dists = generate_suites(self._target_dir, args.projects, args.distributions, args.libraries, args.imports, args.fanout, args.seed)
+        self._commands = {
+            # the last distribution depends on all other synthetic distributions
+            'build-noop' : ['build', '--dependencies', dists[-1]],
+            'ideinit' : ['ideinit'],
+        }
+        self._suite_dimensions = {
+            'extra.mxbench.projects' : args.projects,
+            'extra.mxbench.distributions' : args.distributions,
+            'extra.mxbench.libraries' : args.libraries,
+            'extra.mxbench.imports' : args.imports,
+            'extra.mxbench.fanout' : args.fanout,
+        }
+
+    def after(self, bmSuiteArgs):
+        if self._target_dir:
+            if self._parse(bmSuiteArgs).keep:
+                mx.log('Synthetic suites kept in ' + self._target_dir)
+            else:
+                shutil.rmtree(self._target_dir)
+            self._target_dir = None
+
+    def _run_mx(self, args, out):
+        retcode = mx.run_mx(args, suite=self._primary_dir, out=out, err=out, nonZeroIsFatal=False)
+        if retcode != 0:
+            raise RuntimeError('mx {} failed with exit code {}:\n{}'.format(' '.join(args), retcode, out.data))
+
+    def _measure(self, benchmark):
+        out = mx.OutputCapture()
+        if benchmark in self._in_process:
+            self._run_mx([_measure_command, benchmark], out)
+            for line in out.data.splitlines():
+                if line.startswith(_measure_command + ': ' + benchmark + ' '):
+                    return float(line.split()[-1])
+            raise RuntimeError('no measurement of {} in:\n{}'.format(benchmark, out.data))
+        command = self._commands[benchmark]
+        if command[0] == 'build' and not self._built:
+            # everything must have been built before for a no-op build
+            self._run_mx(command, out)
+            self._built = True
+            out = mx.OutputCapture()
+        start = time.time()
+        self._run_mx(command, out)
+        return (time.time() - start) * 1000
+
+    def run(self, benchmarks, bmSuiteArgs):
+        args = self._parse(bmSuiteArgs)
+        results = []
+        for benchmark in benchmarks or self.benchmarkList(bmSuiteArgs):
+            try:
+                times = [self._measure(benchmark) for _ in range(args.iterations)]
+            except RuntimeError as e:
+                raise mx_benchmark.BenchmarkFailureError(str(e), results)
+            mx.log('{}: {}'.format(benchmark, ', '.join(('{:.1f} ms'.format(t) for t in times))))
+            # the first datapoint of a benchmark is the final time as expected by `mx benchplot`
+            datapoints = [('final-time', 0, sum(times) / len(times))] + [('warmup', i, t) for i, t in enumerate(times)]
+            for metric_name, iteration, value in datapoints:
+                results.append({
+                    'benchmark' : benchmark,
+                    'metric.name' : metric_name,
+                    'metric.value' : value,
+                    'metric.unit' : 'ms',
+                    'metric.type' : 'numeric',
+                    'metric.score-function' : 'id',
+                    'metric.better' : 'lower',
+                    'metric.iteration' : iteration,
+                })
+        return results
+
+
+def _register_suite():
+    if not mx_benchmark._bm_suites.get('mxbench'):
+        mx_benchmark.add_bm_suite(MxBenchmarkSuite(), mx._mx_suite)
+
+
+def mxbench(args):
+    """measure how mx scales with the size of the suites
+
+    Generates synthetic suites of the requested shape and times suite loading, walk_deps,
+    classpath computation, a no-op build, checkoverlap, ideinit and unittest discovery on
+    them. The results are written in the format of `mx benchmark` so that they can be
+    compared with `mx benchtable` and `mx benchplot`. The command must be run in a suite
+    (e.g. mx itself) whose revision is recorded with the results."""
+    parser = ArgumentParser(prog='mx mxbench', parents=[_generator_parser], description='Measures how mx scales with the size of the suites.')
+    parser.add_argument('-b', '--benchmarks', action='store', help='comma separated list of the benchmarks to run (default: all)', metavar='<names>')
+    parser.add_argument('--results-file', action='store', default='bench-results.json', help='path of the JSON file with the results (default: bench-results.json)', metavar='<path>')
+    args = parser.parse_args(args)
+    _register_suite()
+    spec = 'mxbench:*' if not args.benchmarks else 'mxbench:*[{}]'.format(args.benchmarks)
+    # the shape of the synthetic suites is passed on as benchmark suite arguments
+    suite_args = []
+    for action in _generator_parser._actions:
+        value = getattr(args, action.dest)
+        if action.nargs == 0:
+            if value:
+                suite_args.append(action.option_strings[0])
+        else:
+            suite_args += [action.option_strings[0], str(value)]
+    return mx_benchmark.benchmark([spec, '--results-file', args.results_file, '--'] + suite_args)
@@ -204,8 +204,8 @@ class NinjaProject(mx.AbstractNativeProject, NativeDependency):
             def getBuildTask(self, args):
                 return mx.NoOpTask(self, args)
 
-            def _walk_deps_visit_edges(self, *args, **kwargs):
-                pass
+            def _walk_deps_edge_lists(self):
+                return []
 
         return JavaHome(mx.get_jdk(tag=mx.DEFAULT_JDK_TAG))
 
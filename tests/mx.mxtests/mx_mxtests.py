@@ -3,10 +3,33 @@
 
 from __future__ import print_function
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
+import hashlib
+import io
+import json
 import os
-import urllib
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
 import mx
+import mx_subst
+
+try:
+    from HTMLParser import HTMLParser
+    from urllib import urlopen
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from html.parser import HTMLParser  # pylint: disable=import-error
+    from urllib.request import urlopen  # pylint: disable=import-error,no-name-in-module
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # pylint: disable=import-error
+    from socketserver import ThreadingMixIn  # pylint: disable=import-error
 
 _suite = mx.suite('mxtests')
 
@@ -59,8 +82,6 @@ def _alldeps(args):
     for d in deps:
         print(d.__class__.__name__, ":", d.name)
 
-from HTMLParser import HTMLParser
-
 class MyHTMLParser(HTMLParser):
     def __init__(self):
         HTMLParser.__init__(self)
@@ -92,7 +113,7 @@ def _readurl(args):
         for f in os.listdir(args.url.replace('file://', '')):
             print(f)
     else:
-        f = urllib.urlopen(args.url)
+        f = urlopen(args.url)
         text = f.read()
         parser = MyHTMLParser() if args.print_tags else DirHTMLParser()
         parser.feed(text)
@@ -147,6 +168,1012 @@ def _command_info(args):
     args = parser.parse_args(args)
     mx.command_function(args.command)
 
+class _SyntheticDependency(mx.Dependency):
+    def __init__(self, suite, name, deps, buildDependencies):
+        mx.Dependency.__init__(self, suite, name, None)
+        self.deps = deps
+        self.buildDependencies = buildDependencies
+
+    def _walk_deps_edge_lists(self):
+        return [(mx.DEP_STANDARD, self.deps), (mx.DEP_BUILD, self.buildDependencies)]
+
+def _recursive_walk_deps(dep, visited, edge, preVisit, visit, ignoredEdges, visitEdge):
+    # the recursive traversal previously done by Dependency.walk_deps
+    visited.add(dep)
+    if not preVisit or preVisit(dep, edge):
+        for dep_type, dep_list in dep._walk_deps_edge_lists():
+            if dep_type not in ignoredEdges:
+                for dst in dep_list:
+                    out_edge = mx.DepEdge(dep, dep_type, edge)
+                    if visitEdge:
+                        visitEdge(dep, dst, out_edge)
+                    if dst not in visited:
+                        _recursive_walk_deps(dst, visited, out_edge, preVisit, visit, ignoredEdges, visitEdge)
+        if visit:
+            visit(dep, edge)
+
+def _walk_deps_bench(args):
+    parser = ArgumentParser(prog='mx mxt-walk-deps-bench')
+    parser.add_argument('--size', action='store', type=int, help='number of dependencies in the synthetic graph', default=10000)
+    parser.add_argument('--fanout', action='store', type=int, help='maximum number of dependencies of a dependency', default=6)
+    parser.add_argument('--runs', action='store', type=int, help='number of walks of the graph', default=5)
+    args = parser.parse_args(args)
+    random.seed(42)
+    deps = []
+    for i in range(args.size):
+        # always depend on the previous dependency to get a graph as deep as it is large
+        standard = [deps[i - 1]] if i else []
+        standard += [deps[random.randrange(i)] for _ in range(random.randrange(min(i, args.fanout)))] if i else []
+        build = [deps[random.randrange(i)]] if i and random.random() < 0.1 else []
+        deps.append(_SyntheticDependency(_suite, 'dep' + str(i), standard, build))
+    roots = list(reversed(deps))
+    ignoredEdges = [mx.DEP_ANNOTATION_PROCESSOR, mx.DEP_EXCLUDED, mx.DEP_BUILD]
+    edges = sum(len(d.deps) + len(d.buildDependencies) for d in deps)
+    print('graph: {} dependencies, {} edges'.format(len(deps), edges))
+
+    def _iterative(preVisit, visit, visitEdge):
+        mx.walk_deps(roots, preVisit=preVisit, visit=visit, ignoredEdges=ignoredEdges, visitEdge=visitEdge)
+
+    def _recursive(preVisit, visit, visitEdge):
+        visited = set()
+        for root in roots:
+            if root not in visited:
+                _recursive_walk_deps(root, visited, None, preVisit, visit, ignoredEdges, visitEdge)
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10 * args.size))
+    try:
+        callbacks = [
+            ('visit', (None, lambda dep, edge: None, None)),
+            ('preVisit+visit', (lambda dep, edge: True, lambda dep, edge: None, None)),
+            ('visitEdge', (None, None, lambda src, dst, edge: None)),
+        ]
+        for name, (preVisit, visit, visitEdge) in callbacks:
+            for walker_name, walker in (('recursive', _recursive), ('iterative', _iterative)):
+                start = time.time()
+                for _ in range(args.runs):
+                    walker(preVisit, visit, visitEdge)
+                print('{:>16} {:>10}: {:.1f} ms/walk'.format(name, walker_name, (time.time() - start) * 1000 / args.runs))
+    finally:
+        sys.setrecursionlimit(limit)
+
+_memory_bench_extension = '''
+import gc, resource, mx
+
+def _memory_stats(args):
+    gc.collect()
+    rss = 0
+    if mx.exists('/proc/self/status'):
+        with open('/proc/self/status') as fp:
+            for line in fp:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1])
+    print('dependencies {} rss {} maxrss {}'.format(len(list(mx.dependencies())), rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+mx.update_commands(mx.suite('memorybench'), {'memory-stats' : [_memory_stats, '']})
+'''
+
+def _memory_bench(args):
+    parser = ArgumentParser(prog='mx mxt-memory-bench')
+    parser.add_argument('--projects', action='store', type=int, help='number of projects in the synthetic suite', default=3000)
+    parser.add_argument('--libraries', action='store', type=int, help='number of libraries in the synthetic suite', default=50)
+    parser.add_argument('--keep', action='store_true', help='keep the synthetic suite')
+    args = parser.parse_args(args)
+    random.seed(42)
+    projects = {}
+    for i in range(args.projects):
+        deps = sorted(set('com.example.p' + str(random.randrange(i)) for _ in range(min(i, 4))))
+        if i % 10 == 0 and args.libraries:
+            deps.append('LIB' + str(i % args.libraries))
+        projects['com.example.p' + str(i)] = {
+            'subDir' : 'src',
+            'sourceDirs' : ['src'],
+            'dependencies' : deps,
+            'javaCompliance' : '8+',
+            'checkstyle' : 'com.example.p0',
+            'workingSets' : 'Example',
+        }
+    libraries = {}
+    for i in range(args.libraries):
+        libraries['LIB' + str(i)] = {
+            'path' : 'lib/lib{}.jar'.format(i),
+            'sha1' : '{:040x}'.format(i),
+            'urls' : ['https://example.com/lib{}.jar'.format(i)],
+        }
+    distributions = {}
+    for i in range(args.projects // 30):
+        distributions['D' + str(i)] = {
+            'dependencies' : ['com.example.p' + str(i * 30 + 29)],
+            'distDependencies' : ['D' + str(i - 1)] if i else [],
+        }
+    suite = {
+        'mxversion' : mx.version.versionString,
+        'name' : 'memorybench',
+        'projects' : projects,
+        'libraries' : libraries,
+        'distributions' : distributions,
+    }
+    suite_dir = tempfile.mkdtemp(prefix='mxt-memory-bench')
+    try:
+        mx.ensure_dir_exists(os.path.join(suite_dir, 'mx.memorybench'))
+        # one entry per line as the suite.py files maintained by hand
+        with open(os.path.join(suite_dir, 'mx.memorybench', 'suite.py'), 'w') as fp:
+            fp.write('suite = ' + json.dumps(suite, indent=2, sort_keys=True) + '\n')
+        with open(os.path.join(suite_dir, 'mx.memorybench', 'mx_memorybench.py'), 'w') as fp:
+            fp.write(_memory_bench_extension)
+        # the primary suite must be in a repository
+        mx.vc_system('git').init(suite_dir)
+        out = mx.OutputCapture()
+        start = time.time()
+        mx.run_mx(['memory-stats'], suite=suite_dir, out=out)
+        elapsed = time.time() - start
+        stats = out.data.split()
+        stats = dict(zip(stats[-6::2], stats[-5::2]))
+        print('{} dependencies loaded in {:.2f} s: rss {} KB, peak rss {} KB'.format(stats['dependencies'], elapsed, stats['rss'], stats['maxrss']))
+    finally:
+        if args.keep:
+            print('synthetic suite kept in ' + suite_dir)
+        else:
+            shutil.rmtree(suite_dir)
+
+# Self tests of mx run by `mx mxt-selftest` and by the MxSelfTests gate task of mx.
+# A test is a function named `_test_<name>` taking a scratch directory that is deleted afterwards.
+# Changes a test makes to os.environ are undone after it.
+_selftests = []
+
+def _selftest(function):
+    _selftests.append(function)
+    return function
+
+def _check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+def _check_equal(expected, actual, what):
+    _check(expected == actual, '{}: expected {!r}, got {!r}'.format(what, expected, actual))
+
+def _write_file(path, data):
+    mx.ensure_dirname_exists(path)
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+def _read_file(path):
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+def _files_in(directory):
+    """Gets a dict from the '/' separated paths of the files in `directory` to their contents."""
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, directory).replace(os.sep, '/')] = _read_file(path)
+    return files
+
+def _selftest_command(args):
+    parser = ArgumentParser(prog='mx mxt-selftest')
+    parser.add_argument('-k', '--keep', action='store_true', help='keep the scratch directories of the tests')
+    parser.add_argument('tests', nargs='*', metavar='<name>', help='run only the tests whose name contains one of these strings')
+    args = parser.parse_args(args)
+    failed = []
+    for test in _selftests:
+        name = test.__name__[len('_test_'):]
+        if args.tests and not any(t in name for t in args.tests):
+            continue
+        scratch = tempfile.mkdtemp(prefix='mxt-' + name + '.')
+        environ = dict(os.environ)
+        start = time.time()
+        try:
+            test(scratch)
+            print('PASSED {} ({:.2f} s)'.format(name, time.time() - start))
+        except (AssertionError, SystemExit) as e:
+            failed.append(name)
+            print('FAILED {}: {}'.format(name, e))
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+            if args.keep:
+                print('  scratch directory kept in ' + scratch)
+            else:
+                shutil.rmtree(scratch, ignore_errors=True)
+    if failed:
+        mx.abort('{} test(s) failed: {}'.format(len(failed), ', '.join(failed)))
+
+class _ScratchLayout(mx.LayoutTARDistribution):  # pylint: disable=too-many-ancestors
+    """
+    Just enough of a layout distribution to scan the inputs of its `file` sources in `directory`.
+    """
+    def __init__(self, directory, layout):  # pylint: disable=super-init-not-called
+        self.suite = Namespace(dir=directory, name='mxt-scratch')
+        self.name = 'MXT_SCRATCH_LAYOUT'
+        self.layout = layout
+        self.path_substitutions = mx_subst.path_substitutions
+        self.string_substitutions = mx_subst.string_substitutions
+        self._removed_deps = set()
+
+@_selftest
+def _test_layout_input_manifest(scratch):
+    for name in ('bin/tool', 'lib/a.jar', 'lib/sub/b.jar', 'target.txt'):
+        _write_file(os.path.join(scratch, name), name.encode())
+    os.symlink('target.txt', os.path.join(scratch, 'link'))
+    layout = _ScratchLayout(scratch, {'./' : ['file:bin/*', 'file:lib', 'file:link']})
+    compare = mx.LayoutDistribution._compare_input_manifest
+
+    manifest = list(layout._scan_file_inputs())
+    paths = [path.replace(os.sep, '/') for path, _, _ in manifest]
+    _check_equal(['bin/tool', 'lib', 'lib/a.jar', 'lib/sub', 'lib/sub/b.jar', 'link', 'target.txt'], paths, 'scanned inputs')
+    _check_equal(None, compare(manifest, layout._scan_file_inputs()), 'difference of unchanged inputs')
+
+    _write_file(os.path.join(scratch, 'lib', 'sub', 'b.jar'), b'longer content')
+    _check_equal('lib/sub/b.jar has changed', compare(manifest, layout._scan_file_inputs()).replace(os.sep, '/'), 'difference after a change')
+    manifest = list(layout._scan_file_inputs())
+    _write_file(os.path.join(scratch, 'target.txt'), b'the target of link changed')
+    _check_equal('target.txt has changed', compare(manifest, layout._scan_file_inputs()), 'difference after changing a link target')
+    manifest = list(layout._scan_file_inputs())
+    _write_file(os.path.join(scratch, 'lib', 'sub', 'c.jar'), b'')
+    _check(compare(manifest, layout._scan_file_inputs()), 'added file not detected')
+    manifest = list(layout._scan_file_inputs())
+    os.remove(os.path.join(scratch, 'bin', 'tool'))
+    _check(compare(manifest, layout._scan_file_inputs()), 'removed file not detected')
+    manifest = list(layout._scan_file_inputs())
+    os.remove(os.path.join(scratch, 'lib', 'sub', 'c.jar'))
+    _check(compare(manifest, layout._scan_file_inputs()), 'removed last file not detected')
+
+_tar_contents = {
+    'a.txt' : b'a' * 1000,
+    'dir/b.bin' : bytes(bytearray(range(256))) * 64,
+    'dir/sub/c.txt' : b'',
+}
+
+def _write_tar(path, contents, fileobj=None):
+    with tarfile.open(path if fileobj is None else None, 'w|' if fileobj else 'w', fileobj=fileobj) as tf:
+        for name, data in contents:
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            member.mtime = 1
+            tf.addfile(member, io.BytesIO(data))
+
+@_selftest
+def _test_tar_compressions(scratch):
+    plain = os.path.join(scratch, 'plain.tar')
+    _write_tar(plain, sorted(_tar_contents.items()))
+    for compression in mx._tar_compressions.values():
+        if not compression.is_available():
+            print('  skipping unavailable ' + compression.name)
+            continue
+        # streamed writer and whole file compression must both be readable by _open_tar and the extractor
+        streamed = os.path.join(scratch, 'streamed.' + compression.extensions()[0])
+        with compression.open_writer(streamed) as writer:
+            _write_tar(None, sorted(_tar_contents.items()), fileobj=writer)
+        compressed = os.path.join(scratch, 'compressed.' + compression.extensions()[0])
+        compression.compress(plain, compressed)
+        _check(mx._TarCompression.for_path(compressed) is compression, 'for_path(' + compressed + ')')
+        for archive in (streamed, compressed):
+            with mx._open_tar(archive) as tf:
+                _check_equal(sorted(_tar_contents), sorted(tf.getnames()), 'members of ' + archive)
+            dst = os.path.join(scratch, 'extracted', os.path.basename(archive))
+            mx.Extractor.create(archive).extract(dst)
+            _check_equal(_tar_contents, _files_in(dst), 'extraction of ' + archive)
+        decompressed = os.path.join(scratch, 'decompressed.tar')
+        compression.decompress(compressed, decompressed)
+        _check_equal(_read_file(plain), _read_file(decompressed), compression.name + ' round trip')
+
+@_selftest
+def _test_parallel_extraction(scratch):
+    # enough members to extract on several threads
+    contents = dict(('d{}/f{}.txt'.format(i % 7, i), ('content of {}'.format(i) * i).encode()) for i in range(200))
+    archive = os.path.join(scratch, 'many.zip')
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for name in sorted(contents):
+            zf.writestr(name, contents[name])
+        # names escaping the destination are confined to it like zipfile.extract does
+        zf.writestr('../../escaped/', b'')
+        zf.writestr('/absolute/', b'')
+        zf.writestr('../up.txt', b'up')
+    dst = os.path.join(scratch, 'out', 'zip')
+    with zipfile.ZipFile(archive) as zf:
+        members = zf.infolist()
+    mx._extract_zip_members(archive, members, dst)
+    expected = dict(contents)
+    expected['up.txt'] = b'up'
+    _check_equal(expected, _files_in(dst), 'extracted zip')
+    _check_equal(['many.zip', 'out'], sorted(os.listdir(scratch)), 'files outside of the destination')
+    _check(os.path.isdir(os.path.join(dst, 'escaped')) and os.path.isdir(os.path.join(dst, 'absolute')), 'confined directories')
+
+    # a later tar member replaces an earlier one with the same name
+    members = [('f{}.txt'.format(i), b'first' * i) for i in range(50)] + [('f{}.txt'.format(i), b'second' * i) for i in range(0, 50, 3)]
+    archive = os.path.join(scratch, 'dup.tar')
+    _write_tar(archive, members)
+    dst = os.path.join(scratch, 'out', 'tar')
+    mx.Extractor.create(archive).extract(dst)
+    _check_equal(dict(members), _files_in(dst), 'extracted tar with duplicate members')
+
+class _TestHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    A local HTTP/1.1 server for the download tests. It serves the contents of `files` (a dict from
+    URL paths to bytes) with an ETag and supports `Range` requests. Paths in `truncate` are cut
+    off after that many bytes on their first full response, paths in `errors` are answered with
+    that many HTTP 500 responses first and paths in `delay` are answered after that many seconds.
+    The served requests are recorded as (path, Range header) tuples.
+    """
+    daemon_threads = True
+
+    def __init__(self, files, truncate=None, errors=None, delay=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _TestHTTPHandler)
+        self.files = files
+        self.truncate = dict(truncate or {})
+        self.errors = dict(errors or {})
+        self.delay = delay or {}
+        self.requests = []
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+
+    def url(self, path):
+        return 'http://127.0.0.1:{}{}'.format(self.server_address[1], path)
+
+    def __enter__(self):
+        self._thread.start()
+        # the downloads must not be diverted to a proxy (the environment is restored after each test)
+        for name in list(os.environ):
+            if name.lower().endswith('_proxy'):
+                del os.environ[name]
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+class _TestHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path
+        server.requests.append((path, self.headers.get('Range')))
+        time.sleep(server.delay.get(path, 0))
+        data = server.files.get(path)
+        if server.errors.get(path):
+            server.errors[path] -= 1
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if data is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+        byte_range = self.headers.get('Range')
+        start = 0
+        if byte_range and self.headers.get('If-Range') == etag:
+            start = int(byte_range[len('bytes='):].split('-')[0])
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        body = data[start:]
+        if start == 0 and path in server.truncate:
+            body = body[:server.truncate.pop(path)]
+            self.close_connection = True
+        try:
+            self.wfile.write(body)
+        except (IOError, OSError):
+            # a cancelled download closed the connection
+            self.close_connection = True
+
+def _test_library(name, path, urls, data):
+    return mx.Library(_suite, name, path, False, urls, hashlib.sha1(data).hexdigest(), None, [], None, [], None)
+
+@_selftest
+def _test_fetch_libraries(scratch):
+    os.environ['MX_CACHE_DIR'] = os.path.join(scratch, 'cache')
+    files = dict(('/lib{}.jar'.format(i), os.urandom(1000 * i)) for i in range(1, 11))
+    with _TestHTTPServer(files) as server:
+        libs = [_test_library('MXT_LIB{}'.format(i), os.path.join(scratch, 'libs', 'lib{}.jar'.format(i)), [server.url(path)], files[path])
+                for i, path in ((int(path[4:-4]), path) for path in files)]
+        fetched = mx._fetch_libraries(libs, jobs=4)
+        _check_equal(sorted(lib.name for lib in libs), sorted(lib.name for lib in fetched), 'fetched libraries')
+        for lib in libs:
+            _check_equal(files['/' + os.path.basename(lib.path)], _read_file(lib.path), 'contents of ' + lib.path)
+        _check_equal(sorted(files), sorted(path for path, _ in server.requests), 'requests')
+        _check_equal([], mx._http_connection_caches, 'connections left open by the fetch threads')
+        # everything is up to date now
+        _check_equal([], mx._fetch_libraries(libs, jobs=4), 'libraries fetched again')
+        _check_equal(len(files), len(server.requests), 'number of requests')
+
+@_selftest
+def _test_download_resume(scratch):
+    data = os.urandom(300 * 1024)
+    files = {'/big.bin' : data, '/flaky.bin' : data[:1000]}
+    with _TestHTTPServer(files, truncate={'/big.bin' : 100 * 1024}, errors={'/flaky.bin' : 2}) as server:
+        path = os.path.join(scratch, 'big.bin')
+        _check(mx.download(path, [server.url('/big.bin')]), 'download of ' + path)
+        _check(_read_file(path) == data, 'contents of the resumed download')
+        _check_equal([('/big.bin', None), ('/big.bin', 'bytes={}-'.format(100 * 1024))], server.requests, 'requests')
+
+        # HTTP 500 responses are retried on the kept-alive connection like urlopen does
+        del server.requests[:]
+        path = os.path.join(scratch, 'flaky.bin')
+        _check(mx.download(path, [server.url('/flaky.bin')]), 'download of ' + path)
+        _check_equal(files['/flaky.bin'], _read_file(path), 'contents of ' + path)
+        _check_equal([('/flaky.bin', None)] * 3, server.requests, 'requests')
+        server.errors['/flaky.bin'] = 2
+        _check(mx.download(path, [server.url('/flaky.bin')], verifyOnly=True), 'verification of ' + server.url('/flaky.bin'))
+    mx._http_close_connections()
+
+@_selftest
+def _test_hedged_download(scratch):
+    os.environ['MX_CACHE_DIR'] = os.path.join(scratch, 'cache')
+    os.environ['MX_DOWNLOAD_MIRRORS'] = 'fastest'
+    os.environ['MX_DOWNLOAD_HEDGE_DELAY'] = '0.2'
+    mx._mirror_stats_instance = None
+    slow_data = b'slow' * 1000
+    fast_data = b'fast' * 1000
+    with _TestHTTPServer({'/f.bin' : slow_data}, delay={'/f.bin' : 1.5}) as slow, _TestHTTPServer({'/f.bin' : fast_data}) as fast:
+        path = os.path.join(scratch, 'out', 'f.bin')
+        start = time.time()
+        _check(mx.download(path, [slow.url('/f.bin'), fast.url('/f.bin')]), 'hedged download')
+        _check(time.time() - start < 1.5, 'hedged download waited for the slow URL')
+        _check(_read_file(path) == fast_data, 'contents of the hedged download')
+        # the slow download completes after it lost the race and must neither replace nor leave a file
+        time.sleep(2)
+        _check_equal(['f.bin'], os.listdir(os.path.dirname(path)), 'files after the slow download completed')
+        _check(_read_file(path) == fast_data, 'contents after the slow download completed')
+
+        stats = mx._MirrorStats(os.path.join(scratch, 'cache', 'mirror-stats.json'))
+        _check(stats.expected_time(fast.url('/f.bin')) < stats.expected_time(slow.url('/f.bin')), 'measured speed of the hosts')
+        _check_equal([fast.url('/f.bin'), slow.url('/f.bin')], stats.order([slow.url('/f.bin'), fast.url('/f.bin')]), 'URLs ordered by speed')
+    mx._mirror_stats_instance = None
+
+@_selftest
+def _test_mirror_stats_merge(scratch):
+    path = os.path.join(scratch, 'mirror-stats.json')
+    url = 'https://example.com/lib.jar'
+    # two processes measuring the same host
+    first, second = mx._MirrorStats(path), mx._MirrorStats(path)
+    first.record_latency(url, 1.0)
+    second.record_latency(url, 2.0)
+    second.record_result(url, False)
+    first.save()
+    second.save()
+    entry = mx._MirrorStats(path)._load()['example.com']
+    _check_equal(0.7 * 1.0 + 0.3 * 2.0, entry['latency'], 'merged latency')
+    _check_equal(1, entry['failures'], 'merged failures')
+
+@_selftest
+def _test_sha1_index(scratch):
+    cache = os.path.join(scratch, 'cache')
+    os.environ['MX_CACHE_DIR'] = cache
+    index = mx._sha1_index()
+    index_file = os.path.join(cache, 'sha1-index.json')
+    cached = os.path.join(cache, 'LIB_1234', 'lib.jar')
+    stale = os.path.join(cache, 'LIB_5678', 'lib.jar')
+    outside = os.path.join(scratch, 'outside.jar')
+    link = os.path.join(scratch, 'lib', 'lib.jar')
+    for path in (cached, stale, outside):
+        _write_file(path, path.encode())
+    os.makedirs(os.path.dirname(link))
+    os.symlink(cached, link)
+
+    # files are indexed by their real path but only if that is in the cache
+    expected = hashlib.sha1(cached.encode()).hexdigest()
+    _check_equal(expected, mx.sha1OfFile(link), 'digest of ' + link)
+    _check_equal(expected, index.lookup(cached), 'indexed digest of ' + cached)
+    mx.sha1OfFile(stale)
+    _check_equal(hashlib.sha1(outside.encode()).hexdigest(), mx.sha1OfFile(outside), 'digest of ' + outside)
+    _check_equal(None, index.lookup(outside), 'indexed digest of ' + outside)
+    # the index is saved once, when mx exits
+    _check(not os.path.exists(index_file), 'index saved for every digest')
+    _check(index._save_registered, 'index saved when mx exits')
+
+    # a changed file is hashed again
+    _write_file(cached, b'changed')
+    _check_equal(hashlib.sha1(b'changed').hexdigest(), mx.sha1OfFile(cached), 'digest of changed ' + cached)
+
+    # saving removes the entries of deleted files
+    os.remove(stale)
+    index.save()
+    with open(index_file) as fp:
+        entries = json.load(fp)['entries']
+    _check_equal([os.path.realpath(cached)], list(entries), 'saved index entries')
+    _check_equal(hashlib.sha1(b'changed').hexdigest(), mx._Sha1Index(index_file, cache).lookup(cached), 'digest in the saved index')
+
+@_selftest
+def _test_cache_gc(scratch):
+    cache = os.path.join(scratch, 'cache')
+    os.environ['MX_CACHE_DIR'] = cache
+    now = time.time()
+    ages = {'OLD_1' : 3 * 86400, 'USED_2' : 3600, 'NEW_3' : 0}
+    for name, age in ages.items():
+        _write_file(os.path.join(cache, name, 'lib.jar'), b'x' * 1000)
+        _write_file(os.path.join(cache, name + '.sha1'), b'0' * 40)
+        for p in (os.path.join(cache, name), os.path.join(cache, name + '.sha1')):
+            os.utime(p, (now - age, now - age))
+
+    def _entries():
+        return sorted(n for n in os.listdir(cache) if not n.startswith('.'))
+
+    _check(mx._cache_gc(max_age=86400, dry_run=True) > 0, 'bytes a dry run would free')
+    _check_equal(['NEW_3', 'NEW_3.sha1', 'OLD_1', 'OLD_1.sha1', 'USED_2', 'USED_2.sha1'], _entries(), 'entries after a dry run')
+    mx._cache_gc(max_age=86400)
+    _check_equal(['NEW_3', 'NEW_3.sha1', 'USED_2', 'USED_2.sha1'], _entries(), 'entries after evicting by age')
+    # entries used within the grace period are kept even if the cache is too large
+    mx._cache_gc(max_size=0)
+    _check_equal(['NEW_3', 'NEW_3.sha1'], _entries(), 'entries after evicting by size')
+
+    # a lock held by another process prevents the GC, a stale one is taken over
+    lock = os.path.join(cache, '.gc.lock')
+    os.mkdir(lock)
+    _check_equal(0, mx._cache_gc(max_size=0, grace=0), 'bytes freed while locked')
+    _check_equal(['NEW_3', 'NEW_3.sha1'], _entries(), 'entries after a locked GC')
+    os.utime(lock, (now - 7200, now - 7200))
+    _check(mx._cache_gc(max_size=0, grace=0) > 0, 'GC with a stale lock')
+    _check_equal([], sorted(os.listdir(cache)), 'cache after taking over a stale lock')
+
+    # only one of the processes taking over a stale lock acquires it
+    os.mkdir(lock)
+    os.utime(lock, (now - 7200, now - 7200))
+    _check(mx._try_lock_dir(lock, stale_after=3600), 'stale lock taken over')
+    _check(not mx._try_lock_dir(lock, stale_after=3600), 'lock acquired twice')
+    os.rmdir(lock)
+    try:
+        mx._try_lock_dir(os.path.join(scratch, 'missing', 'lock'), stale_after=3600)
+        _check(False, 'lock in a missing directory acquired')
+    except OSError:
+        pass
+
+    # entries renamed for eviction but left behind are removed once the renaming process is gone
+    # or they were renamed more than the grace period ago
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    _write_file(os.path.join(cache, '.evicted-DEAD-{}'.format(dead.pid), 'lib.jar'), b'x')
+    _write_file(os.path.join(cache, '.evicted-ALIVE-{}'.format(os.getpid()), 'lib.jar'), b'x')
+    _write_file(os.path.join(cache, '.evicted-ALIVE.sha1-{}'.format(os.getpid())), b'0' * 40)
+    def _evicted():
+        return sorted(n for n in os.listdir(cache) if n.startswith('.evicted-'))
+    mx._cache_gc(max_size=0, dry_run=True)
+    _check_equal(3, len(_evicted()), 'renamed entries after a dry run')
+    mx._cache_gc(max_size=0)
+    _check_equal(['.evicted-ALIVE-{}'.format(os.getpid()), '.evicted-ALIVE.sha1-{}'.format(os.getpid())], _evicted(), 'renamed entries of a live process')
+    time.sleep(0.01)
+    mx._cache_gc(max_size=0, grace=0)
+    _check_equal([], sorted(os.listdir(cache)), 'cache after the grace period of renamed entries')
+
+def _write_cache_pack(path, entries, contents):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr(mx._CachePack.index_name, json.dumps({'version' : 1, 'entries' : entries}))
+        for name, data in contents.items():
+            zf.writestr(name, data)
+
+@_selftest
+def _test_cache_pack(scratch):
+    files = {
+        os.path.join('LIB_1', 'lib.jar') : b'lib',
+        os.path.join('LIB_1', 'lib.sources.jar') : b'sources',
+        os.path.join('RES_2', 'res.tar.gz') : os.urandom(100000),
+    }
+    os.environ['MX_CACHE_DIR'] = os.path.join(scratch, 'cache')
+    for name, data in files.items():
+        _write_file(os.path.join(scratch, 'cache', name), data)
+    digests = dict((name, hashlib.sha1(data).hexdigest()) for name, data in files.items())
+    pack_path = os.path.join(scratch, 'pack.zip')
+    mx._CachePack.create(pack_path, digests)
+
+    # import into an empty cache
+    cache = os.path.join(scratch, 'imported')
+    os.environ['MX_CACHE_DIR'] = cache
+    pack = mx._CachePack(pack_path)
+    _check_equal(digests, pack.entries, 'pack entries')
+    _check_equal(len(files), pack.extract_all(jobs=2), 'number of imported files')
+    expected = dict((name.replace(os.sep, '/'), data) for name, data in files.items())
+    expected.update((name.replace(os.sep, '/') + '.sha1', sha1.encode()) for name, sha1 in digests.items())
+    _check_equal(expected, _files_in(cache), 'imported cache')
+    _check_equal(0, pack.extract_all(), 'number of files imported again')
+
+    # missing cache entries are extracted from the packs in MX_CACHE_PACKS
+    os.environ['MX_CACHE_PACKS'] = pack_path
+    mx._cache_packs_list = None
+    try:
+        missing = os.path.join(cache, 'LIB_1', 'lib.jar')
+        os.remove(missing)
+        _check(mx._extract_from_cache_packs(missing), 'extraction of ' + missing)
+        _check_equal(b'lib', _read_file(missing), 'contents of ' + missing)
+        _check(not mx._extract_from_cache_packs(os.path.join(cache, 'LIB_3', 'other.jar')), 'extraction of an entry not in the pack')
+    finally:
+        mx._cache_packs_list = None
+
+    # an entry not matching its digest is rejected
+    corrupt = os.path.join(scratch, 'corrupt.zip')
+    name = os.path.join('LIB_4', 'lib.jar')
+    _write_cache_pack(corrupt, {name : hashlib.sha1(b'expected').hexdigest()}, {name.replace(os.sep, '/') : b'actual'})
+    try:
+        mx._CachePack(corrupt).extract_all()
+        _check(False, 'corrupt entry imported')
+    except SystemExit:
+        pass
+    _check(not os.path.exists(os.path.join(cache, name)), 'corrupt entry written to the cache')
+
+@_selftest
+def _test_cache_pack_traversal(scratch):
+    cache = os.path.join(scratch, 'a', 'cache')
+    os.environ['MX_CACHE_DIR'] = cache
+    outside = os.path.join(scratch, 'a', 'evil.txt')
+    digest = hashlib.sha1(b'evil').hexdigest()
+    for name in ['../evil.txt', 'LIB_1/../../evil.txt', outside, '.']:
+        pack_path = os.path.join(scratch, 'evil.zip')
+        _write_cache_pack(pack_path, {'LIB_1/lib.jar' : hashlib.sha1(b'lib').hexdigest(), name : digest}, {'LIB_1/lib.jar' : b'lib', name : b'evil'})
+        pack = mx._CachePack(pack_path)
+        try:
+            pack.extract_all()
+            _check(False, 'cache pack with entry {} imported'.format(name))
+        except SystemExit:
+            pass
+        _check(not os.path.exists(outside), 'file written outside of the cache by entry ' + name)
+        # no entry of a malicious pack is imported
+        _check(not os.path.exists(cache), 'entries imported from a pack with entry ' + name)
+
+def _write_stub_jdk(home, version, launches):
+    """
+    Creates a JDK in `home` whose tools only print the `version` banner and append their command line to `launches`.
+    """
+    for tool in ('java', 'javac'):
+        _write_file(os.path.join(home, 'bin', tool), '#!/bin/sh\necho "$0 $*" >> {}\necho \'openjdk version "{}" 2019-01-15\' >&2\n'.format(launches, version).encode())
+        os.chmod(os.path.join(home, 'bin', tool), 0o755)
+    _write_file(os.path.join(home, 'release'), 'JAVA_VERSION="{}"\n'.format(version).encode())
+
+@_selftest
+def _test_jdk_probe_cache(scratch):
+    if mx.is_windows():
+        print('  skipping on Windows')
+        return
+    home = os.path.join(scratch, 'jdk')
+    launches = os.path.join(scratch, 'launches')
+    _write_stub_jdk(home, '11.0.2', launches)
+    user_home = mx._opts.user_home
+    mx._opts.user_home = os.path.join(scratch, 'home')
+    try:
+        def _launches():
+            launched = _read_file(launches).decode().splitlines() if os.path.exists(launches) else []
+            if launched:
+                os.remove(launches)
+            return launched
+
+        _check_equal('11.0.2', str(mx.JDKConfig(home).version), 'version of the JDK')
+        _check(_launches(), 'JVM launches when probing the JDK')
+        _check_equal('11.0.2', str(mx.JDKConfig(home).version), 'version of the JDK from the probe cache')
+        _check_equal([], _launches(), 'JVM launches with a probe cache')
+
+        # an updated JDK is probed again
+        now = time.time()
+        os.utime(os.path.join(home, 'release'), (now + 10, now + 10))
+        mx.JDKConfig(home)
+        _check(_launches(), 'JVM launches after the JDK was updated')
+
+        os.environ['MX_JDK_PROBE_CACHE'] = 'false'
+        os.utime(os.path.join(home, 'release'), (now + 20, now + 20))
+        mx.JDKConfig(home)
+        mx.JDKConfig(home)
+        _check_equal(2, len([l for l in _launches() if l.endswith(' -version')]), 'java -version launches without probe cache')
+
+        # failed probes are not persisted
+        probes = mx._JDKProbes(home)
+        del os.environ['MX_JDK_PROBE_CACHE']
+        def _fail():
+            raise mx.JDKConfigException('probe failed')
+        try:
+            probes.get('failing', _fail)
+            _check(False, 'failing probe did not raise')
+        except mx.JDKConfigException:
+            pass
+        _check_equal(42, mx._JDKProbes(home).get('failing', lambda: 42), 'result of the probe after a failure')
+        _check_equal(42, mx._JDKProbes(home).get('failing', _fail), 'persisted result of the probe')
+    finally:
+        mx._opts.user_home = user_home
+
+@_selftest
+def _test_jdk_candidates(scratch):
+    if mx.is_windows():
+        print('  skipping on Windows')
+        return
+    os.environ['MX_JDK_PROBE_CACHE'] = 'false'
+    launches = os.path.join(scratch, 'launches')
+    homes = []
+    for i in range(30):
+        home = os.path.join(scratch, 'jdk{}'.format(i))
+        _write_stub_jdk(home, '1.8.0' if i < 10 else '11.0.{}'.format(i), launches)
+        homes.append(home)
+    # a JDK without release file has to be probed
+    os.remove(os.path.join(homes[15], 'release'))
+
+    def _launched():
+        launched = set(os.path.dirname(os.path.dirname(l.split()[0])) for l in _read_file(launches).decode().splitlines())
+        os.remove(launches)
+        return launched
+
+    jdk11 = lambda version: version >= mx.VersionSpec('11')
+    jobs = mx._jdk_probe_jobs()
+    result = mx._filtered_jdk_configs(homes, jdk11, first=True)
+    _check_equal([homes[10]], [jdk.home for jdk in result], 'first JDK 11')
+    launched = _launched()
+    # JDK 8 homes are excluded by their release file and the homes after the match at most had their probing started
+    _check(not launched & set(homes[:10]), 'JDKs probed despite their release file: {}'.format(sorted(launched & set(homes[:10]))))
+    _check(homes[10] in launched and launched <= set(homes[10:10 + jobs]), 'JDKs probed after the first match: {}'.format(sorted(launched - set(homes[10:11]))))
+
+    result = mx._filtered_jdk_configs(homes, jdk11)
+    _check_equal(homes[10:], [jdk.home for jdk in result], 'all JDK 11s')
+    _check(not _launched() & set(homes[:10]), 'JDK 8 homes probed')
+
+@_selftest
+def _test_library_module_description(scratch):
+    import mx_javamodules
+    cache = os.path.join(scratch, 'cache')
+    os.environ['MX_CACHE_DIR'] = cache
+    jar = os.path.join(cache, 'MXT_MODULAR_LIB', 'lib.jar')
+    _write_file(jar, b'not really a jar')
+    lib = _test_library('MXT_MODULAR_LIB', jar, ['https://example.com/lib.jar'], _read_file(jar))
+    lib.moduleName = 'com.example.lib'
+    # the description as printed by java --describe-module and DescribeModules, cached per mx version
+    description = os.path.join(cache, 'MXT_MODULAR_LIB', 'com.example.lib.{}.mx{}.desc'.format(lib.sha1, mx.version))
+    _write_file(description, '\n'.join([
+        'com.example.lib@1.0',
+        'requires java.base mandated',
+        'requires java.logging transitive',
+        'exports com.example.api',
+        'qualified exports com.example.spi to com.example.impl',
+        'opens com.example.model',
+        'qualified opens com.example.internal to com.example.test',
+        'uses com.example.spi.Plugin',
+        'provides com.example.spi.Plugin with com.example.impl.DefaultPlugin',
+        'contains com.example.impl',
+    ]).encode())
+    module = mx_javamodules.get_library_as_module(lib, jdk=None)
+    _check_equal({'com.example.api' : [], 'com.example.spi' : ['com.example.impl']}, module.exports, 'exports')
+    _check_equal({'java.base' : set(), 'java.logging' : set(['transitive'])}, module.requires, 'requires')
+    _check_equal(set(['com.example.api', 'com.example.spi', 'com.example.model', 'com.example.internal', 'com.example.impl']), module.packages, 'packages')
+    _check_equal({'com.example.spi.Plugin' : ['com.example.impl.DefaultPlugin']}, module.provides, 'provides')
+
+@_selftest
+def _test_suite_dict_cache(scratch):
+    import marshal
+    suite_dir = os.path.join(scratch, 'scratchsuite')
+    suite_py = os.path.join(suite_dir, 'mx.scratchsuite', 'suite.py')
+    suite_template = """suite = {{
+  "mxversion" : "5.0",
+  "name" : "scratchsuite",
+  "libraries" : {{
+    "LIB" : {{"path" : "${{MXT_LIB_DIR}}/{}", "optional" : True}},
+  }},
+}}
+"""
+    _write_file(suite_py, suite_template.format('lib.jar').encode())
+    mx.run(['git', 'init', '-q', suite_dir])
+    user_home = os.path.join(scratch, 'home')
+    cache_dir = os.path.join(user_home, '.mx', 'suite-dicts')
+
+    def _load_suite(lib_dir):
+        env = dict(os.environ)
+        env['MXT_LIB_DIR'] = lib_dir
+        mx.run_mx(['--user-home', user_home, 'suites'], suite=suite_dir, env=env, out=mx.OutputCapture())
+        caches = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.py' + str(sys.version_info[0]))]
+        _check_equal(1, len(caches), 'number of cached dicts')
+        with open(caches[0], 'rb') as fp:
+            return _read_file(caches[0]), marshal.load(fp)
+
+    data, (_, _, _, env_vars, d) = _load_suite('/first')
+    _check_equal({'MXT_LIB_DIR' : '/first'}, env_vars, 'environment variables of the cached dict')
+    _check_equal('/first/lib.jar', d['libraries']['LIB']['path'], 'cached library path')
+    # loading the suite again uses the cached dict instead of writing it again
+    os.utime(os.path.join(cache_dir, os.listdir(cache_dir)[0]), (1, 1))
+    _check_equal(data, _load_suite('/first')[0], 'cached dict after a cache hit')
+    _check_equal(1, os.path.getmtime(os.path.join(cache_dir, os.listdir(cache_dir)[0])), 'time stamp of the cached dict after a cache hit')
+    # a different value of a referenced environment variable or a changed suite.py invalidate the cached dict
+    _, (_, _, _, _, d) = _load_suite('/second')
+    _check_equal('/second/lib.jar', d['libraries']['LIB']['path'], 'cached library path after changing the environment')
+    _write_file(suite_py, suite_template.format('other.jar').encode())
+    _, (_, _, _, _, d) = _load_suite('/second')
+    _check_equal('/second/other.jar', d['libraries']['LIB']['path'], 'cached library path after changing suite.py')
+
+@_selftest
+def _test_classpath_entries_memo(scratch):
+    # LIB2 depends on the optional LIB which is removed once its jar is deleted
+    _write_file(os.path.join(scratch, 'cpsuite', 'mx.cpsuite', 'suite.py'), b"""suite = {
+  "mxversion" : "5.0",
+  "name" : "cpsuite",
+  "libraries" : {
+    "LIB" : {"path" : "lib/lib.jar", "optional" : True, "sha1" : "NOCHECK"},
+    "LIB2" : {"path" : "lib/lib2.jar", "optional" : True, "sha1" : "NOCHECK", "dependencies" : ["LIB"]},
+    "LIB3" : {"path" : "lib/lib3.jar", "sha1" : "NOCHECK"},
+  },
+  "distributions" : {
+    "DIST" : {"dependencies" : ["LIB3"]},
+  },
+}
+""")
+    _write_file(os.path.join(scratch, 'cpsuite', 'mx.cpsuite', 'mx_cpsuite.py'), b"""import os, mx
+
+def _names(deps):
+    return ' '.join(d.name for d in deps if d.suite.name in ('cpsuite', 'dynsuite'))
+
+def _memo(args):
+    s = mx.primary_suite()
+    print('before: ' + _names(mx.classpath_entries('DIST')))
+    print('all before: ' + _names(mx.classpath_entries()))
+    os.remove(os.path.join(s.dir, 'lib', 'lib.jar'))
+    mx._remove_unsatisfied_deps()
+    print('removed: ' + _names(mx.classpath_entries()))
+    s.import_suite('dynsuite')
+    print('imported: ' + _names(mx.classpath_entries()))
+
+mx.update_commands(mx.suite('cpsuite'), {'cpsuite-memo' : [_memo, '']})
+""")
+    _write_file(os.path.join(scratch, 'dynsuite', 'mx.dynsuite', 'suite.py'), b"""suite = {
+  "mxversion" : "5.0",
+  "name" : "dynsuite",
+  "libraries" : {
+    "DYNLIB" : {"path" : "lib/dynlib.jar", "sha1" : "NOCHECK"},
+  },
+}
+""")
+    for name in ('lib', 'lib2', 'lib3'):
+        _write_file(os.path.join(scratch, 'cpsuite', 'lib', name + '.jar'), b'')
+    _write_file(os.path.join(scratch, 'dynsuite', 'lib', 'dynlib.jar'), b'')
+    for name in ('cpsuite', 'dynsuite'):
+        mx.run(['git', 'init', '-q', os.path.join(scratch, name)])
+    out = mx.OutputCapture()
+    mx.run_mx(['--user-home', os.path.join(scratch, 'home'), 'cpsuite-memo'], suite=os.path.join(scratch, 'cpsuite'), out=out)
+    lines = dict(line.split(': ', 1) for line in out.data.splitlines() if ': ' in line)
+    _check_equal('LIB3 DIST', lines.get('before'), 'class path entries of DIST')
+    # the order of all class path entries depends on the order of a set
+    _check_equal('DIST LIB LIB2 LIB3', ' '.join(sorted(lines.get('all before', '').split())), 'all class path entries')
+    _check_equal('DIST LIB3', ' '.join(sorted(lines.get('removed', '').split())), 'all class path entries after removing LIB')
+    _check_equal('DIST DYNLIB LIB3', ' '.join(sorted(lines.get('imported', '').split())), 'all class path entries after a dynamic import')
+
+@_selftest
+def _test_git_metadata_cache(scratch):
+    for name in ('AUTHOR', 'COMMITTER'):
+        os.environ['GIT_{}_NAME'.format(name)] = 'mx'
+        os.environ['GIT_{}_EMAIL'.format(name)] = 'mx@example.com'
+    repo = os.path.join(scratch, 'repo')
+    subdir = os.path.join(repo, 'mx.repo')
+    _write_file(os.path.join(subdir, 'suite.py'), b'suite = {}\n')
+    vc = mx.GitConfig()
+    vc.init(repo)
+    vc.add(repo, '.')
+    vc.commit(repo, 'first')
+    first = vc.tip(subdir)
+    _check_equal(first, vc.tip(repo), 'tip of the repository root')
+    _check_equal(False, vc.isDirty(subdir), 'dirty state of a clean repository')
+    # a commit from the root invalidates the metadata queried from a subdirectory
+    mx.update_file(os.path.join(subdir, 'suite.py'), 'suite = {"name" : "repo"}\n')
+    _check_equal(True, vc.isDirty(subdir), 'dirty state after update_file')
+    vc.commit(repo, 'second')
+    _check(first != vc.tip(subdir), 'tip of a subdirectory is still the first commit after a commit in the repository root')
+    _check_equal(False, vc.isDirty(subdir), 'dirty state after the commit')
+
+@_selftest
+def _test_spull_order(scratch):
+    for name in ('AUTHOR', 'COMMITTER'):
+        os.environ['GIT_{}_NAME'.format(name)] = 'mx'
+        os.environ['GIT_{}_EMAIL'.format(name)] = 'mx@example.com'
+    vc = mx.GitConfig()
+    upstream = os.path.join(scratch, 'upstream')
+    work = os.path.join(scratch, 'work')
+
+    def _suite_py(name, imports):
+        return json.dumps({
+            'mxversion' : '5.0',
+            'name' : name,
+            'imports' : {'suites' : [{'name' : n, 'version' : v, 'urls' : [{'url' : os.path.join(upstream, n), 'kind' : 'git'}]} for n, v in imports]},
+        }, indent=2)
+
+    def _commit(name, contents, message):
+        repo = os.path.join(upstream, name)
+        _write_file(os.path.join(repo, 'mx.' + name, 'suite.py'), ('suite = ' + contents + '\n').encode())
+        if not os.path.exists(os.path.join(repo, '.git')):
+            vc.init(repo)
+        vc.add(repo, '.')
+        vc.commit(repo, message)
+        return vc.tip(repo).strip()
+
+    # a imports b and c, b imports an older version of c than a
+    c1 = _commit('c', _suite_py('c', []), 'first')
+    c2 = _commit('c', _suite_py('c', []) + ' # second', 'second')
+    b = _commit('b', _suite_py('b', [('c', c1)]), 'first')
+    _write_file(os.path.join(work, 'a', 'mx.a', 'suite.py'), ('suite = ' + _suite_py('a', [('b', b), ('c', c2)]) + '\n').encode())
+    vc.init(os.path.join(work, 'a'))
+    for name in ('b', 'c'):
+        vc.clone(os.path.join(upstream, name), os.path.join(work, name))
+    mx.run(['git', 'checkout', '-q', '--detach', c1], cwd=os.path.join(work, 'c'))
+    for jobs in ('1', '4'):
+        out = mx.OutputCapture()
+        rc = mx.run_mx(['--user-home', os.path.join(scratch, 'home'), 'spull', '--only-imports', '-j', jobs], suite=os.path.join(work, 'a'), nonZeroIsFatal=False, out=out, err=out)
+        _check(rc == 0, 'spull -j {} failed:\n{}'.format(jobs, out.data))
+        _check_equal(c2, vc.tip(os.path.join(work, 'c')).strip(), 'version of c pulled with -j ' + jobs)
+
+@_selftest
+def _test_run_per_repository_failure(scratch):
+    calls = []
+
+    def _sleep(abortOnError):
+        calls.append(('sleep', abortOnError, mx.run(['sleep', '1'], nonZeroIsFatal=False)))
+
+    def _fail(abortOnError):
+        calls.append(('fail', abortOnError))
+        return False
+
+    operations = [('/repo/sleeping', _sleep), ('/repo/failing', _fail), ('/repo/failing', lambda abortOnError: calls.append('skipped'))]
+    try:
+        mx._run_per_repository(operations, jobs=2)
+        raise AssertionError('_run_per_repository did not abort')
+    except SystemExit:
+        pass
+    # the failure neither killed the subprocess started for the other repository nor aborted the worker
+    _check_equal([('fail', False), ('sleep', False, 0)], sorted(calls), 'calls')
+
+class _LegacySyntheticDependency(_SyntheticDependency):
+    # traversed by calling _walk_deps_visit_edges like dependencies that override it
+    def _walk_deps_visit_edges(self, visited, edge, preVisit=None, visit=None, ignoredEdges=None, visitEdge=None):
+        self._walk_deps_visit_edges_helper(self._walk_deps_edge_lists(), visited, edge, preVisit, visit, ignoredEdges, visitEdge)
+
+def _walk_deps_trace(walk, preVisit):
+    trace = []
+
+    def _path(edge):
+        return tuple((e.src.name, e.kind) for e in reversed(list(_edges(edge))))
+
+    def _edges(edge):
+        while edge:
+            yield edge
+            edge = edge.prev
+
+    def _preVisit(dep, edge):
+        trace.append(('preVisit', dep.name, _path(edge)))
+        return preVisit(dep)
+    walk(_preVisit, lambda dep, edge: trace.append(('visit', dep.name, _path(edge))),
+         lambda src, dst, edge: trace.append(('visitEdge', src.name, dst.name, _path(edge))))
+    return trace
+
+@_selftest
+def _test_walk_deps_trace(scratch):
+    rng = random.Random(7)
+    deps = []
+    for i in range(200):
+        cls = _LegacySyntheticDependency if i % 10 == 3 else _SyntheticDependency
+        deps.append(cls(_suite, 'dep' + str(i), [], []))
+    for i, dep in enumerate(deps):
+        # edges to later dependencies create cycles
+        dep.deps.extend(rng.choice(deps) for _ in range(rng.randrange(4)))
+        dep.buildDependencies.extend(rng.choice(deps[:i + 1]) for _ in range(rng.randrange(2)))
+    roots = [rng.choice(deps) for _ in range(20)]
+    for ignoredEdges in ([mx.DEP_ANNOTATION_PROCESSOR, mx.DEP_EXCLUDED, mx.DEP_BUILD], [mx.DEP_EXCLUDED]):
+        for preVisit in (lambda dep: True, lambda dep: hash(dep.name) % 5 != 0):
+            def _iterative(pre, visit, visitEdge):
+                mx.walk_deps(roots, preVisit=pre, visit=visit, ignoredEdges=ignoredEdges, visitEdge=visitEdge)
+
+            def _recursive(pre, visit, visitEdge):
+                visited = set()
+                for root in roots:
+                    if root not in visited:
+                        _recursive_walk_deps(root, visited, None, pre, visit, ignoredEdges, visitEdge)
+            expected = _walk_deps_trace(_recursive, preVisit)
+            _check(expected == _walk_deps_trace(_iterative, preVisit), 'walk_deps differs from the recursive traversal ignoring {}'.format(ignoredEdges))
+
+@_selftest
+def _test_walk_deps_depth(scratch):
+    deps = []
+    for i in range(3 * sys.getrecursionlimit()):
+        deps.append(_SyntheticDependency(_suite, 'dep' + str(i), deps[-1:], []))
+    visited = []
+    mx.walk_deps([deps[-1]], visit=lambda dep, edge: visited.append(dep))
+    _check(deps == visited, 'a chain of {} dependencies is not visited depth first'.format(len(deps)))
+
 mx.update_commands(_suite, {
     # overrides
     "build" : [_build, '[options]'],
@@ -158,5 +1185,8 @@ mx.update_commands(_suite, {
     "mxt-vc-tip" : [_vc_tip, '[options]'],
     "mxt-vc-clone" : [_vc_clone, '[options]'],
     "mxt-vc-locate" : [_vc_locate, '[options]'],
+    "mxt-walk-deps-bench" : [_walk_deps_bench, '[options]'],
+    "mxt-memory-bench" : [_memory_bench, '[options]'],
     'mxt-command-info' : [_command_info, '[options]'],
+    'mxt-selftest' : [_selftest_command, '[options] [<name>...]'],
 })